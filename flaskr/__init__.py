@@ -25,13 +25,39 @@ app.secret_key = os.getenv("SECRET_KEY")
 app.config['SQLALCHEMY_DATABASE_URI'] = f"postgresql://{os.getenv('DB_USERNAME')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_SERVER')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['UPLOAD_FOLDER'] = "static/images/uploads"
+# larger requests are refused before the upload is read
+app.config["MAX_CONTENT_LENGTH"] = 32 * 1024 * 1024
+# larger photos are refused from their header, 40 megapixels by default
+app.config["MAX_PHOTO_PIXELS"] = int(os.getenv("MAX_PHOTO_PIXELS") or 40000000)
+# uploads are kept as sent here, outside static, and processed in the background
+app.config["ORIGINALS_FOLDER"] = "originals"
+app.config["QUARANTINE_FOLDER"] = "quarantine"
+# processes cropping uploads, one per cpu core when not set
+app.config["IMAGE_WORKERS"] = int(os.getenv("IMAGE_WORKERS") or 0)
+# resized copies of images served to listings, 512 MB by default
+app.config["DERIVATIVES_FOLDER"] = "derivatives"
+app.config["DERIVATIVES_CACHE_SIZE"] = int(os.getenv("DERIVATIVES_CACHE_SIZE") or 512) * 1024 * 1024
 app.config["MAIL_SERVER"] = "smtp.googlemail.com"
 app.config["MAIL_PORT"] = 587
 app.config["MAIL_USE_TLS"] = True
 app.config["MAIL_USERNAME"] = os.getenv("MAIL_USERNAME")
 app.config["MAIL_PASSWORD"] = os.getenv("MAIL_PASSWORD")
+# a queued mail is retried with exponential backoff from this many seconds,
+# then dead-lettered after MAIL_MAX_ATTEMPTS
+app.config["MAIL_RETRY_DELAY"] = int(os.getenv("MAIL_RETRY_DELAY") or 60)
+app.config["MAIL_MAX_ATTEMPTS"] = int(os.getenv("MAIL_MAX_ATTEMPTS") or 8)
 
 app.config["JWT_SECRET_KEY"] = os.getenv("SECRET_KEY")
+# seconds a resolved caller is reused before it is read again, 60 by default
+app.config["IDENTITY_CACHE_TTL"] = int(os.getenv("IDENTITY_CACHE_TTL") or 60)
+# users the cache holds per process at most, 10000 by default
+app.config["IDENTITY_CACHE_SIZE"] = int(os.getenv("IDENTITY_CACHE_SIZE") or 10000)
+# read notifications older than this are moved to the archive table, 90 days by default
+app.config["NOTIFICATION_RETENTION_DAYS"] = int(os.getenv("NOTIFICATION_RETENTION_DAYS") or 90)
+# adds an X-Query-Count header and a log line with the queries of each request
+app.config["QUERY_COUNT"] = os.getenv("QUERY_COUNT") == "1"
+# seconds a pending payment holds a seat, 48 hours by default
+app.config["SEAT_HOLD_TIME"] = int(os.getenv("SEAT_HOLD_TIME") or 172800)
 
 
 # Database
@@ -58,12 +84,16 @@ mail = Mail(app)
 
 
 import flaskr.models
+import flaskr.identity
+import flaskr.metrics
 
 from flaskr.admins.routes import admins
 from flaskr.api.comment import comments
+from flaskr.api.message import messages
 from flaskr.api.post import posts
 from flaskr.api.reply import replies
 from flaskr.events.routes import events
+from flaskr.images.routes import images
 from flaskr.mains.routes import mains
 from flaskr.notifications.routes import notifications
 from flaskr.profiles.routes import profiles
@@ -79,3 +109,8 @@ app.register_blueprint(notifications)
 app.register_blueprint(posts)
 app.register_blueprint(comments)
 app.register_blueprint(replies)
+app.register_blueprint(messages)
+app.register_blueprint(images)
+
+# Commands
+import flaskr.commands
@@ -6,9 +6,10 @@ from flaskr import db
 from flaskr.admins.forms import *
 from flaskr.admins.utils import __ban_user
 from flaskr.decorators import is_admin
+from flaskr.loaders import load_many
 from flaskr.models import (AccountRestriction, Complain, Event, Notification,
                            Profile, PromotionPending, Role, User)
-from flaskr.notifications.utils import NotificationMessage
+from flaskr.notifications.utils import NotificationMessage, notify_profiles
 from sqlalchemy import desc
 
 admins = Blueprint("admins", __name__, url_prefix="/admins")
@@ -137,6 +138,9 @@ def decline_pending_request(id: int):
 @is_admin
 def complain_box():
     complains = Complain.query.order_by(desc(Complain.created_at)).all()
+    complained_profiles = load_many(Profile, [c.complain_for for c in complains] +
+                                    [c.profile_id for c in complains])
+    load_many(User, [p.user_id for p in complained_profiles])
     ban_form = BanUserForm()
     return render_template("admins/complain-box.html",
                            active="complain_box", len=len,
@@ -241,20 +245,18 @@ def ban_user_and_close_complain(id: int):
     banned_profile = __ban_user(request.form, complain.complain_for)
     if banned_profile:
         complains_against_banned_profile = Complain.query.filter_by(
-            complain_for=banned_profile.id).all()
+            complain_for=banned_profile.id)
         notification = Notification(
             NotificationMessage.complain_resolved_by_ban(
-                complain.get_complain_for().get_fullname()), "",
-            complain.complained_by.id)
-        for c in complains_against_banned_profile:
-            n = Notification(
-                NotificationMessage.user_banned_by_other_report(
-                    c.get_complain_for().get_fullname()), "",
-                c.complained_by.id)
-            db.session.delete(c)
-            db.session.add(n)
-        db.session.delete(complain)
+                banned_profile.get_fullname()), "",
+            complain.profile_id)
+        # every reporter, this one included, hears of the ban
+        notify_profiles([profile_id for profile_id, in
+                         complains_against_banned_profile.with_entities(Complain.profile_id)],
+                        NotificationMessage.user_banned_by_other_report(
+                            banned_profile.get_fullname()))
         db.session.add(notification)
+        complains_against_banned_profile.delete(synchronize_session=False)
         db.session.commit()
         flash("User banned successfully.", "success")
     return redirect(url_for("admins.complain_box"))
@@ -1,66 +1,137 @@
+from datetime import datetime
+
 from flask import Blueprint, flash, request
 from flask.json import jsonify
 from flaskr import db
 from flaskr.decorators import is_token_verified
 from flaskr.models import Comment, Post, Profile, Reply, User
-from flaskr.schema import (comment_schema, comment_schemas, post_schema,
+from flaskr.schema import (CommentSchema, comment_schema, comment_schemas,
+                           dump_comment, fast_jsonify, post_schema,
                            post_schemas, reply_schema, reply_schemas)
-from flaskr.api.utils import get_user
+from flaskr.api.utils import (conditional_jsonify, get_fields, get_page_size,
+                              get_identity)
+from flaskr.utils import decode_cursor, paginate_by_cursor
+from sqlalchemy.orm import selectinload
 
 comments = Blueprint("comment", __name__, url_prefix="/api/v1/comments")
 
+
+def __load_options(fields) -> list:
+    # nested objects are only loaded when they are asked for
+    options = []
+    if fields is None or "profile" in fields:
+        options.append(selectinload(Comment.profile).selectinload(Profile.user))
+    if fields is None or "replies" in fields:
+        options.append(selectinload(Comment.replies).selectinload(Reply.profile)
+                       .selectinload(Profile.user))
+    return options
+
+
 @comments.route("", methods=["POST"])
 @is_token_verified
 def create():
     content = request.json.get("content")
-    profile_id = request.json.get("profile_id")
     post_id = request.json.get("post_id")
 
-    profile = Profile.query.get(profile_id)
+    identity = get_identity()
     post = Post.query.get(post_id)
     
-    if not content or not post_id or not profile:
+    if not content or not post or not identity or not identity.profile_id:
         return jsonify({
             "error": "Request data is not valid. Some field is missing."
         }), 400
     
-    comment = Comment(content, post.id, profile.id)
+    comment = Comment(content, post.id, identity.profile_id)
 
     db.session.add(comment)
+    Post.count_comment(post.id)
     db.session.commit()
 
-    return comment_schema.jsonify(comment), 201
+    return fast_jsonify(dump_comment(comment), 201)
 
 
 @comments.route("", methods=["GET"])
 def get_all():
-    pass
+    post_id = request.args.get("post_id", type=int)
+    if not post_id or not Post.query.get(post_id):
+        return jsonify({
+            "error": "Post not found."
+        }), 404
+    fields, error = get_fields(CommentSchema)
+    if error:
+        return jsonify({
+            "error": error
+        }), 400
+    cursor = request.args.get("cursor")
+    decoded_cursor = decode_cursor(cursor) if cursor else None
+    if cursor and not decoded_cursor:
+        return jsonify({
+            "error": "Invalid cursor."
+        }), 400
+    query = Comment.query.filter_by(post_id=post_id).options(*__load_options(fields))
+    # oldest first, the order a discussion is read in
+    page, next_cursor = paginate_by_cursor(
+        query, Comment, decoded_cursor, get_page_size(), newest_first=False)
+    return conditional_jsonify({
+        "comments": CommentSchema(many=True, only=fields).dump(page),
+        "next_cursor": next_cursor
+    })
 
 
 @comments.route("/<int:id>", methods=["GET"])
 def get(id: int):
-    pass
+    fields, error = get_fields(CommentSchema)
+    if error:
+        return jsonify({
+            "error": error
+        }), 400
+    comment = Comment.query.options(*__load_options(fields)).get(id)
+    if not comment:
+        return jsonify({
+            "error": "Comment not found."
+        }), 404
+    return conditional_jsonify(CommentSchema(only=fields).dump(comment))
 
 
 @comments.route("/<int:id>", methods=["PUT"])
+@is_token_verified
 def update(id: int):
-    pass
+    identity = get_identity()
+    comment = Comment.query.get(int(id))
+    content = request.json.get("content")
+    if not identity or not identity.profile_id or not comment:
+        return jsonify({
+            "error": "Profile or comment not found."
+        }), 404
+    if identity.profile_id != comment.profile_id:
+        return jsonify({
+            "error": "You can't edit this comment."
+        }), 406
+    if not content:
+        return jsonify({
+            "error": "Request data is not valid. Some field is missing."
+        }), 400
+    comment.content = content
+    comment.updated_at = datetime.utcnow()
+    db.session.commit()
+
+    return fast_jsonify(dump_comment(comment))
 
 
 @comments.route("/<int:id>", methods=["DELETE"])
 @is_token_verified
 def delete(id: int):
-    user_id = get_user()
-    profile = User.query.get(user_id).profile
+    identity = get_identity()
     comment = Comment.query.get(int(id))
-    if not profile or not comment:
+    if not identity or not identity.profile_id or not comment:
         return jsonify({
             "error": "Profile or comment not found."
         }), 404
-    if profile.id!=comment.profile.id:
+    if identity.profile_id != comment.profile_id:
         return jsonify({
             "error": "You can't delete this comment."
         }), 406
+    Post.count_comment(comment.post_id, -1)
     db.session.delete(comment)
     db.session.commit()
     
@@ -0,0 +1,111 @@
+from flask import Blueprint, Response, jsonify, request
+from flask_login import current_user, login_required
+from flaskr import db
+from flaskr.models import Event, Message
+from flaskr.schema import message_schema, message_schemas
+from flaskr.streams import chat_listener, event_stream, sse_event
+from flaskr.utils import decode_cursor, paginate_by_cursor
+from sqlalchemy.orm import joinedload
+
+messages = Blueprint("messages", __name__, url_prefix="/api/v1/messages")
+
+MESSAGES_PER_PAGE = 30
+MESSAGE_MAX_LENGTH = 1000
+
+
+def __can_chat(event: Event) -> bool:
+    return current_user.profile.id == event.host_id \
+        or event.is_profile_going(current_user.profile.id)
+
+
+@messages.route("/<int:event_id>", methods=["POST"])
+@login_required
+def create(event_id: int):
+    content = request.json.get("content")
+    event = Event.query.get(event_id)
+    if not event:
+        return jsonify({
+            "error": "Event not found."
+        }), 404
+    if not __can_chat(event):
+        return jsonify({
+            "error": "Only members or host can message in this event."
+        }), 401
+    if not content or not content.strip() or len(content) > MESSAGE_MAX_LENGTH:
+        return jsonify({
+            "error": f"Message must be between 1 and {MESSAGE_MAX_LENGTH} characters."
+        }), 400
+
+    message = Message(content.strip(), None, current_user.profile.id, event.id)
+    db.session.add(message)
+    db.session.flush()
+    data = message_schema.dump(message)
+    chat_listener.publish(event.id, data)
+    db.session.commit()
+
+    return jsonify(data), 201
+
+
+@messages.route("/<int:event_id>", methods=["GET"])
+@login_required
+def get_all(event_id: int):
+    event = Event.query.get(event_id)
+    if not event:
+        return jsonify({
+            "error": "Event not found."
+        }), 404
+    if not __can_chat(event):
+        return jsonify({
+            "error": "Only members or host can read the messages of this event."
+        }), 401
+    cursor = request.args.get("cursor")
+    decoded_cursor = decode_cursor(cursor) if cursor else None
+    if cursor and not decoded_cursor:
+        return jsonify({
+            "error": "Invalid cursor."
+        }), 400
+    query = Message.query.filter_by(event_id=event.id) \
+        .options(joinedload(Message.sender))
+    page, next_cursor = paginate_by_cursor(
+        query, Message, decoded_cursor, MESSAGES_PER_PAGE)
+    # pages go back in time, messages inside a page read oldest first
+    return jsonify({
+        "messages": message_schemas.dump(reversed(page)),
+        "next_cursor": next_cursor
+    }), 200
+
+
+@messages.route("/<int:event_id>/stream")
+@login_required
+def stream(event_id: int):
+    event = Event.query.get(event_id)
+    if not event:
+        return jsonify({
+            "error": "Event not found."
+        }), 404
+    if not __can_chat(event):
+        return jsonify({
+            "error": "Only members or host can read the messages of this event."
+        }), 401
+
+    # subscribing before the catch up query leaves no gap, duplicates are dropped by id on the client
+    queue = chat_listener.subscribe(event_id)
+    missed = []
+    # a stream that has not delivered a message yet has no Last-Event-ID, the client
+    # then sends the newest message it shows, so a reconnect gap is caught up too
+    last_event_id = request.headers.get("Last-Event-ID", type=int)
+    if last_event_id is None:
+        last_event_id = request.args.get("since", type=int)
+    if last_event_id is not None:
+        missed = message_schemas.dump(Message.query
+                                      .filter(Message.event_id == event_id, Message.id > last_event_id)
+                                      .options(joinedload(Message.sender))
+                                      .order_by(Message.id).limit(MESSAGES_PER_PAGE).all())
+
+    events = event_stream(queue, missed, lambda data: sse_event(data, data["id"], "message"),
+                          lambda: chat_listener.unsubscribe(event_id, queue))
+    # the app context, and with it the database session, ends before streaming starts
+    return Response(events, mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
@@ -1,95 +1,92 @@
 from flask import Blueprint, flash, jsonify, request
 from flask_login import current_user, login_required
 from flaskr import app, db
-from flaskr.api.utils import get_user
+from flaskr.api.utils import get_identity
 from flaskr.decorators import is_token_verified
 from flaskr.models import Comment, Event, Post, Profile, Reply, User
-from flaskr.schema import (comment_schema, comment_schemas, post_schema,
-                           post_schemas, reply_schema, reply_schemas)
+from flaskr.schema import (comment_schema, comment_schemas, dump_post,
+                           fast_jsonify, post_schema, post_schemas,
+                           reply_schema, reply_schemas)
 
 posts = Blueprint("posts", __name__, url_prefix="/api/v1/posts")
 
 
+VOTE_NAMES = {1: "up", -1: "down", 0: None}
+
+
+def __vote_state(post: Post, state: dict) -> dict:
+    # what a vote button needs, instead of the whole discussion of the post
+    return {
+        "id": post.id,
+        "up_votes": state["up_votes"],
+        "down_votes": state["down_votes"],
+        "vote": VOTE_NAMES[state["vote"]]
+    }
+
+
 @posts.route("", methods=["POST"])
 @is_token_verified
 def create():
     content = request.json.get("content")
-    profile_id = request.json.get("profile_id")
     event_id = request.json.get("event_id")
 
-    profile = Profile.query.get(profile_id)
+    identity = get_identity()
     event = Event.query.get(event_id)
 
-    if not content or not event_id or not profile:
+    if not content or not event or not identity or not identity.profile_id:
         return jsonify({
             "error": "Request data is not valid. Some field is missing."
         }), 400
 
-    if profile.id not in event.members and profile.id != event.host.id:
+    if identity.profile_id != event.host_id and not event.is_profile_going(identity.profile_id):
         return jsonify({
             "error": "Only members or host can post in this event."
         }), 401
 
-    post = Post(content, None, profile.id, event.id)
+    post = Post(content, None, identity.profile_id, event.id)
 
     db.session.add(post)
     db.session.commit()
 
-    return post_schema.jsonify(post), 201
+    return fast_jsonify(dump_post(post), 201)
 
 
 @posts.route("/up-vote/<int:id>", methods=["PATCH"])
 @is_token_verified
 def up_vote(id: int):
-    profile_id = request.json.get("profile_id")
-    profile = User.query.get(profile_id).profile
-
+    identity = get_identity()
     post = Post.query.get(id)
-    if not profile or not post:
+    if not identity or not identity.profile_id or not post:
         return jsonify({
             "error": "Profile or post not found."
         }), 404
-    if profile.id in post.up_vote:
-        post.remove_up_vote(profile.id)
-    else:
-        post.add_up_vote(profile.id)
-    if profile.id in post.down_vote:
-        post.remove_down_vote(profile.id)
-    return post_schema.jsonify(post), 200
+    state = post.toggle_vote(identity.profile_id, 1)
+    return jsonify(__vote_state(post, state)), 200
 
 
 @posts.route("/down-vote/<int:id>", methods=["PATCH"])
 @is_token_verified
 def down_vote(id: int):
-    profile_id = request.json.get("profile_id")
-    profile = User.query.get(profile_id).profile
-
+    identity = get_identity()
     post = Post.query.get(id)
-    if not profile or not post:
+    if not identity or not identity.profile_id or not post:
         return jsonify({
             "error": "Profile or post not found."
         }), 404
-
-    if profile.id in post.down_vote:
-        post.remove_down_vote(profile.id)
-    else:
-        post.add_down_vote(profile.id)
-    if profile.id in post.up_vote:
-        post.remove_up_vote(profile.id)
-    return post_schema.jsonify(post), 200
+    state = post.toggle_vote(identity.profile_id, -1)
+    return jsonify(__vote_state(post, state)), 200
 
 
 @posts.route("/<int:id>", methods=["DELETE"])
 @is_token_verified
 def delete(id: int):
-    user_id = get_user()
-    profile = User.query.get(user_id).profile
+    identity = get_identity()
     post = Post.query.get(int(id))
-    if not profile or not post:
+    if not identity or not identity.profile_id or not post:
         return jsonify({
             "error": "Profile or post not found."
         }), 404
-    if profile.id != post.profile.id:
+    if identity.profile_id != post.profile_id:
         return jsonify({
             "error": "You can't delete this post."
         }), 406
@@ -1,63 +1,128 @@
+from datetime import datetime
+
 from flask import Blueprint, request
 from flask.json import jsonify
 from flaskr import db
-from flaskr.api.utils import get_user
+from flaskr.api.utils import (conditional_jsonify, get_fields, get_page_size,
+                              get_identity)
 from flaskr.decorators import is_token_verified
 from flaskr.models import Comment, Post, Profile, Reply, User
-from flaskr.schema import (comment_schema, comment_schemas, post_schema,
+from flaskr.schema import (ReplySchema, comment_schema, comment_schemas,
+                           dump_reply, fast_jsonify, post_schema,
                            post_schemas, reply_schema, reply_schemas)
+from flaskr.utils import decode_cursor, paginate_by_cursor
+from sqlalchemy.orm import selectinload
 
 replies = Blueprint("replies", __name__, url_prefix="/api/v1/replies")
 
+
+def __load_options(fields) -> list:
+    # the profile is only loaded when it is asked for
+    if fields is None or "profile" in fields:
+        return [selectinload(Reply.profile).selectinload(Profile.user)]
+    return []
+
+
 @replies.route("", methods=["POST"])
 @is_token_verified
 def create():
     content = request.json.get("content")
-    profile_id = request.json.get("profile_id")
     comment_id = request.json.get("comment_id")
 
-    profile = Profile.query.get(profile_id)
+    identity = get_identity()
     comment = Comment.query.get(comment_id)
     
-    if not content or not comment or not profile:
+    if not content or not comment or not identity or not identity.profile_id:
         return jsonify({
             "error": "Request data is not valid. Some field is missing."
         }), 400
     
-    reply = Reply(content, comment.id, profile.id)
+    reply = Reply(content, comment.id, identity.profile_id)
 
     db.session.add(reply)
     db.session.commit()
 
-    return reply_schema.jsonify(reply), 201
+    return fast_jsonify(dump_reply(reply), 201)
 
 
 @replies.route("", methods=["GET"])
 def get_all():
-    pass
+    comment_id = request.args.get("comment_id", type=int)
+    if not comment_id or not Comment.query.get(comment_id):
+        return jsonify({
+            "error": "Comment not found."
+        }), 404
+    fields, error = get_fields(ReplySchema)
+    if error:
+        return jsonify({
+            "error": error
+        }), 400
+    cursor = request.args.get("cursor")
+    decoded_cursor = decode_cursor(cursor) if cursor else None
+    if cursor and not decoded_cursor:
+        return jsonify({
+            "error": "Invalid cursor."
+        }), 400
+    query = Reply.query.filter_by(comment_id=comment_id).options(*__load_options(fields))
+    # oldest first, the order a discussion is read in
+    page, next_cursor = paginate_by_cursor(
+        query, Reply, decoded_cursor, get_page_size(), newest_first=False)
+    return conditional_jsonify({
+        "replies": ReplySchema(many=True, only=fields).dump(page),
+        "next_cursor": next_cursor
+    })
 
 
 @replies.route("/<int:id>", methods=["GET"])
 def get(id: int):
-    pass
+    fields, error = get_fields(ReplySchema)
+    if error:
+        return jsonify({
+            "error": error
+        }), 400
+    reply = Reply.query.options(*__load_options(fields)).get(id)
+    if not reply:
+        return jsonify({
+            "error": "Reply not found."
+        }), 404
+    return conditional_jsonify(ReplySchema(only=fields).dump(reply))
 
 
 @replies.route("/<int:id>", methods=["PUT"])
+@is_token_verified
 def update(id: int):
-    pass
+    identity = get_identity()
+    reply = Reply.query.get(int(id))
+    content = request.json.get("content")
+    if not identity or not identity.profile_id or not reply:
+        return jsonify({
+            "error": "Profile or reply not found."
+        }), 404
+    if identity.profile_id != reply.profile_id:
+        return jsonify({
+            "error": "You can't edit this reply."
+        }), 406
+    if not content:
+        return jsonify({
+            "error": "Request data is not valid. Some field is missing."
+        }), 400
+    reply.content = content
+    reply.updated_at = datetime.utcnow()
+    db.session.commit()
+
+    return fast_jsonify(dump_reply(reply))
 
 
 @replies.route("/<int:id>", methods=["DELETE"])
 @is_token_verified
 def delete(id: int):
-    user_id = get_user()
-    profile = User.query.get(user_id).profile
+    identity = get_identity()
     reply = Reply.query.get(int(id))
-    if not profile or not reply:
+    if not identity or not identity.profile_id or not reply:
         return jsonify({
             "error": "Profile or reply not found."
         }), 404
-    if profile.id!=reply.profile.id:
+    if identity.profile_id != reply.profile_id:
         return jsonify({
             "error": "You can't delete this reply."
         }), 406
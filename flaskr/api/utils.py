@@ -1,24 +1,43 @@
-from jwt import decode
-from jwt.exceptions import InvalidTokenError
-from flask import request, jsonify
-from flaskr import app
+from flask import g, jsonify, request
+from flaskr.identity import cached_identity
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 50
 
 
 def get_user():
-    jwt_token = request.headers.get("Authorization")
-    if not jwt_token:
-        return jsonify({
-            "error": "JTW token is missing."
-        }), 403
-    try:
-        data = decode(jwt_token, app.config.get(
-            "JWT_SECRET_KEY"), algorithms=['HS256'])
-        return data.get("id")
-    except InvalidTokenError:
-        return jsonify({
-            "error": "Invalid token.",
-        }), 403
-    except Exception as e:
-        return jsonify({
-            "error": e.__str__(),
-        }), 500
+    """Id of the user the request's token belongs to, decoded by is_token_verified."""
+    return g.token_claims.get("id")
+
+
+def get_identity():
+    """The caller's Identity, read once per token and ttl, None if the user is gone."""
+    if "identity" not in g:
+        g.identity = cached_identity(get_user(), g.token)
+    return g.identity
+
+
+def get_fields(schema_class):
+    """Reads the comma separated "fields" argument, so clients can leave out nested objects.
+    Returns:
+        tuple: The field names (None for all of them) and an error message if one is unknown.
+    """
+    fields = request.args.get("fields")
+    if not fields:
+        return None, None
+    names = tuple(name.strip() for name in fields.split(",") if name.strip())
+    unknown = [name for name in names if name not in schema_class._declared_fields]
+    if unknown:
+        return None, f"Unknown fields: {', '.join(unknown)}."
+    return names, None
+
+
+def get_page_size() -> int:
+    return min(max(request.args.get("limit", PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+
+
+def conditional_jsonify(data):
+    # the strong ETag is a hash of the body, an unchanged page is answered with 304
+    response = jsonify(data)
+    response.add_etag()
+    return response.make_conditional(request)
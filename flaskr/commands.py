@@ -0,0 +1,350 @@
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from queue import Empty
+
+import click
+from flask.cli import AppGroup
+from PIL import Image
+from sqlalchemy import cast, func, text, update
+
+from flaskr import app, db
+from flaskr.mails import MAIL_QUEUE_KEY, deliver_pending, mail_listener
+from flaskr.models import Event, Message, OutgoingMail, Post, Profile, StoredFile
+from flaskr.profiles.utils import (PHOTO_SIZES, SHARDED_PHOTO_KEY,
+                                   original_key_of, photo_key_for,
+                                   process_photo)
+from flaskr.storage import (media_storage, originals_storage,
+                            quarantine_storage)
+
+media = AppGroup("media", help="Manage uploaded photos.")
+app.cli.add_command(media)
+notifications = AppGroup("notifications", help="Manage stored notifications.")
+app.cli.add_command(notifications)
+mail_queue = AppGroup("mail", help="Send queued mails.")
+app.cli.add_command(mail_queue)
+
+GC_BATCH_SIZE = 500
+RETHUMBNAIL_BATCH_SIZE = 200
+ARCHIVE_BATCH_SIZE = 5000
+MAIL_BATCH_SIZE = 50
+PHOTO_EXTENSIONS = (".jpg", ".jpeg", ".png")
+SHARDED_ORIGINAL_KEY = re.compile(r"^[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.\w+$")
+# every column that stores a "/images/uploads/..." path
+PHOTO_COLUMNS = (Profile.profile_photo, Profile.cover_photo, Event.cover_photo,
+                 Post.photo, Message.message_photo)
+
+
+def __photo_keys(storage):
+    for key in storage.keys():
+        if os.path.splitext(key)[1].lower() in PHOTO_EXTENSIONS:
+            yield key
+
+
+def __batches(keys, size: int):
+    batch = []
+    for key in keys:
+        batch.append(key)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def __referenced_paths(paths: list) -> set:
+    # only the paths of the batch are looked up, memory stays bounded by the batch size
+    referenced = set()
+    for column in PHOTO_COLUMNS:
+        referenced.update(value for value, in
+                          db.session.query(column).filter(column.in_(paths)))
+    # cast, the bound list is a text[] and varchar[] && text[] has no operator
+    for photos, in db.session.query(Event.photos) \
+            .filter(Event.photos.op("&&")(cast(paths, Event.photos.type))):
+        referenced.update(photos)
+    return referenced
+
+
+def __media_orphans(keys: list) -> list:
+    paths = ["/images/uploads/" + key for key in keys]
+    referenced = __referenced_paths(paths)
+    return [key for key, path in zip(keys, paths) if path not in referenced]
+
+
+def __original_orphans(keys: list) -> list:
+    sharded = [key for key in keys if SHARDED_ORIGINAL_KEY.match(key)]
+    # originals of uploads made before content addressing share the photo's name
+    legacy = [key for key in keys if not SHARDED_ORIGINAL_KEY.match(key)]
+    counted = set(key for key, in db.session.query(StoredFile.key).filter(
+        StoredFile.store == "originals", StoredFile.key.in_(sharded),
+        StoredFile.ref_count > 0))
+    orphans = [key for key in sharded if key not in counted]
+    if legacy:
+        orphans.extend(__media_orphans(legacy))
+    return orphans
+
+
+def __remove(storage, store: str, key: str, quarantine: bool):
+    if quarantine:
+        with storage.open(key) as file:
+            quarantine_storage.save(f"{store}/{key}", file)
+    storage.delete(key)
+    if store == "media" and SHARDED_PHOTO_KEY.match(key):
+        # the original loses every reference the photo had
+        count = StoredFile.forget("media", key)
+        if count:
+            StoredFile.release("originals", original_key_of(key), count)
+    elif store == "originals":
+        StoredFile.forget("originals", key)
+
+
+@media.command("gc")
+@click.option("--dry-run", is_flag=True, help="Only report the orphans.")
+@click.option("--quarantine", is_flag=True,
+              help="Move orphans to the quarantine folder instead of deleting them.")
+@click.option("--min-age", default=24, show_default=True,
+              help="Hours a file must exist before it is collected.")
+@click.option("--batch-size", default=GC_BATCH_SIZE, show_default=True,
+              help="Files checked and removed per database round trip.")
+def collect_orphans(dry_run: bool, quarantine: bool, min_age: int, batch_size: int):
+    """Deletes uploaded photos no profile, event, post or message refers to.
+    Photos are collected before originals, so originals of removed photos
+    are collected in the same run.
+    """
+    # uploads still being processed or committed are younger than this
+    cutoff = time.time() - min_age * 3600
+    for store, storage, find_orphans in (("media", media_storage, __media_orphans),
+                                         ("originals", originals_storage, __original_orphans)):
+        scanned = collected = 0
+        for keys in __batches(__photo_keys(storage), batch_size):
+            scanned = scanned + len(keys)
+            for key in find_orphans(keys):
+                try:
+                    if storage.modified_at(key) > cutoff:
+                        continue
+                    if dry_run:
+                        click.echo(f"{store}: {key}")
+                    else:
+                        __remove(storage, store, key, quarantine)
+                except OSError as error:
+                    app.logger.warning("Could not collect %s %s: %s", store, key, error)
+                    continue
+                collected = collected + 1
+            db.session.commit()
+        action = "orphaned" if dry_run else ("quarantined" if quarantine else "deleted")
+        click.echo(f"{store}: {scanned} files scanned, {collected} {action}.")
+
+
+def __rethumbnail_job(key: str, force: bool):
+    # returns the process_photo arguments, or None when the photo is skipped
+    folder_name = key.split("/", 1)[0]
+    if folder_name not in PHOTO_SIZES:
+        return None
+    width, height = PHOTO_SIZES[folder_name]
+    original_key = original_key_of(key)
+    if not originals_storage.exists(original_key):
+        # uploaded before originals were kept, nothing to make it from
+        return None
+    match = SHARDED_PHOTO_KEY.match(key)
+    if not match:
+        # names from before content addressing carry no size, the header tells it
+        if not force:
+            with media_storage.open(key) as file:
+                if Image.open(file).size == (width, height):
+                    return None
+        return original_key, key, width, height
+    new_key = photo_key_for(match.group("hash"), match.group("ext"), folder_name)
+    if new_key == key and not force:
+        return None
+    return original_key, new_key, width, height
+
+
+def __move_references(old_key: str, new_key: str):
+    old_path = "/images/uploads/" + old_key
+    new_path = "/images/uploads/" + new_key
+    for column in PHOTO_COLUMNS:
+        db.session.execute(update(column.class_).where(column == old_path)
+                           .values({column: new_path}))
+    # not synchronized, the session can not evaluate ANY() in Python
+    db.session.execute(update(Event).where(Event.photos.any(old_path))
+                       .values(photos=func.array_replace(Event.photos, old_path, new_path))
+                       .execution_options(synchronize_session=False))
+    count = StoredFile.forget("media", old_key)
+    if count:
+        StoredFile.add_reference("media", new_key, count)
+
+
+def __read_checkpoint(checkpoint: str):
+    try:
+        with open(checkpoint) as file:
+            return file.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def __write_checkpoint(checkpoint: str, key: str):
+    with open(checkpoint + ".tmp", "w") as file:
+        file.write(key)
+    os.replace(checkpoint + ".tmp", checkpoint)
+
+
+@media.command("rethumbnail")
+@click.option("--workers", default=os.cpu_count(), show_default=True,
+              help="Processes cropping photos in parallel.")
+@click.option("--force", is_flag=True,
+              help="Also reprocess photos already at the size of their folder.")
+@click.option("--checkpoint", default="rethumbnail.checkpoint", show_default=True,
+              type=click.Path(dir_okay=False),
+              help="File the last finished photo is kept in, a rerun resumes after it.")
+@click.option("--batch-size", default=RETHUMBNAIL_BATCH_SIZE, show_default=True,
+              help="Photos processed between two checkpoints.")
+def rethumbnail(workers: int, force: bool, checkpoint: str, batch_size: int):
+    """Recreates stored photos from their originals at the sizes in PHOTO_SIZES.
+    A photo whose size changed gets a new name, the database is updated to it
+    and the old file is removed.
+    """
+    resume_after = __read_checkpoint(checkpoint)
+    if resume_after:
+        click.echo(f"Resuming after {resume_after}.")
+    started = time.monotonic()
+    processed = skipped = failed = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for keys in __batches(__photo_keys(media_storage), batch_size):
+            # keys come in lexical order, so everything up to the checkpoint is done
+            keys = [key for key in keys if resume_after is None or key > resume_after]
+            if not keys:
+                continue
+            jobs = {}
+            for key in keys:
+                job = __rethumbnail_job(key, force)
+                if job is None:
+                    skipped = skipped + 1
+                    continue
+                jobs[pool.submit(process_photo, *job)] = (key, job[1])
+            replaced = []
+            for future in as_completed(jobs):
+                key, new_key = jobs[future]
+                if future.exception():
+                    failed = failed + 1
+                    app.logger.warning("Could not reprocess %s: %s", key, future.exception())
+                    continue
+                if new_key != key:
+                    __move_references(key, new_key)
+                    replaced.append(key)
+                processed = processed + 1
+            db.session.commit()
+            # old files go only once nothing in the database points at them
+            for key in replaced:
+                media_storage.delete(key)
+            __write_checkpoint(checkpoint, keys[-1])
+            elapsed = time.monotonic() - started
+            click.echo(f"{processed} reprocessed, {skipped} skipped, {failed} failed, "
+                       f"{processed / elapsed:.1f} images/sec")
+    if os.path.exists(checkpoint):
+        os.unlink(checkpoint)
+    click.echo("Done.")
+
+
+def __archive_batch(cutoff: datetime, batch_size: int, delete: bool) -> int:
+    # one statement moves a batch, SKIP LOCKED lets two runs share the work
+    batch = """
+        SELECT id FROM notification
+        WHERE is_readed AND created_at < :cutoff
+        ORDER BY created_at LIMIT :batch_size
+        FOR UPDATE SKIP LOCKED
+    """
+    if delete:
+        statement = f"DELETE FROM notification WHERE id IN ({batch})"
+    else:
+        statement = f"""
+            WITH moved AS (
+                DELETE FROM notification WHERE id IN ({batch})
+                RETURNING id, message, link, profile_id, created_at, updated_at
+            )
+            INSERT INTO notification_archive
+                (id, message, link, profile_id, created_at, updated_at, archived_at)
+            SELECT id, message, link, profile_id, created_at, updated_at, :archived_at
+            FROM moved
+        """
+    result = db.session.execute(text(statement), {
+        "cutoff": cutoff,
+        "batch_size": batch_size,
+        "archived_at": datetime.utcnow()
+    })
+    db.session.commit()
+    return result.rowcount
+
+
+@notifications.command("archive")
+@click.option("--older-than", default=None, type=int,
+              help="Days a read notification is kept. [default: NOTIFICATION_RETENTION_DAYS]")
+@click.option("--delete", is_flag=True,
+              help="Delete the notifications instead of moving them to the archive.")
+@click.option("--batch-size", default=ARCHIVE_BATCH_SIZE, show_default=True,
+              help="Notifications moved per transaction.")
+def archive_notifications(older_than: int, delete: bool, batch_size: int):
+    """Moves read notifications past the retention age to notification_archive.
+    Unread notifications are never moved, so unread counters stay as they are.
+    Meant to run daily from cron or a systemd timer, an interrupted run just
+    leaves the rest for the next one.
+    """
+    if older_than is None:
+        older_than = app.config["NOTIFICATION_RETENTION_DAYS"]
+    cutoff = datetime.utcnow() - timedelta(days=older_than)
+    started = time.monotonic()
+    total = 0
+    while True:
+        count = __archive_batch(cutoff, batch_size, delete)
+        total = total + count
+        if count < batch_size:
+            break
+    action = "deleted" if delete else "archived"
+    click.echo(f"{total} notifications {action} in {time.monotonic() - started:.1f}s.")
+
+
+@mail_queue.command("worker")
+@click.option("--batch-size", default=MAIL_BATCH_SIZE, show_default=True,
+              help="Mails sent over one SMTP connection.")
+@click.option("--interval", default=10, show_default=True,
+              help="Seconds between checks for due retries when nothing is queued.")
+@click.option("--once", is_flag=True, help="Send what is due and exit.")
+def mail_worker(batch_size: int, interval: int, once: bool):
+    """Sends the mails queued by send_mail, one SMTP connection per batch.
+    Failed mails are retried with backoff, after MAIL_MAX_ATTEMPTS they are
+    marked dead and kept for `flask mail requeue`.
+    """
+    queue = None if once else mail_listener.subscribe(MAIL_QUEUE_KEY)
+    while True:
+        started = time.monotonic()
+        claimed, sent, failed = deliver_pending(batch_size)
+        if claimed:
+            elapsed = time.monotonic() - started
+            click.echo(f"{sent} sent, {failed} failed, {sent / elapsed:.1f} mails/sec")
+        if claimed == batch_size:
+            continue
+        if once:
+            break
+        # woken by a queued mail, or by the interval for retries coming due
+        try:
+            queue.get(timeout=interval)
+        except Empty:
+            pass
+
+
+@mail_queue.command("requeue")
+@click.option("--id", "ids", multiple=True, type=int,
+              help="Only requeue these mails, all dead ones when left out.")
+def requeue_mails(ids: tuple):
+    """Gives dead-lettered mails a fresh set of attempts."""
+    query = OutgoingMail.query.filter(OutgoingMail.status == "dead")
+    if ids:
+        query = query.filter(OutgoingMail.id.in_(ids))
+    count = query.update({
+        OutgoingMail.status: "pending",
+        OutgoingMail.attempts: 0,
+        OutgoingMail.next_attempt_at: datetime.utcnow()
+    }, synchronize_session=False)
+    db.session.commit()
+    click.echo(f"{count} mails requeued.")
@@ -1,11 +1,13 @@
+from datetime import datetime
 from functools import wraps
 
-from flask import flash, jsonify, redirect, request, session, url_for
+from flask import flash, g, jsonify, redirect, request, session, url_for
 from flask_login import current_user
 from jwt import decode
 from jwt.exceptions import InvalidTokenError
 
 from flaskr import app
+from flaskr.identity import cached_identity
 from flaskr.models import Role, User
 
 
@@ -93,8 +95,10 @@ def is_token_verified(func):
                 "error": "JTW token is missing."
             }), 403
         try:
-            data = decode(jwt_token, app.config.get(
+            # decoded once, handlers read the claims from g
+            g.token_claims = decode(jwt_token, app.config.get(
                 "JWT_SECRET_KEY"), algorithms=['HS256'])
+            g.token = jwt_token
         except InvalidTokenError:
             return jsonify({
                 "error": "Invalid token.",
@@ -103,5 +107,19 @@ def is_token_verified(func):
             return jsonify({
                 "error": e.__str__(),
             }), 500
+        # the same checks as the pages, on the cached identity instead of the session user
+        g.identity = cached_identity(g.token_claims.get("id"), jwt_token)
+        if g.identity is None:
+            return jsonify({
+                "error": "Invalid token.",
+            }), 403
+        if not g.identity.is_verified:
+            return jsonify({
+                "error": "Account is not verified.",
+            }), 403
+        if g.identity.banned_until and g.identity.banned_until > datetime.utcnow():
+            return jsonify({
+                "error": "Account is banned.",
+            }), 403
         return func(*args, **kwargs)
     return wrapper
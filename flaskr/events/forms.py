@@ -3,6 +3,7 @@ from datetime import datetime
 from flask_login import current_user
 from flask_wtf import FlaskForm
 from flask_wtf.file import FileAllowed
+from flaskr.profiles.utils import check_photo
 from wtforms import (DateTimeLocalField, IntegerField, StringField,
                      SubmitField, TextAreaField, FileField)
 from wtforms.validators import (URL, DataRequired, Length, Optional,
@@ -44,6 +45,12 @@ class EventForm(FlaskForm):
                                   FileAllowed(["jpg", "jpeg", "png"])])
     submit = SubmitField("Submit")
 
+    def validate_event_cover_photo(self, event_cover_photo):
+        if event_cover_photo.data:
+            error = check_photo(event_cover_photo.data)
+            if error:
+                raise ValidationError(error)
+
     def validate_hotel_web_link(self, hotel_web_link):
         if not self.hotel_name.data and hotel_web_link.data:
             raise ValidationError(
@@ -1,12 +1,18 @@
-from flask import Blueprint, flash, redirect, render_template, request, url_for
+from flask import (Blueprint, flash, jsonify, redirect, render_template,
+                   request, url_for)
 from flask_login import current_user, login_required
 from flaskr import db
 from flaskr.decorators import is_host, is_verified
 from flaskr.events.forms import *
-from flaskr.models import (Decline, Event, Notification, PaymentPending, Post,
-                           Profile)
+from flaskr.events.utils import (POST_SORTS, caller_votes, confirm_seat,
+                                 decode_posts_cursor, paginate_events,
+                                 paginate_posts, reserve_seat)
+from flaskr.loaders import load_many
+from flaskr.models import (Decline, Event, Notification, PaymentPending,
+                           Profile, User)
 from flaskr.notifications.utils import NotificationMessage
-from flaskr.profiles.utils import remove_photo, save_photos
+from flaskr.profiles.utils import check_photo, remove_photo, save_photos
+from flaskr.utils import decode_cursor
 from sqlalchemy import desc
 
 events = Blueprint("events", __name__, url_prefix="/events")
@@ -14,8 +20,55 @@ events = Blueprint("events", __name__, url_prefix="/events")
 
 @events.route("/")
 def get_events():
-    all_events = Event.query.order_by(desc(Event.created_at)).all()
-    return render_template("events/events.html", events=all_events, len=len)
+    events, next_cursor = paginate_events()
+    return render_template("events/events.html", events=events,
+                           next_cursor=next_cursor, len=len)
+
+
+@events.route("/page")
+def get_events_page():
+    cursor = request.args.get("cursor")
+    decoded_cursor = decode_cursor(cursor) if cursor else None
+    if cursor and not decoded_cursor:
+        return jsonify({
+            "error": "Invalid cursor."
+        }), 400
+    page, next_cursor = paginate_events(decoded_cursor)
+    return jsonify({
+        "html": render_template("events/events-sub-file/event-page.html",
+                                events=page, len=len),
+        "next_cursor": next_cursor
+    }), 200
+
+
+@events.route("/<int:id>/posts")
+def get_posts_page(id: int):
+    event = Event.query.get(id)
+    if not event:
+        return jsonify({
+            "error": "Event not found."
+        }), 404
+    sort = request.args.get("sort", "new")
+    if sort not in POST_SORTS:
+        return jsonify({
+            "error": "Invalid sort."
+        }), 400
+    cursor = request.args.get("cursor")
+    decoded_cursor = decode_posts_cursor(cursor, sort) if cursor else None
+    if cursor and not decoded_cursor:
+        return jsonify({
+            "error": "Invalid cursor."
+        }), 400
+    posts, next_cursor = paginate_posts(id, decoded_cursor, sort=sort)
+    is_member = current_user.is_authenticated and current_user.profile \
+        and event.is_profile_going(current_user.profile.id)
+    votes = caller_votes(current_user.is_authenticated and current_user.profile, posts)
+    return jsonify({
+        "html": render_template("events/view-event/post-sub-file/post-page.html",
+                                posts=posts, event=event, is_member=is_member,
+                                votes=votes, len=len),
+        "next_cursor": next_cursor
+    }), 200
 
 
 @events.route("/<int:id>")
@@ -28,25 +81,39 @@ def view_event(id: int):
     recive_number = event.phone_number or "01xxxxxxxxx"
 
     if query_str == "messages":
+        can_chat = current_user.is_authenticated and current_user.profile \
+            and (current_user.profile.id == event.host_id
+                 or event.is_profile_going(current_user.profile.id))
         return render_template("events/view-event/messages.html",
                                len=len, str=str, event=event,
-                               active='messages', recive_number=recive_number)
+                               active='messages', recive_number=recive_number,
+                               can_chat=can_chat)
     if query_str == "members":
         sub_menu = "members"
         if members_sub_query == "pending":
             sub_menu = "pending-members"
         elif members_sub_query == "decline":
             sub_menu = "decline-members"
+        else:
+            # the members list shows each member's user role and email
+            load_many(User, [member.user_id for member in event.get_members()])
         return render_template("events/view-event/members.html",
                                len=len, str=str, event=event,
                                active="members", sub_menu=sub_menu,
                                recive_number=recive_number)
     if query_str == "posts":
-        posts = Post.query.filter_by(event_id=id).order_by(desc(Post.created_at)).all()
+        sort = request.args.get("sort")
+        if sort not in POST_SORTS:
+            sort = "new"
+        posts, next_cursor = paginate_posts(id, sort=sort)
+        is_member = current_user.is_authenticated and current_user.profile \
+            and event.is_profile_going(current_user.profile.id)
+        votes = caller_votes(current_user.is_authenticated and current_user.profile, posts)
         return render_template("events/view-event/posts.html",
                                len=len, str=str, event=event,
                                active='posts', recive_number=recive_number,
-                               posts=posts)
+                               posts=posts, next_cursor=next_cursor, sort=sort,
+                               is_member=is_member, votes=votes)
     # if none of the avobe is true
     return render_template("events/view-event/details.html",
                            len=len, str=str, event=event,
@@ -66,12 +133,10 @@ def create_event():
                       form.event_max_members.data, form.hotel_name.data, form.hotel_web_link.data, form.phone_number.data)
         if form.event_cover_photo.data:
             # saving
-            photo_file = save_photos(
-                form.event_cover_photo.data, event.id, "eventCover", 1180, 450)
+            photo_file = save_photos(form.event_cover_photo.data, "eventCover")
             event.cover_photo = "/images/uploads/eventCover/" + photo_file
         db.session.add(event)
         db.session.commit()
-        current_user.profile.add_joined_events(event.id)
         flash(f"Event information saved", "success")
         return redirect(url_for("events.view_event", id=event.id))
     return render_template("events/create-event.html", form=form)
@@ -87,8 +152,10 @@ def event_info(id: int):
         flash("Only the host can access this route", "danger")
         return redirect(url_for("events.view_event", id=event.id))
     form = EventForm()
-    if request.method == "POST":
-        # post request
+    # the page edits part of the form, only the photo goes through the form's validators,
+    # a rejected one is shown on its field and nothing is saved
+    if request.method == "POST" \
+            and form.event_cover_photo.validate(form, [EventForm.validate_event_cover_photo]):
         event.title = form.event_title.data
         event.description = form.event_description.data
         event.place_name = form.event_location.data
@@ -104,8 +171,7 @@ def event_info(id: int):
             if not ("/images/default/CoverPhotos/event-default.png" in file_path):
                 remove_photo(file_path)
             # saving
-            photo_file = save_photos(
-                form.event_cover_photo.data, event.id, "eventCover", 1180, 450)
+            photo_file = save_photos(form.event_cover_photo.data, "eventCover")
             event.cover_photo = "/images/uploads/eventCover/" + photo_file
         db.session.commit()
         flash(f"Event information saved", "success")
@@ -150,26 +216,19 @@ def add_photos(id: int):
     if event.host.id != current_user.profile.id:
         flash("Only the host can access this route", "danger")
         return redirect(url_for("events.view_event", id=event.id))
-    photo_1 = request.files.get("photo_1")
-    photo_2 = request.files.get("photo_2")
-    photo_3 = request.files.get("photo_3")
-
-    if photo_1:
-        photo_file = save_photos(
-            photo_1, event.id, "eventPhotos", 1280, 720)
-        event.add_photo("/images/uploads/eventPhotos/" + photo_file)
-
-    if photo_2:
-        photo_file = save_photos(
-            photo_2, event.id, "eventPhotos", 1280, 720)
-        event.add_photo("/images/uploads/eventPhotos/" + photo_file)
-
-    if photo_3:
-        photo_file = save_photos(
-            photo_3, event.id, "eventPhotos", 1280, 720)
-        event.add_photo("/images/uploads/eventPhotos/" + photo_file)
-
-    flash("Photos uploaded successfully.", "success")
+    file_paths = []
+    for field in ("photo_1", "photo_2", "photo_3"):
+        photo = request.files.get(field)
+        if photo:
+            error = check_photo(photo)
+            if error:
+                flash(error, "danger")
+                continue
+            photo_file = save_photos(photo, "eventPhotos")
+            file_paths.append("/images/uploads/eventPhotos/" + photo_file)
+    if file_paths:
+        event.add_photos(file_paths)
+        flash("Photos uploaded successfully.", "success")
     return redirect(url_for("events.view_event", id=event.id))
 
 
@@ -183,16 +242,19 @@ def register_for_event(id: int):
         return redirect(url_for("mains.homepage"))
     if not trnx_id:
         return redirect(url_for("events.view_event", id=id))
-    if not event.event_status().get("status"):
-        flash("Registration closed.", "danger")
+    event_status = event.event_status()
+    if not event_status.get("status"):
+        flash(f"{event_status.get('message')}.", "danger")
+        return redirect(url_for("events.view_event", id=id))
+    reservation = reserve_seat(event, current_user.profile.id, trnx_id)
+    if not reservation["is_reserved"]:
+        flash(reservation["message"], "danger")
         return redirect(url_for("events.view_event", id=id))
-    pending = PaymentPending(trnx_id, current_user.profile.id, id)
-    db.session.add(pending)
     notify = Notification(NotificationMessage.pending_payments(current_user.profile.get_fullname(
     )), url_for("events.view_event", id=id, filter="members", members="pending"), event.host.id)
     db.session.add(notify)
     db.session.commit()
-    flash("Request successfully sent.", "success")
+    flash(reservation["message"], "success")
     return redirect(url_for("events.view_event", id=id))
 
 
@@ -213,21 +275,23 @@ def accept_pending_members(event_id: int, profile_id: int):
     if current_user.profile.id != event.host.id:
         flash("You can not access the route.", "danger")
         return redirect(url_for("events.view_event", id=event_id, filter="members", members="pending"))
-    pending_payments = event.pending_payments
-    for i in pending_payments:
-        if profile_id == i.profile.id:
-            i.approve()
-            if i.decline:
-                i.decline.resolve()
-            break
-    event.add_members(profile_id)
-    profile.add_joined_events(event.id)
+    pending_payment = PaymentPending.query.filter_by(
+        event_id=event.id, profile_id=profile_id, is_approved=False) \
+        .order_by(desc(PaymentPending.id)).first()
+    if not pending_payment:
+        flash("No pending registration found for this profile.", "danger")
+        return redirect(url_for("events.view_event", id=event_id, filter="members", members="pending"))
+
+    confirmation = confirm_seat(event, pending_payment)
+    if not confirmation["is_confirmed"]:
+        flash(confirmation["message"], "danger")
+        return redirect(url_for("events.view_event", id=event_id, filter="members", members="pending"))
     notification = Notification(NotificationMessage.approve_event_registration(),
                                 url_for("events.view_event", id=event.id),
                                 profile_id)
     db.session.add(notification)
     db.session.commit()
-    flash("Member approved.", "info")
+    flash(confirmation["message"], "info")
     return redirect(url_for("events.view_event", id=event_id, filter="members", members="pending"))
 
 
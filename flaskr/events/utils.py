@@ -0,0 +1,117 @@
+from datetime import datetime, timedelta
+
+from flaskr import app, db
+from flaskr.models import (Comment, Event, EventMember, PaymentPending, Post,
+                           PostVote, Reply)
+from flaskr.utils import (decode_cursor, decode_score_cursor,
+                          paginate_by_cursor, paginate_by_score)
+from sqlalchemy.orm import joinedload, subqueryload
+
+EVENTS_PER_PAGE = 12
+POSTS_PER_PAGE = 10
+POST_SORTS = ("new", "hot", "top")
+# ranked orderings read the precomputed scores through their indexes
+RANKED_POST_COLUMNS = {"hot": Post.hot_score, "top": Post.top_score}
+
+
+def paginate_events(cursor=None, per_page: int = EVENTS_PER_PAGE):
+    """Keyset pagination over events, newest first.
+    Returns:
+        tuple: The list of events and the cursor of the next page (None on the last page).
+    """
+    return paginate_by_cursor(Event.query, Event, cursor, per_page)
+
+
+def decode_posts_cursor(cursor: str, sort: str = "new"):
+    """Returns the position a posts cursor of the ordering points at, or None if malformed."""
+    if sort in RANKED_POST_COLUMNS:
+        return decode_score_cursor(cursor)
+    return decode_cursor(cursor)
+
+
+def paginate_posts(event_id: int, cursor=None, per_page: int = POSTS_PER_PAGE, sort: str = "new"):
+    """Keyset pagination over the posts of an event, newest, hottest or top first.
+    Authors, comments, replies and their authors are loaded up front, so a page
+    costs the same three queries however long its discussions are.
+    Args:
+        sort (str): One of POST_SORTS.
+    Returns:
+        tuple: The list of posts and the cursor of the next page (None on the last page).
+    """
+    # subqueries rather than IN lists of keys, those are split every 500 keys
+    # and would add queries to long discussions
+    comments = subqueryload(Post.comments)
+    query = Post.query.filter_by(event_id=event_id).options(
+        joinedload(Post.profile),
+        comments.joinedload(Comment.profile),
+        comments.subqueryload(Comment.replies).joinedload(Reply.profile))
+    if sort in RANKED_POST_COLUMNS:
+        return paginate_by_score(query, Post, RANKED_POST_COLUMNS[sort], cursor, per_page)
+    return paginate_by_cursor(query, Post, cursor, per_page)
+
+
+def caller_votes(profile, posts: list) -> dict:
+    """Votes of the viewing profile on a page of posts, by post id, in one query."""
+    if not profile:
+        return {}
+    return PostVote.of(profile.id, [post.id for post in posts])
+
+
+def __lock_event(event_id: int):
+    # registrations and approvals of one event queue up behind this row lock
+    db.session.query(Event.id).filter(Event.id == event_id) \
+        .with_for_update().scalar()
+
+
+def __active_holds(event_id: int):
+    return PaymentPending.query.filter(
+        PaymentPending.event_id == event_id,
+        PaymentPending.is_approved == False,
+        PaymentPending.hold_expires_at > datetime.utcnow(),
+        ~PaymentPending.decline.has())
+
+
+def __taken_seats(event_id: int, excluded_payment_id: int = None) -> int:
+    holds = __active_holds(event_id)
+    if excluded_payment_id:
+        holds = holds.filter(PaymentPending.id != excluded_payment_id)
+    return EventMember.query.filter_by(event_id=event_id).count() + holds.count()
+
+
+def reserve_seat(event: Event, profile_id: int, trnx: str):
+    """Holds a seat of the event for a pending payment.
+    The hold is added to the session, the caller commits it.
+    Returns:
+        dict: "is_reserved", a "message" and the new "payment" if reserved.
+    """
+    __lock_event(event.id)
+    if event.is_profile_going(profile_id) \
+            or __active_holds(event.id).filter(PaymentPending.profile_id == profile_id).first():
+        db.session.rollback()
+        return {"is_reserved": False, "message": "Already registered for this event."}
+    if __taken_seats(event.id) >= event.max_member:
+        db.session.rollback()
+        return {"is_reserved": False, "message": "Sold out. No seats left for this event."}
+    hold_expires_at = datetime.utcnow() + timedelta(seconds=app.config["SEAT_HOLD_TIME"])
+    payment = PaymentPending(trnx, profile_id, event.id, hold_expires_at)
+    db.session.add(payment)
+    return {"is_reserved": True, "message": "Request successfully sent.", "payment": payment}
+
+
+def confirm_seat(event: Event, payment: PaymentPending):
+    """Turns the seat held by a pending payment into a membership.
+    An expired hold is still confirmed when a seat is free.
+    Returns:
+        dict: "is_confirmed" and a "message".
+    """
+    __lock_event(event.id)
+    if __taken_seats(event.id, payment.id) >= event.max_member \
+            and not event.is_profile_going(payment.profile_id):
+        db.session.rollback()
+        return {"is_confirmed": False, "message": "Sold out. No seats left for this event."}
+    payment.is_approved = True
+    if payment.decline:
+        db.session.delete(payment.decline)
+    # commits the approval together with the membership, releasing the lock
+    event.add_members(payment.profile_id)
+    return {"is_confirmed": True, "message": "Member approved."}
@@ -0,0 +1,155 @@
+import pickle
+import time
+from collections import namedtuple
+from threading import Lock
+
+from sqlalchemy import event, func
+from sqlalchemy.orm import joinedload
+
+from flaskr import app, db, login_manager
+from flaskr.models import AccountRestriction, Profile, User
+
+# what a request needs to know about its caller, detached from any session
+Identity = namedtuple("Identity", ["user_id", "profile_id", "role", "is_verified", "banned_until"])
+
+# the key session users are cached under, next to the API tokens of the same user
+SESSION_KEY = "session"
+
+
+class IdentityCache():
+    """Per-process cache of callers by user id and a key, such as the token they came with.
+    Entries live for the ttl at most, writes in this process drop them at once.
+    Holds max_users users at most, the least recently cached go first.
+    """
+
+    def __init__(self, ttl: int, max_users: int) -> None:
+        self.ttl = ttl
+        self.max_users = max_users
+        self.lock = Lock()
+        # by user id, oldest first: {key: (expires, value)}
+        self.entries = {}
+        self.profile_users = {}
+        self.user_profiles = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int, key: str):
+        with self.lock:
+            keys = self.entries.get(user_id)
+            cached = keys.get(key) if keys else None
+            if cached and cached[0] > time.monotonic():
+                self.hits = self.hits + 1
+                return cached[1]
+            if cached:
+                # dropped as found, a replaced token is never asked for again
+                del keys[key]
+                if not keys:
+                    self.__drop(user_id)
+            self.misses = self.misses + 1
+        return None
+
+    def put(self, user_id: int, key: str, value, profile_id: int = None):
+        now = time.monotonic()
+        with self.lock:
+            # moved to the end, the most recently cached are evicted last
+            keys = self.entries.pop(user_id, {})
+            keys = {k: entry for k, entry in keys.items() if entry[0] > now}
+            keys[key] = (now + self.ttl, value)
+            self.entries[user_id] = keys
+            if profile_id is not None:
+                self.profile_users[profile_id] = user_id
+                self.user_profiles[user_id] = profile_id
+            while len(self.entries) > self.max_users:
+                self.__drop(next(iter(self.entries)))
+
+    def __drop(self, user_id: int):
+        self.entries.pop(user_id, None)
+        profile_id = self.user_profiles.pop(user_id, None)
+        if profile_id is not None:
+            self.profile_users.pop(profile_id, None)
+
+    def invalidate(self, user_id: int):
+        with self.lock:
+            self.__drop(user_id)
+
+    def invalidate_profile(self, profile_id: int):
+        with self.lock:
+            user_id = self.profile_users.get(profile_id)
+            if user_id is not None:
+                self.__drop(user_id)
+
+
+identity_cache = IdentityCache(app.config["IDENTITY_CACHE_TTL"], app.config["IDENTITY_CACHE_SIZE"])
+
+
+def load_identity(user_id: int):
+    """Reads the user, its profile and ban in one query, None if the user is gone.
+    A profile banned more than once is banned until the latest expiry.
+    """
+    banned_until = db.session.query(func.max(AccountRestriction.expire_date)) \
+        .filter(AccountRestriction.profile_id == Profile.id) \
+        .correlate(Profile).scalar_subquery()
+    row = db.session.query(User.id, Profile.id, User.role, User.is_verified, banned_until) \
+        .outerjoin(Profile, Profile.user_id == User.id) \
+        .filter(User.id == user_id).first()
+    return Identity(*row) if row else None
+
+
+def cached_identity(user_id: int, token: str):
+    """The Identity of a token's user, read once per token and ttl."""
+    identity = identity_cache.get(user_id, token)
+    if identity is None:
+        identity = load_identity(user_id)
+        if identity is not None:
+            identity_cache.put(user_id, token, identity, identity.profile_id)
+    return identity
+
+
+@login_manager.user_loader
+def load_user(id):
+    """Returns the session's user with its profile and ban, from the cache when possible.
+    The cache keeps a detached copy, every request merges it into its own session
+    without a query, so lazy relationships still load and writes still commit.
+    """
+    user_id = int(id)
+    user = identity_cache.get(user_id, SESSION_KEY)
+    if user is None:
+        user = User.query.options(joinedload(User.profile).joinedload(Profile.banned)) \
+            .filter(User.id == user_id).first()
+        if user is None:
+            return None
+        # a copy, the loaded instance belongs to this request and expires on its commit
+        identity_cache.put(user_id, SESSION_KEY, pickle.loads(pickle.dumps(user)),
+                           user.profile.id if user.profile else None)
+        return user
+    return db.session.merge(user, load=False)
+
+
+@event.listens_for(db.session, "after_flush")
+def __collect_changes(session, flush_context):
+    # any change of a user, its profile or ban makes the cached copies stale
+    users = session.info.setdefault("changed_users", set())
+    profiles = session.info.setdefault("changed_profiles", set())
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(instance, User):
+            users.add(instance.id)
+        elif isinstance(instance, Profile):
+            # by user id too, the cached user of a new profile has none yet
+            users.add(instance.user_id)
+            profiles.add(instance.id)
+        elif isinstance(instance, AccountRestriction):
+            profiles.add(instance.profile_id)
+
+
+@event.listens_for(db.session, "after_commit")
+def __invalidate_changes(session):
+    for user_id in session.info.pop("changed_users", ()):
+        identity_cache.invalidate(user_id)
+    for profile_id in session.info.pop("changed_profiles", ()):
+        identity_cache.invalidate_profile(profile_id)
+
+
+@event.listens_for(db.session, "after_rollback")
+def __forget_changes(session):
+    session.info.pop("changed_users", None)
+    session.info.pop("changed_profiles", None)
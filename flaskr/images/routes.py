@@ -0,0 +1,31 @@
+from flask import Blueprint, abort, request, send_file
+from flaskr import app
+from flaskr.images.utils import FORMATS, WIDTH_BUCKETS, derivative_cache
+from PIL import Image
+
+images = Blueprint("images", __name__, url_prefix="/images")
+
+
+@images.route("/<int:width>/<path:path>")
+def derivative(width: int, path: str):
+    if width not in WIDTH_BUCKETS:
+        abort(404)
+    if request.accept_mimetypes["image/webp"]:
+        format = "WEBP"
+    else:
+        format = Image.registered_extensions().get(
+            "." + path.rsplit(".", 1)[-1].lower())
+        if format not in FORMATS:
+            format = "JPEG"
+    try:
+        derivative_path, etag = derivative_cache.get(path, width, format)
+    except (ValueError, FileNotFoundError):
+        abort(404)
+    except (OSError, Image.DecompressionBombError) as error:
+        # not an image Pillow can read, UnidentifiedImageError is an OSError
+        app.logger.warning("No derivative of %s: %s", path, error)
+        abort(404)
+    response = send_file(derivative_path, mimetype=FORMATS[format][1],
+                         etag=etag, conditional=True, max_age=86400)
+    response.vary.add("Accept")
+    return response
@@ -0,0 +1,132 @@
+import os
+import tempfile
+from hashlib import sha1
+from threading import Lock
+
+from flaskr import app
+from flaskr.storage import media_storage, static_image_storage
+from PIL import Image
+
+# widths derivatives are produced at, requests are rounded up to one of these
+WIDTH_BUCKETS = (160, 320, 640, 1280)
+FORMATS = {
+    "JPEG": ("jpg", "image/jpeg"),
+    "PNG": ("png", "image/png"),
+    "WEBP": ("webp", "image/webp")
+}
+
+
+def width_bucket(width: int) -> int:
+    for bucket in WIDTH_BUCKETS:
+        if width <= bucket:
+            return bucket
+    return WIDTH_BUCKETS[-1]
+
+
+def source(path: str):
+    """The storage and key of an image by its path under static, uploads are read
+    from the media storage wherever it keeps them.
+    Raises ValueError for a path outside of static/images.
+    """
+    if path.startswith("images/uploads/"):
+        return media_storage, path[len("images/uploads/"):]
+    if path.startswith("images/"):
+        return static_image_storage, path[len("images/"):]
+    raise ValueError(f"Not an image path: {path}")
+
+
+class DerivativeCache():
+    """Resized images on disk, evicted least recently used first.
+    A derivative's file name is its strong ETag. It hashes the source path,
+    its modification time, the width and the format, so a replaced source
+    never serves a stale derivative.
+    Sources are read through their Storage, derivatives are a local cache.
+    """
+
+    def __init__(self) -> None:
+        self.lock = Lock()
+        self.size = None
+
+    @property
+    def folder(self) -> str:
+        return os.path.join(app.root_path, app.config["DERIVATIVES_FOLDER"])
+
+    @staticmethod
+    def etag(path: str, width: int, format: str) -> str:
+        storage, key = source(path)
+        version = f"{path}|{storage.modified_at(key)!r}|{width}|{format}"
+        return sha1(version.encode("utf-8")).hexdigest()
+
+    def get(self, path: str, width: int, format: str):
+        """Returns the path and the ETag of the derivative, producing it on the first request.
+        Args:
+            path (str): Path of the source under static, as in its URL.
+        Raises ValueError for a path outside of the images, FileNotFoundError for a
+        missing source, OSError or PIL's UnidentifiedImageError for an unreadable one.
+        """
+        etag = self.etag(path, width, format)
+        storage, key = source(path)
+        derivative_path = os.path.join(self.folder, etag[:2], etag + "." + FORMATS[format][0])
+        try:
+            # the modification time of a derivative is its last use
+            os.utime(derivative_path)
+            return derivative_path, etag
+        except FileNotFoundError:
+            pass
+        os.makedirs(os.path.dirname(derivative_path), exist_ok=True)
+        with storage.open(key) as file, Image.open(file) as image:
+            if format == "JPEG" and image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            image.thumbnail((width, image.height), Image.ANTIALIAS)
+            # a temp file of its own, concurrent first requests may produce the same derivative
+            descriptor, temp_path = tempfile.mkstemp(
+                dir=os.path.dirname(derivative_path), suffix=".tmp")
+            os.close(descriptor)
+            try:
+                image.save(temp_path, format=format, quality=85)
+                os.replace(temp_path, derivative_path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+        self.__added(os.path.getsize(derivative_path))
+        return derivative_path, etag
+
+    def __added(self, size: int):
+        with self.lock:
+            if self.size is None:
+                self.size = self.__total_size()
+            else:
+                self.size = self.size + size
+            if self.size <= app.config["DERIVATIVES_CACHE_SIZE"]:
+                return
+            self.size = self.__evict(app.config["DERIVATIVES_CACHE_SIZE"] * 0.9)
+
+    def __files(self):
+        for root, _, names in os.walk(self.folder):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield stat.st_mtime, stat.st_size, path
+
+    def __total_size(self) -> int:
+        return sum(size for _, size, _ in self.__files())
+
+    def __evict(self, target: float) -> int:
+        # other workers share the folder, so the real size is read from disk
+        files = sorted(self.__files())
+        size = sum(size for _, size, _ in files)
+        for _, file_size, path in files:
+            if size <= target:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            size = size - file_size
+        return size
+
+
+derivative_cache = DerivativeCache()
@@ -0,0 +1,58 @@
+from flask import g, has_app_context
+
+
+def __state() -> dict:
+    # g lives as long as the app context, which is one request
+    if not has_app_context():
+        return {"pending": {}, "cache": {}}
+    if "batch_loader" not in g:
+        g.batch_loader = {"pending": {}, "cache": {}}
+    return g.batch_loader
+
+
+def __dispatch(model, state: dict):
+    cache = state["cache"].setdefault(model, {})
+    pending = state["pending"].pop(model, set())
+    ids = [id for id in pending if id not in cache]
+    if not ids:
+        return cache
+    for row in model.query.filter(model.id.in_(ids)).all():
+        cache[row.id] = row
+    # remember misses too, so they are not asked for again
+    for id in ids:
+        cache.setdefault(id, None)
+    return cache
+
+
+def __queue(model, ids, state: dict):
+    cache = state["cache"].get(model, {})
+    pending = state["pending"].setdefault(model, set())
+    for id in ids or []:
+        if id is not None and id not in cache:
+            pending.add(id)
+
+
+def queue(model, ids):
+    """Registers ids to be fetched together with the next load of the model."""
+    __queue(model, ids, __state())
+
+
+def load(model, id: int):
+    """Returns the row of the model with the given id or None.
+    Every queued id of the model is resolved by the same WHERE id IN (...) query.
+    """
+    if id is None:
+        return None
+    state = __state()
+    __queue(model, [id], state)
+    return __dispatch(model, state).get(id)
+
+
+def load_many(model, ids) -> list:
+    """Returns the rows of the model in the order of ids, skipping missing ones."""
+    if not ids:
+        return []
+    state = __state()
+    __queue(model, ids, state)
+    cache = __dispatch(model, state)
+    return [cache[id] for id in ids if cache.get(id) is not None]
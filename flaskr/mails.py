@@ -1,12 +1,116 @@
 import os
-from flaskr import mail
-from flask_mail import Message
+import smtplib
+from datetime import datetime, timedelta
+
+from flask_mail import BadHeaderError, Message
+from sqlalchemy import text
+
+from flaskr import app, db, mail
+from flaskr.models import OutgoingMail
+from flaskr.streams import ChannelListener
+
+# wakes the worker when a mail is queued, it polls as well in case it was down
+mail_listener = ChannelListener("outgoing_mail")
+MAIL_QUEUE_KEY = "queue"
+# seconds a claimed batch is hidden from other workers, a crashed one's batch comes back after it
+CLAIM_TIMEOUT = 300
+
 
 def send_mail(to: str, subject: str, body: str):
-    msg=Message("Password Reset Request", 
-                sender=os.getenv("MAIL_USERNAME"), 
-                recipients=[to])
-    
-    msg.subject = subject
-    msg.body = body
-    mail.send(msg)
\ No newline at end of file
+    """Queues a mail, it goes out with the next batch of the mail worker."""
+    db.session.add(OutgoingMail(to, subject, body))
+    mail_listener.publish(MAIL_QUEUE_KEY, {})
+    db.session.commit()
+
+
+def __message(outgoing: OutgoingMail) -> Message:
+    msg = Message(outgoing.subject,
+                  sender=os.getenv("MAIL_USERNAME"),
+                  recipients=[outgoing.recipient])
+    msg.body = outgoing.body
+    return msg
+
+
+def __claim(batch_size: int) -> list:
+    # SKIP LOCKED and the moved next_attempt_at keep two workers off the same mails
+    ids = db.session.execute(text("""
+        UPDATE outgoing_mail SET next_attempt_at = :claimed_until
+        WHERE id IN (
+            SELECT id FROM outgoing_mail
+            WHERE status = 'pending' AND next_attempt_at <= :now
+            ORDER BY next_attempt_at LIMIT :batch_size
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING id
+    """), {
+        "now": datetime.utcnow(),
+        "claimed_until": datetime.utcnow() + timedelta(seconds=CLAIM_TIMEOUT),
+        "batch_size": batch_size
+    }).scalars().all()
+    db.session.commit()
+    if not ids:
+        return []
+    return OutgoingMail.query.filter(OutgoingMail.id.in_(ids)) \
+        .order_by(OutgoingMail.id).all()
+
+
+def __failed(outgoing: OutgoingMail, error: Exception, permanent: bool = False):
+    outgoing.attempts = outgoing.attempts + 1
+    outgoing.last_error = (str(error) or type(error).__name__)[:500]
+    if permanent or outgoing.attempts >= app.config["MAIL_MAX_ATTEMPTS"]:
+        outgoing.status = "dead"
+        app.logger.warning("Giving up on mail %d to %s: %s",
+                           outgoing.id, outgoing.recipient, error)
+        return
+    # exponential backoff, a minute, two, four... capped at a day
+    delay = min(app.config["MAIL_RETRY_DELAY"] * 2 ** (outgoing.attempts - 1), 86400)
+    outgoing.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+
+
+def deliver_pending(batch_size: int) -> tuple:
+    """Sends one batch of due mails over a single SMTP connection,
+    the outcome of each mail is committed as soon as it is known.
+    Returns:
+        tuple: The number of mails claimed, sent and failed.
+    """
+    batch = __claim(batch_size)
+    if not batch:
+        return 0, 0, 0
+    sent = failed = 0
+    remaining = list(batch)
+    try:
+        with mail.connect() as connection:
+            while remaining:
+                outgoing = remaining.pop(0)
+                try:
+                    connection.send(__message(outgoing))
+                except smtplib.SMTPServerDisconnected:
+                    remaining.insert(0, outgoing)
+                    raise
+                except smtplib.SMTPException as error:
+                    # refused by the server, the connection is still good for the others
+                    __failed(outgoing, error)
+                    failed = failed + 1
+                    db.session.commit()
+                    continue
+                except (BadHeaderError, ValueError) as error:
+                    # the mail itself cannot be built or encoded, no retry would send it
+                    __failed(outgoing, error, permanent=True)
+                    failed = failed + 1
+                    db.session.commit()
+                    continue
+                outgoing.status = "sent"
+                outgoing.sent_at = datetime.utcnow()
+                outgoing.attempts = outgoing.attempts + 1
+                # verification codes and reset links are not kept once delivered
+                outgoing.body = ""
+                sent = sent + 1
+                # committed per mail, a worker dying mid batch resends none of the sent ones
+                db.session.commit()
+    except (smtplib.SMTPException, OSError) as error:
+        # no connection, every mail not yet sent is retried later
+        for outgoing in remaining:
+            __failed(outgoing, error)
+            failed = failed + 1
+    db.session.commit()
+    return len(batch), sent, failed
@@ -6,6 +6,7 @@ from wtforms.validators import DataRequired
 class SearchForm(FlaskForm):
     search = StringField("Search", validators=[
         DataRequired()
-    ], render_kw={"placeholder": "search..."})
+    ], render_kw={"placeholder": "search...", "autocomplete": "off",
+                  "list": "search-suggestions"})
     submit = SubmitField("Search")
 
@@ -1,11 +1,13 @@
-from flask import Blueprint, render_template, url_for
+from flask import Blueprint, jsonify, render_template, request, url_for
 from flask.helpers import flash
 from flask_login import current_user
 from flaskr import app
 from flaskr.mains.form import SearchForm
+from flaskr.mains.utils import (search_events, search_profiles,
+                                suggestion_index)
 from flaskr.models import Event, Profile
+from flaskr.schema import event_search_schemas, profile_search_schemas
 from flaskr.utils import is_eligable
-from sqlalchemy import func
 from werkzeug.utils import redirect
 
 mains = Blueprint("mains", __name__)
@@ -28,25 +30,41 @@ def search():
     form = SearchForm()
     if form.validate_on_submit():
         searched = form.search.data
-        events_by_title = Event.query.filter(func.lower(Event.title).like("%" + searched.lower() + "%"))
-        events_by_location = Event.query.filter(func.lower(Event.place_name).like("%" + searched.lower() + "%"))
-        
-        event_set = set()
-        for event in events_by_title:
-            event_set.add(event)
-        for event in events_by_location:
-            event_set.add(event)
-        
-        profiles_by_first = Profile.query.filter(func.lower(Profile.first_name).like("%" + searched.lower() + "%"))
-        profiles_by_last = Profile.query.filter(func.lower(Profile.last_name).like("%" + searched.lower() + "%"))
-        
-        profile_set = set()
-        for profile in profiles_by_first:
-            profile_set.add(profile)
-        for profile in profiles_by_last:
-            profile_set.add(profile)
-        
-        return render_template("mains/search.html", s_form=form, searched=searched, events=event_set, profiles=profile_set, len=len)
-    flash("No search input given.", "danger")
-    return redirect(url_for("mains.homepage"))
-    
+    else:
+        searched = request.args.get("q", "").strip()
+    is_json = request.args.get("format") == "json"
+    if not searched:
+        if is_json:
+            return jsonify({
+                "error": "No search input given."
+            }), 400
+        flash("No search input given.", "danger")
+        return redirect(url_for("mains.homepage"))
+    page = max(request.args.get("page", 1, type=int), 1)
+    events, has_next_events = search_events(searched, page)
+    profiles, has_next_profiles = search_profiles(searched, page)
+    if is_json:
+        return jsonify({
+            "query": searched,
+            "page": page,
+            "events": event_search_schemas.dump(events),
+            "profiles": profile_search_schemas.dump(profiles),
+            "has_next_events": has_next_events,
+            "has_next_profiles": has_next_profiles
+        }), 200
+    return render_template("mains/search.html", s_form=form, searched=searched,
+                           events=events, profiles=profiles, page=page,
+                           has_next=has_next_events or has_next_profiles, len=len)
+
+
+@mains.route("/search/suggest")
+def suggest():
+    suggestions = suggestion_index.suggest(request.args.get("q", ""))
+    for suggestion in suggestions:
+        if suggestion["type"] == "event":
+            suggestion["url"] = url_for("events.view_event", id=suggestion["id"])
+        else:
+            suggestion["url"] = url_for("profiles.view_profile", id=suggestion["id"])
+    return jsonify({
+        "suggestions": suggestions
+    }), 200
@@ -0,0 +1,213 @@
+import re
+import time
+from bisect import bisect_left, insort
+from threading import Lock, Thread
+
+from flaskr import app, db
+from flaskr.models import Event, Profile
+from sqlalchemy import desc, event, func
+
+SEARCH_PER_PAGE = 12
+SUGGESTIONS_LIMIT = 8
+# other workers' writes are picked up by a periodic full rebuild
+SUGGESTIONS_REBUILD_INTERVAL = 10 * 60
+
+
+def build_prefix_query(text: str) -> str:
+    # "cox baz" -> "cox:* & baz:*", so partial words still match
+    words = re.findall(r"\w+", text.lower())
+    return " & ".join(word + ":*" for word in words)
+
+
+def __ranked_page(model, text: str, page: int, per_page: int):
+    prefix_query = build_prefix_query(text)
+    if not prefix_query:
+        return [], False
+    ts_query = func.to_tsquery("simple", prefix_query)
+    rank = func.ts_rank(model.search_vector, ts_query)
+    # fetching one extra row tells whether a next page exists without a count query
+    items = model.query.filter(model.search_vector.op("@@")(ts_query)) \
+        .order_by(desc(rank), desc(model.id)) \
+        .offset((page - 1) * per_page).limit(per_page + 1).all()
+    return items[:per_page], len(items) > per_page
+
+
+def search_events(text: str, page: int = 1, per_page: int = SEARCH_PER_PAGE):
+    """Ranked full-text search over the title and place name of events.
+    Returns:
+        tuple: The list of events of the page and whether a next page exists.
+    """
+    return __ranked_page(Event, text, page, per_page)
+
+
+def search_profiles(text: str, page: int = 1, per_page: int = SEARCH_PER_PAGE):
+    """Ranked full-text search over the first and last name of profiles.
+    Returns:
+        tuple: The list of profiles of the page and whether a next page exists.
+    """
+    return __ranked_page(Profile, text, page, per_page)
+
+
+class PrefixIndex():
+    """In-memory sorted array of lowercased terms for typeahead lookups.
+    Every word start of a label is indexed, so "baz" finds "Cox's Bazar".
+    Built in a background thread and swapped in whole, lookups never wait for
+    the database and find nothing until the first build is done. Writes of this
+    process are applied once committed, other workers' with the next rebuild.
+    """
+
+    def __init__(self) -> None:
+        self.lock = Lock()
+        self.terms = []
+        self.labels = {}
+        self.built_at = None
+        self.building = False
+        # changes committed while a build reads the database, replayed on its result
+        self.pending = []
+
+    @staticmethod
+    def __word_starts(text: str) -> list:
+        text = text.lower()
+        return [text[match.start():] for match in re.finditer(r"\w+", text)]
+
+    def __add(self, kind: str, id: int, labels: list):
+        key = (kind, id)
+        self.labels[key] = labels
+        for label in labels:
+            for term in self.__word_starts(label):
+                insort(self.terms, (term, kind, id))
+
+    def __remove(self, kind: str, id: int):
+        key = (kind, id)
+        labels = self.labels.pop(key, None)
+        if not labels:
+            return
+        for label in labels:
+            for term in self.__word_starts(label):
+                index = bisect_left(self.terms, (term, kind, id))
+                if index < len(self.terms) and self.terms[index] == (term, kind, id):
+                    del self.terms[index]
+
+    def __apply(self, kind: str, id: int, labels):
+        # labels None removes the entry
+        if self.labels.get((kind, id)) == labels:
+            return
+        self.__remove(kind, id)
+        if labels is not None:
+            self.__add(kind, id, labels)
+
+    def rebuild(self):
+        """Reads every label from the database and swaps the new index in."""
+        events = Event.query.with_entities(
+            Event.id, Event.title, Event.place_name).all()
+        profiles = Profile.query.with_entities(
+            Profile.id, Profile.first_name, Profile.last_name).all()
+        labels = {}
+        terms = []
+        for id, title, place_name in events:
+            labels[("event", id)] = [title, place_name]
+        for id, first_name, last_name in profiles:
+            labels[("profile", id)] = [f"{first_name} {last_name}"]
+        for (kind, id), entries in labels.items():
+            for label in entries:
+                for term in self.__word_starts(label):
+                    terms.append((term, kind, id))
+        terms.sort()
+        with self.lock:
+            self.terms = terms
+            self.labels = labels
+            for change in self.pending:
+                self.__apply(*change)
+            self.pending = []
+            self.built_at = time.monotonic()
+
+    def refresh(self):
+        """Starts a rebuild in a background thread, unless one is running already."""
+        with self.lock:
+            if self.building:
+                return
+            self.building = True
+            self.pending = []
+        Thread(target=self.__rebuild_in_background, daemon=True).start()
+
+    def __rebuild_in_background(self):
+        try:
+            with app.app_context():
+                self.rebuild()
+        except Exception as error:
+            app.logger.error("Suggestion index rebuild failed: %s", error)
+        finally:
+            with self.lock:
+                self.building = False
+
+    def apply(self, changes: dict):
+        """Applies committed changes, labels by (kind, id), None for a removal."""
+        with self.lock:
+            if self.building:
+                self.pending.extend((kind, id, labels) for (kind, id), labels in changes.items())
+            if self.built_at is None:
+                # not built yet, the build will read them from the database
+                return
+            for (kind, id), labels in changes.items():
+                self.__apply(kind, id, labels)
+
+    def suggest(self, text: str, limit: int = SUGGESTIONS_LIMIT) -> list:
+        if self.built_at is None \
+                or time.monotonic() - self.built_at > SUGGESTIONS_REBUILD_INTERVAL:
+            self.refresh()
+        prefix = text.strip().lower()
+        if not prefix:
+            return []
+        results = []
+        seen = set()
+        with self.lock:
+            index = bisect_left(self.terms, (prefix,))
+            while index < len(self.terms) and len(results) < limit:
+                term, kind, id = self.terms[index]
+                if not term.startswith(prefix):
+                    break
+                if (kind, id) not in seen:
+                    seen.add((kind, id))
+                    results.append({
+                        "type": kind,
+                        "id": id,
+                        "label": self.labels[(kind, id)][0]
+                    })
+                index = index + 1
+        return results
+
+
+suggestion_index = PrefixIndex()
+
+
+@app.before_first_request
+def __build_suggestion_index():
+    suggestion_index.refresh()
+
+
+@event.listens_for(db.session, "after_flush")
+def __collect_suggestion_changes(session, flush_context):
+    # applied on commit, a rolled back write must not show up in suggestions
+    changes = session.info.setdefault("suggestion_changes", {})
+    for instance in list(session.new) + list(session.dirty):
+        if isinstance(instance, Event):
+            changes[("event", instance.id)] = [instance.title, instance.place_name]
+        elif isinstance(instance, Profile):
+            changes[("profile", instance.id)] = [instance.get_fullname()]
+    for instance in session.deleted:
+        if isinstance(instance, Event):
+            changes[("event", instance.id)] = None
+        elif isinstance(instance, Profile):
+            changes[("profile", instance.id)] = None
+
+
+@event.listens_for(db.session, "after_commit")
+def __apply_suggestion_changes(session):
+    changes = session.info.pop("suggestion_changes", None)
+    if changes:
+        suggestion_index.apply(changes)
+
+
+@event.listens_for(db.session, "after_rollback")
+def __forget_suggestion_changes(session):
+    session.info.pop("suggestion_changes", None)
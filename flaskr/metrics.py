@@ -0,0 +1,24 @@
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from flaskr import app
+from flaskr.identity import identity_cache
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def __count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.query_count = g.get("query_count", 0) + 1
+
+
+@app.after_request
+def __report_queries(response):
+    # what a page costs in queries, to compare a change against its baseline
+    if app.config["QUERY_COUNT"]:
+        count = g.get("query_count", 0)
+        response.headers["X-Query-Count"] = str(count)
+        app.logger.info("%s %s: %d queries, identity cache %d hits %d misses",
+                        request.method, request.path, count,
+                        identity_cache.hits, identity_cache.misses)
+    return response
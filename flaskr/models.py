@@ -4,15 +4,25 @@ from datetime import date, datetime
 from flask_login import UserMixin
 from itsdangerous import TimedSerializer
 from itsdangerous.exc import BadTimeSignature, SignatureExpired
+from sqlalchemy import (Computed, delete, event, func, inspect, select, text,
+                        update)
+from sqlalchemy.dialects.postgresql import TSVECTOR, insert
 from sqlalchemy.orm import defaultload
+from sqlalchemy.orm.attributes import set_committed_value
 from timeago import format
 
-from flaskr import app, db, login_manager
+from flaskr import app, db
+from flaskr.loaders import load
+from flaskr.streams import notification_listener
 
+# hot ranking: every HOT_DECAY_SECONDS of age weigh as much as ten times the
+# points (net votes plus comments), so fresh posts rise above old favourites
+RANKING_EPOCH = datetime(2021, 1, 1)
+HOT_DECAY_SECONDS = 45000
 
-@login_manager.user_loader
-def load_user(id):
-    return User.query.get(int(id))
+
+def time_score(created_at: datetime) -> float:
+    return (created_at - RANKING_EPOCH).total_seconds() / HOT_DECAY_SECONDS
 
 
 # defining enum
@@ -97,12 +107,14 @@ class Profile(db.Model):
                              backref="profile", uselist=False)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"))
     hosted_events = db.relationship("Event", backref="host")
-    joined_events = db.Column(db.ARRAY(db.Integer), default=[])
+    memberships = db.relationship("EventMember", backref="profile")
     pending_events = db.Column(db.ARRAY(db.Integer), default=[])
     pending_payments = db.relationship("PaymentPending", backref="profile")
     pending_req = db.relationship(
         "PromotionPending", backref="profile", uselist=False)
     notifications = db.relationship("Notification", backref="profile")
+    # kept by the Notification mapper events, the badge never counts rows
+    unread_notifications = db.Column(db.Integer, nullable=False, default=0)
     message_sent = db.relationship("Message", backref="sender")
     complains = db.relationship("Complain", backref="complained_by")
     posts = db.relationship("Post", backref="profile")
@@ -113,9 +125,18 @@ class Profile(db.Model):
     event_bookmarks = db.Column(db.ARRAY(db.Integer), default=[])
     social_links = db.relationship(
         "SocialConnection", backref="profile", uselist=False)
+    # generated by postgres, so it stays in sync on every write
+    search_vector = db.Column(TSVECTOR, Computed(
+        "to_tsvector('simple', coalesce(first_name, '') || ' ' || coalesce(last_name, ''))",
+        persisted=True))
     created_at = db.Column(db.DateTime, default=datetime.utcnow())
     updated_at = db.Column(db.DateTime, default=datetime.utcnow())
 
+    __table_args__ = (
+        db.Index("ix_profile_search_vector", "search_vector",
+                 postgresql_using="gin"),
+    )
+
     def __init__(
         self,
         first_name: str,
@@ -143,11 +164,10 @@ class Profile(db.Model):
         return True
 
     def total_unreaded_notifications(self):
-        count = 0
-        for i in range(len(self.notifications)):
-            if not self.notifications[i].is_readed:
-                count = count + 1
-        return count
+        # read from the row, the session user may be a cached copy another worker
+        # has since moved the counter of
+        return db.session.query(Profile.unread_notifications) \
+            .filter(Profile.id == self.id).scalar()
 
     def is_event_bookmarked(self, event_id: int):
         if self.event_bookmarks:
@@ -157,20 +177,9 @@ class Profile(db.Model):
         return False
 
     def get_joined_events(self) -> list:
-        list_of_events = []
-        if self.joined_events:
-            for event_id in self.joined_events:
-                list_of_events.append(Event.query.get(event_id))
-        return list_of_events
-
-    def add_joined_events(self, event_id: int):
-        list_of_events = []
-        if self.joined_events:
-            for event_id in self.joined_events:
-                list_of_events.append(event_id)
-        list_of_events.append(event_id)
-        self.joined_events = list_of_events
-        db.session.commit()
+        return Event.query.join(EventMember, EventMember.event_id == Event.id) \
+            .filter(EventMember.profile_id == self.id) \
+            .order_by(EventMember.created_at, EventMember.id).all()
 
     def get_rating(self):
         if not self.reviews or len(self.reviews) == 0:
@@ -197,7 +206,7 @@ class Review(db.Model):
         self.reviewed_by = reviewed_by
 
     def get_reviewed_by(self):
-        return Profile.query.get(self.reviewed_by)
+        return load(Profile, self.reviewed_by)
 
 
 class SocialConnection(db.Model):
@@ -238,7 +247,7 @@ class Event(db.Model):
     night = db.Column(db.Integer, nullable=False)
     fee = db.Column(db.Integer, nullable=False)
     host_id = db.Column(db.Integer, db.ForeignKey("profile.id"))
-    members = db.Column(db.ARRAY(db.Integer), default=[])
+    memberships = db.relationship("EventMember", backref="event")
     chat_room = db.relationship("Message", backref="event")
     posts = db.relationship("Post", backref="event")
     plans = db.Column(db.ARRAY(db.String), default=[])
@@ -253,9 +262,21 @@ class Event(db.Model):
     hotel_weblink = db.Column(db.String)
     logs = db.relationship("Log", backref="event")
     phone_number = db.Column(db.String)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow())
+    # generated by postgres, so it stays in sync on every write
+    search_vector = db.Column(TSVECTOR, Computed(
+        "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(place_name, '')), 'B')",
+        persisted=True))
+    # callable default, the keyset pagination of events orders by it
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow())
 
+    __table_args__ = (
+        db.Index("ix_event_created_at_id", "created_at", "id"),
+        db.Index("ix_event_search_vector", "search_vector",
+                 postgresql_using="gin"),
+    )
+
     def __init__(
         self,
         title: str,
@@ -309,6 +330,12 @@ class Event(db.Model):
                 "category": "danger",
                 "status": False
             }
+        if self.members_count >= self.max_member:
+            return {
+                "message": "Sold out",
+                "category": "danger",
+                "status": False
+            }
         return {
             "message": "Registration ongoing",
             "category": "primary",
@@ -316,7 +343,8 @@ class Event(db.Model):
         }
 
     def is_profile_going(self, profile_id: int) -> bool:
-        return profile_id in self.members
+        return db.session.query(EventMember.query.filter_by(
+            event_id=self.id, profile_id=profile_id).exists()).scalar()
 
     def is_profile_pending(self, profile_id: int) -> bool:
         for pending_payment in self.pending_payments:
@@ -325,24 +353,22 @@ class Event(db.Model):
         return False
 
     def get_members(self) -> list:
-        list_of_members = []
-        for members_id in self.members:
-            list_of_members.append(Profile.query.get(members_id))
-        return list_of_members
+        return Profile.query.join(EventMember, EventMember.profile_id == Profile.id) \
+            .filter(EventMember.event_id == self.id) \
+            .order_by(EventMember.created_at, EventMember.id).all()
 
     def add_members(self, profile_id: int):
-        list_of_members = []
-        for members_id in self.members:
-            list_of_members.append(members_id)
-        list_of_members.append(profile_id)
-        self.members = list_of_members
+        # approving the same profile twice, even concurrently, is a no-op
+        db.session.execute(insert(EventMember.__table__).values(
+            event_id=self.id, profile_id=profile_id, created_at=datetime.utcnow()
+        ).on_conflict_do_nothing(index_elements=["event_id", "profile_id"]))
         db.session.commit()
 
-    def add_photo(self, file_path):
+    def add_photos(self, file_paths: list):
         list_of_photos = []
         for path in self.photos:
             list_of_photos.append(path)
-        list_of_photos.append(file_path)
+        list_of_photos.extend(file_paths)
         self.photos = list_of_photos
         db.session.commit()
 
@@ -353,6 +379,32 @@ class Event(db.Model):
         return list_of_photos
 
 
+class EventMember(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.Integer, db.ForeignKey("event.id"), nullable=False)
+    profile_id = db.Column(db.Integer, db.ForeignKey("profile.id"), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # the unique constraint doubles as the "members of event" index
+    __table_args__ = (
+        db.UniqueConstraint("event_id", "profile_id",
+                            name="uq_event_member_event_id_profile_id"),
+        db.Index("ix_event_member_profile_id", "profile_id"),
+    )
+
+    def __init__(self, event_id: int, profile_id: int) -> None:
+        self.event_id = event_id
+        self.profile_id = profile_id
+
+
+Event.members_count = db.column_property(
+    select(func.count(EventMember.id))
+    .where(EventMember.event_id == Event.id)
+    .correlate_except(EventMember)
+    .scalar_subquery()
+)
+
+
 class Complain(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     text = db.Column(db.String, nullable=False)
@@ -375,7 +427,7 @@ class Complain(db.Model):
         self.complain_for = complain_for
 
     def get_complain_for(self):
-        return Profile.query.get(self.complain_for)
+        return load(Profile, self.complain_for)
 
     def get_days_ago(self):
         return format(self.created_at, datetime.utcnow())
@@ -388,13 +440,26 @@ class PaymentPending(db.Model):
     trnx = db.Column(db.String)
     decline = db.relationship("Decline", backref="payment", uselist=False)
     is_approved = db.Column(db.Boolean, default=False)
+    # a pending payment holds a seat until approved, declined or expired
+    hold_expires_at = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow())
     updated_at = db.Column(db.DateTime, default=datetime.utcnow())
 
-    def __init__(self, trnx: str, profile_id: int, event_id: int) -> None:
+    __table_args__ = (
+        db.Index("ix_payment_pending_event_id_hold_expires_at",
+                 "event_id", "hold_expires_at"),
+    )
+
+    def __init__(self, trnx: str, profile_id: int, event_id: int, hold_expires_at: datetime = None) -> None:
         self.trnx = trnx
         self.profile_id = profile_id
         self.event_id = event_id
+        self.hold_expires_at = hold_expires_at
+
+    def is_holding_seat(self) -> bool:
+        return not self.is_approved and not self.decline \
+            and self.hold_expires_at is not None \
+            and self.hold_expires_at > datetime.utcnow()
 
     def approve(self):
         self.is_approved = True
@@ -439,13 +504,26 @@ class Notification(db.Model):
     link = db.Column(db.String, nullable=False)
     profile_id = db.Column(db.Integer, db.ForeignKey("profile.id"))
     is_readed = db.Column(db.Boolean, default=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow())
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow())
 
+    # only unread rows are in the partial index, reading or recounting them skips
+    # the read history, the other one pages through a profile's notifications
+    __table_args__ = (
+        db.Index("ix_notification_profile_id_unread", "profile_id",
+                 postgresql_where=text("NOT is_readed")),
+        db.Index("ix_notification_profile_id_created_at_id",
+                 "profile_id", "created_at", "id"),
+        # finds what the archive command moves without reading unread rows
+        db.Index("ix_notification_created_at_read", "created_at",
+                 postgresql_where=text("is_readed")),
+    )
+
     def __init__(self, message: str, link: str, profile_id: int) -> None:
         self.message = message
         self.link = link
         self.profile_id = profile_id
+        self.is_readed = False
 
     def mark_read(self):
         self.is_readed = True
@@ -454,6 +532,114 @@ class Notification(db.Model):
     def times_ago(self):
         return format(self.created_at, datetime.utcnow())
 
+    @staticmethod
+    def stream_event(unread: int, id: int = None, message: str = None, link: str = None) -> dict:
+        # what the notification stream sends, a new notification carries its id
+        data = {"unread": unread}
+        if id is not None:
+            data["notification"] = {"id": id, "message": message, "link": link}
+        return data
+
+    @staticmethod
+    def count_unread(connection, profile_id: int, count: int, notification=None):
+        """Moves the unread counter of a profile in place and pushes it to its streams.
+        Statements that skip the mapper events, like bulk inserts, call it themselves.
+        """
+        if profile_id is None or not count:
+            return
+        unread = connection.execute(
+            update(Profile.__table__)
+            .where(Profile.__table__.c.id == profile_id)
+            .values(unread_notifications=func.greatest(
+                Profile.__table__.c.unread_notifications + count, 0))
+            .returning(Profile.__table__.c.unread_notifications)).scalar()
+        if notification is None:
+            data = Notification.stream_event(unread)
+        else:
+            data = Notification.stream_event(unread, notification.id,
+                                             notification.message, notification.link)
+        notification_listener.publish(profile_id, data, connection)
+
+    @staticmethod
+    def mark_all_read(profile_id: int) -> int:
+        """Marks every unread notification of the profile read with one statement.
+        The counter goes down by the rows marked, so notifications arriving
+        meanwhile stay counted.
+        Returns:
+            int: The number of notifications marked.
+        """
+        row = db.session.execute(text("""
+            WITH marked AS (
+                UPDATE notification SET is_readed = true, updated_at = :updated_at
+                WHERE profile_id = :profile_id AND NOT is_readed
+                RETURNING id
+            )
+            UPDATE profile SET unread_notifications = greatest(
+                profile.unread_notifications - (SELECT count(*) FROM marked), 0)
+            WHERE profile.id = :profile_id
+            RETURNING profile.unread_notifications, (SELECT count(*) FROM marked) AS marked
+        """), {"profile_id": profile_id, "updated_at": datetime.utcnow()}).first()
+        if row is None:
+            return 0
+        notification_listener.publish(profile_id, Notification.stream_event(row.unread_notifications))
+        db.session.commit()
+        return row.marked
+
+
+class NotificationArchive(db.Model):
+    """Read notifications past the retention age, moved here by `flask notifications archive`
+    so the notification table only holds what the badge reads. The center pages into it once
+    the notification table runs out.
+    """
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    message = db.Column(db.String(250), nullable=False)
+    link = db.Column(db.String, nullable=False)
+    profile_id = db.Column(db.Integer, db.ForeignKey("profile.id"))
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index("ix_notification_archive_profile_id_created_at_id",
+                 "profile_id", "created_at", "id"),
+    )
+
+    # only read notifications are archived
+    is_readed = True
+
+    def times_ago(self):
+        return format(self.created_at, datetime.utcnow())
+
+
+@event.listens_for(Notification, "after_insert")
+def __count_inserted(mapper, connection, notification):
+    if not notification.is_readed:
+        Notification.count_unread(connection, notification.profile_id, 1, notification)
+
+
+@event.listens_for(Notification.is_readed, "set", active_history=True)
+def __load_read_state(notification, value, previous, initiator):
+    # active_history loads the stored value before an unloaded one is replaced,
+    # without it the update below could not tell what it changed from
+    pass
+
+
+@event.listens_for(Notification, "after_update")
+def __count_updated(mapper, connection, notification):
+    history = inspect(notification).attrs.is_readed.history
+    if not history.added or not history.deleted:
+        return
+    was_read, is_read = bool(history.deleted[0]), bool(history.added[0])
+    if was_read != is_read:
+        Notification.count_unread(connection, notification.profile_id,
+                                  1 if was_read else -1)
+
+
+@event.listens_for(Notification, "after_delete")
+def __count_deleted(mapper, connection, notification):
+    if not notification.is_readed:
+        Notification.count_unread(connection, notification.profile_id, -1)
+
 
 class Message(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -461,15 +647,23 @@ class Message(db.Model):
     message_photo = db.Column(db.String)
     sender_id = db.Column(db.Integer, db.ForeignKey("profile.id"))
     event_id = db.Column(db.Integer, db.ForeignKey("event.id"))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow())
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow())
 
+    __table_args__ = (
+        db.Index("ix_message_event_id_created_at_id",
+                 "event_id", "created_at", "id"),
+    )
+
     def __init__(self, text: str, photo: str, profile_id: int, event_id: int) -> None:
         self.message_text = text
         self.message_photo = photo
         self.sender_id = profile_id
         self.event_id = event_id
 
+    def times_ago(self):
+        return format(self.created_at, datetime.utcnow())
+
 
 class Log(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -508,64 +702,117 @@ class Post(db.Model):
     event_id = db.Column(db.Integer, db.ForeignKey("event.id"))
     content = db.Column(db.String)
     photo = db.Column(db.String)
-    up_vote = db.Column(db.ARRAY(db.Integer), default=[])
-    down_vote = db.Column(db.ARRAY(db.Integer), default=[])
+    up_votes = db.Column(db.Integer, nullable=False, default=0)
+    down_votes = db.Column(db.Integer, nullable=False, default=0)
+    comments_count = db.Column(db.Integer, nullable=False, default=0)
+    # age part of hot_score, fixed at creation so the score only moves on writes
+    time_score = db.Column(db.Float, nullable=False, default=0)
+    # recomputed by postgres whenever a counter of the row changes
+    top_score = db.Column(db.Integer, Computed(
+        "up_votes - down_votes + comments_count", persisted=True))
+    hot_score = db.Column(db.Float, Computed(
+        "sign((up_votes - down_votes + comments_count)::float8) "
+        "* log(greatest(abs(up_votes - down_votes + comments_count), 1)::float8) "
+        "+ time_score", persisted=True))
+    votes = db.relationship("PostVote", backref="post", passive_deletes=True)
     comments = db.relationship("Comment", backref="post")
-    created_at = db.Column(db.DateTime, default=datetime.utcnow())
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow())
 
+    # the posts tab pages through one event, newest, hottest or top first
+    __table_args__ = (
+        db.Index("ix_post_event_id_created_at_id", "event_id", "created_at", "id"),
+        db.Index("ix_post_event_id_hot_score_id", "event_id", "hot_score", "id"),
+        db.Index("ix_post_event_id_top_score_id", "event_id", "top_score", "id"),
+    )
+
     def __init__(self, content: str, photo: str, profile_id: int, event_id: int) -> None:
         self.content = content
         self.photo = photo
         self.profile_id = profile_id
         self.event_id = event_id
+        self.created_at = datetime.utcnow()
+        self.time_score = time_score(self.created_at)
+
+    @staticmethod
+    def count_comment(post_id: int, count: int = 1):
+        """Moves the comment counter, and with it the scores, in place.
+        The caller commits it together with the comment.
+        """
+        db.session.execute(update(Post).where(Post.id == post_id)
+                           .values(comments_count=Post.comments_count + count))
 
     def get_up_votes(self):
-        list_of_profiles = []
-        for profile_id in self.up_vote:
-            list_of_profiles.append(Profile.query.get(profile_id))
-        return list_of_profiles
+        return Profile.query.join(PostVote, PostVote.profile_id == Profile.id) \
+            .filter(PostVote.post_id == self.id, PostVote.value == 1).all()
 
     def get_down_votes(self):
-        list_of_profiles = []
-        for profile_id in self.down_vote:
-            list_of_profiles.append(Profile.query.get(profile_id))
-        return list_of_profiles
-
-    def add_up_vote(self, profile_id: int):
-        up_voters = []
-        for id in self.up_vote:
-            up_voters.append(id)
-        up_voters.append(profile_id)
-        self.up_vote = up_voters
+        return Profile.query.join(PostVote, PostVote.profile_id == Profile.id) \
+            .filter(PostVote.post_id == self.id, PostVote.value == -1).all()
+
+    def toggle_vote(self, profile_id: int, value: int) -> dict:
+        """Casts, switches or withdraws a vote and moves the counters in one statement.
+        The upsert locks the vote row, so repeated clicks of one profile are applied
+        in order, and the counters are incremented in place, so no click is lost.
+        Args:
+            value (int): 1 to up vote, -1 to down vote. Repeating the current vote withdraws it.
+        Returns:
+            dict: "up_votes", "down_votes" and the "vote" of the profile (1, -1 or 0).
+        """
+        row = db.session.execute(text("""
+            WITH vote AS (
+                INSERT INTO post_vote (post_id, profile_id, value, previous_value, created_at)
+                VALUES (:post_id, :profile_id, :value, 0, :created_at)
+                ON CONFLICT (post_id, profile_id) DO UPDATE SET
+                    previous_value = post_vote.value,
+                    value = CASE WHEN post_vote.value = EXCLUDED.value
+                                 THEN 0 ELSE EXCLUDED.value END
+                RETURNING value, previous_value
+            )
+            UPDATE post SET
+                up_votes = post.up_votes
+                    + (vote.value = 1)::int - (vote.previous_value = 1)::int,
+                down_votes = post.down_votes
+                    + (vote.value = -1)::int - (vote.previous_value = -1)::int
+            FROM vote
+            WHERE post.id = :post_id
+            RETURNING post.up_votes, post.down_votes, post.top_score, post.hot_score,
+                vote.value
+        """), {
+            "post_id": self.id,
+            "profile_id": profile_id,
+            "value": value,
+            "created_at": datetime.utcnow()
+        }).first()
         db.session.commit()
+        # refreshed without marking them changed, a flush must not write them back
+        set_committed_value(self, "up_votes", row.up_votes)
+        set_committed_value(self, "down_votes", row.down_votes)
+        set_committed_value(self, "top_score", row.top_score)
+        set_committed_value(self, "hot_score", row.hot_score)
+        return {"up_votes": row.up_votes, "down_votes": row.down_votes, "vote": row.value}
 
-    def add_down_vote(self, profile_id: int):
-        down_voters = []
-        for id in self.down_vote:
-            down_voters.append(id)
-        down_voters.append(profile_id)
-        self.down_vote = down_voters
-        db.session.commit()
+    def times_ago(self):
+        return format(self.created_at, datetime.utcnow())
 
-    def remove_up_vote(self, profile_id: int):
-        up_voters = []
-        for id in self.up_vote:
-            if profile_id != id:
-                up_voters.append(id)
-        self.up_vote = up_voters
-        db.session.commit()
 
-    def remove_down_vote(self, profile_id: int):
-        down_voters = []
-        for id in self.down_vote:
-            if profile_id != id:
-                down_voters.append(id)
-        self.down_vote = down_voters
-        db.session.commit()
+class PostVote(db.Model):
+    post_id = db.Column(db.Integer, db.ForeignKey("post.id", ondelete="CASCADE"),
+                        primary_key=True)
+    profile_id = db.Column(db.Integer, db.ForeignKey("profile.id"), primary_key=True)
+    # 1 up, -1 down, 0 withdrawn
+    value = db.Column(db.SmallInteger, nullable=False)
+    # the value before the last toggle, the counters are moved by the difference
+    previous_value = db.Column(db.SmallInteger, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-    def times_ago(self):
-        return format(self.created_at, datetime.utcnow())
+    @staticmethod
+    def of(profile_id: int, post_ids: list) -> dict:
+        """Returns the votes of a profile on the posts, by post id."""
+        if not post_ids:
+            return {}
+        return dict(db.session.query(PostVote.post_id, PostVote.value).filter(
+            PostVote.profile_id == profile_id, PostVote.post_id.in_(post_ids)))
 
 
 class Comment(db.Model):
@@ -574,9 +821,14 @@ class Comment(db.Model):
     post_id = db.Column(db.Integer, db.ForeignKey("post.id"))
     content = db.Column(db.String, nullable=False)
     replies = db.relationship("Reply", backref="comment")
-    created_at = db.Column(db.DateTime, default=datetime.utcnow())
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow())
 
+    # the comment API pages through one post, oldest first
+    __table_args__ = (
+        db.Index("ix_comment_post_id_created_at_id", "post_id", "created_at", "id"),
+    )
+
     def __init__(self, content: str, post_id: int, profile_id: int) -> None:
         self.content = content
         self.post_id = post_id
@@ -591,9 +843,14 @@ class Reply(db.Model):
     profile_id = db.Column(db.Integer, db.ForeignKey("profile.id"))
     content = db.Column(db.String, nullable=False)
     comment_id = db.Column(db.Integer, db.ForeignKey("comment.id"))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow())
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow())
 
+    # the reply API pages through one comment, oldest first
+    __table_args__ = (
+        db.Index("ix_reply_comment_id_created_at_id", "comment_id", "created_at", "id"),
+    )
+
     def __init__(self, content: str, comment_id: int, profile_id: int) -> None:
         self.content = content
         self.comment_id = comment_id
@@ -601,3 +858,80 @@ class Reply(db.Model):
 
     def times_ago(self):
         return format(self.created_at, datetime.utcnow())
+
+
+class StoredFile(db.Model):
+    # "media" or "originals", the storage the key belongs to
+    store = db.Column(db.String(20), primary_key=True)
+    key = db.Column(db.String, primary_key=True)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @staticmethod
+    def add_reference(store: str, key: str, count: int = 1):
+        # the upsert row lock orders this against a concurrent release
+        db.session.execute(insert(StoredFile).values(
+            store=store, key=key, ref_count=count, created_at=datetime.utcnow()
+        ).on_conflict_do_update(
+            index_elements=["store", "key"],
+            set_={"ref_count": StoredFile.ref_count + count}))
+
+    @staticmethod
+    def forget(store: str, key: str) -> int:
+        """Deletes the row of a file that is gone, the caller commits.
+        Returns:
+            int: The references the row still counted.
+        """
+        row = db.session.execute(delete(StoredFile).where(
+            StoredFile.store == store, StoredFile.key == key
+        ).returning(StoredFile.ref_count)).first()
+        return row.ref_count if row else 0
+
+    @staticmethod
+    def release(store: str, key: str, count: int = 1) -> bool:
+        """Drops count references of the key, the caller commits.
+        Returns:
+            bool: True if nothing references the key anymore. Files stored
+            before reference counting have no row and are never shared.
+        """
+        row = db.session.execute(update(StoredFile).where(
+            StoredFile.store == store, StoredFile.key == key
+        ).values(ref_count=StoredFile.ref_count - count)
+            .returning(StoredFile.ref_count)).first()
+        if row is None:
+            return True
+        if row.ref_count > 0:
+            return False
+        db.session.execute(delete(StoredFile).where(
+            StoredFile.store == store, StoredFile.key == key))
+        return True
+
+
+class OutgoingMail(db.Model):
+    """A mail waiting for `flask mail worker`, requests only queue them.
+    status is "pending" until sent ("sent") or out of attempts ("dead").
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    recipient = db.Column(db.String(150), nullable=False)
+    subject = db.Column(db.String, nullable=False)
+    body = db.Column(db.String, nullable=False)
+    status = db.Column(db.String(10), nullable=False, default="pending")
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_error = db.Column(db.String)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    # the worker only ever looks at pending mails that are due
+    __table_args__ = (
+        db.Index("ix_outgoing_mail_next_attempt_at_pending", "next_attempt_at",
+                 postgresql_where=text("status = 'pending'")),
+    )
+
+    def __init__(self, recipient: str, subject: str, body: str) -> None:
+        self.recipient = recipient
+        self.subject = subject
+        self.body = body
+        self.status = "pending"
+        self.attempts = 0
+        self.next_attempt_at = datetime.utcnow()
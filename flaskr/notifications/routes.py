@@ -1,25 +1,111 @@
-from flask import Blueprint, flash, redirect, render_template, request, url_for
+from flask import (Blueprint, Response, flash, jsonify, redirect,
+                   render_template, request, url_for)
 from flask_login import current_user, login_required
+from flaskr import db
 from flaskr.admins.forms import *
-from flaskr.models import Notification
-from sqlalchemy import desc
+from flaskr.models import Notification, NotificationArchive, Profile
+from flaskr.streams import event_stream, notification_listener, sse_event
+from flaskr.utils import decode_cursor, encode_cursor, paginate_by_cursor
 
 notifications = Blueprint("notifications", __name__)
 
+NOTIFICATIONS_PER_PAGE = 20
+
+
+def __notifications_page(unread_only: bool, cursor=None):
+    query = Notification.query.filter_by(profile_id=current_user.profile.id)
+    if unread_only:
+        # the archive only holds read notifications
+        return paginate_by_cursor(query.filter(Notification.is_readed == False), Notification,
+                                  cursor, NOTIFICATIONS_PER_PAGE)
+    live, live_next = paginate_by_cursor(query, Notification, cursor, NOTIFICATIONS_PER_PAGE)
+    archived, archived_next = paginate_by_cursor(
+        NotificationArchive.query.filter_by(profile_id=current_user.profile.id),
+        NotificationArchive, cursor, NOTIFICATIONS_PER_PAGE)
+    # both ordered by (created_at, id) and ids are unique across the two, so one cursor serves both
+    rows = sorted(live + archived, key=lambda row: (row.created_at, row.id), reverse=True)
+    page = rows[:NOTIFICATIONS_PER_PAGE]
+    next_cursor = None
+    if len(rows) > NOTIFICATIONS_PER_PAGE or live_next or archived_next:
+        next_cursor = encode_cursor(page[-1].created_at, page[-1].id)
+    return page, next_cursor
+
 
 @notifications.route("/notifications")
 @login_required
 def get_notifications():
-    notifications = Notification.query.filter_by(
-        profile_id=current_user.profile.id).order_by(desc(Notification.created_at))[:20]
-    return render_template("notifications/notification.html", notifications=notifications)
+    unread_only = request.args.get("filter") == "unread"
+    notifications, next_cursor = __notifications_page(unread_only)
+    return render_template("notifications/notification.html", notifications=notifications,
+                           next_cursor=next_cursor, unread_only=unread_only)
+
+
+@notifications.route("/notifications/page")
+@login_required
+def get_notifications_page():
+    cursor = request.args.get("cursor")
+    decoded_cursor = decode_cursor(cursor) if cursor else None
+    if cursor and not decoded_cursor:
+        return jsonify({
+            "error": "Invalid cursor."
+        }), 400
+    unread_only = request.args.get("filter") == "unread"
+    page, next_cursor = __notifications_page(unread_only, decoded_cursor)
+    return jsonify({
+        "html": render_template("notifications/notification-page.html", notifications=page),
+        "next_cursor": next_cursor
+    }), 200
+
+
+@notifications.route("/notifications/unread")
+@login_required
+def unread_count():
+    # what the badge polls when streams would hold a sync worker
+    unread = db.session.query(Profile.unread_notifications) \
+        .filter(Profile.id == current_user.profile.id).scalar()
+    return jsonify({
+        "unread": unread
+    }), 200
+
+
+@notifications.route("/notifications/stream")
+@login_required
+def stream():
+    profile_id = current_user.profile.id
+    # subscribing before the catch up query leaves no gap, duplicates are dropped by id on the client
+    queue = notification_listener.subscribe(profile_id)
+    missed = []
+    last_event_id = request.headers.get("Last-Event-ID", type=int)
+    if last_event_id:
+        unread = db.session.query(Profile.unread_notifications) \
+            .filter(Profile.id == profile_id).scalar()
+        missed = [Notification.stream_event(unread, notification.id,
+                                            notification.message, notification.link)
+                  for notification in Notification.query
+                  .filter(Notification.profile_id == profile_id, Notification.id > last_event_id)
+                  .order_by(Notification.id).limit(NOTIFICATIONS_PER_PAGE)]
+
+    def to_event(data):
+        id = data["notification"]["id"] if "notification" in data else None
+        return sse_event(data, id, "notification")
+
+    events = event_stream(queue, missed, to_event,
+                          lambda: notification_listener.unsubscribe(profile_id, queue))
+    # the app context, and with it the database session, ends before streaming starts
+    return Response(events, mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
 
 
 @notifications.route("/notification/mark-read/<int:id>")
 @login_required
 def mark_read(id: int):
     notification = Notification.query.get(id)
-    if notification.profile.id != current_user.profile.id:
+    if notification is None:
+        # archived, and so already read
+        pass
+    elif notification.profile.id != current_user.profile.id:
         flash("Not authorized for this action.", "danger")
     else:
         notification.mark_read()
@@ -29,9 +115,12 @@ def mark_read(id: int):
 @notifications.route("/notification/mark-read-and-go/<int:id>")
 @login_required
 def mark_read_and_go(id: int):
-    notification = Notification.query.get(id)
+    notification = Notification.query.get(id) or NotificationArchive.query.get(id)
+    if notification is None:
+        flash("Notification not found.", "danger")
+        return redirect(url_for("notifications.get_notifications"))
     # If the user is not the owner of that notification
-    if notification.profile.id != current_user.profile.id:
+    if notification.profile_id != current_user.profile.id:
         flash("Not authorized for this action.", "danger")
     elif not notification.is_readed:
         notification.mark_read()
@@ -43,8 +132,5 @@ def mark_read_and_go(id: int):
 @notifications.route("/notification/mark_all")
 @login_required
 def mark_all():
-    notifications = current_user.profile.notifications
-    for notification in notifications:
-        if not notification.is_readed:
-            notification.mark_read()
+    Notification.mark_all_read(current_user.profile.id)
     return redirect(url_for("notifications.get_notifications"))
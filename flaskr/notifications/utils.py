@@ -1,3 +1,12 @@
+from datetime import datetime
+
+from sqlalchemy import false, insert, literal, select, update
+
+from flaskr import db
+from flaskr.models import Notification, Profile, Role, User
+from flaskr.streams import notification_listener
+
+
 class NotificationMessage():
     @staticmethod
     def approvedPromotion():
@@ -58,3 +67,48 @@ class NotificationMessage():
     @staticmethod
     def review_profile(name):
         return f"{name} has reviewed your profile."
+
+
+def __fan_out(recipients, message: str, link: str) -> int:
+    # one INSERT ... SELECT for the notifications, the UPDATE of the unread
+    # counters reads the inserted rows, both run as a single statement
+    now = datetime.utcnow()
+    notification = Notification.__table__
+    profile = Profile.__table__
+    sent = insert(notification).from_select(
+        ["profile_id", "message", "link", "is_readed", "created_at", "updated_at"],
+        recipients.add_columns(literal(message), literal(link), false(),
+                               literal(now), literal(now))
+    ).returning(notification.c.id, notification.c.profile_id).cte("sent")
+    rows = db.session.execute(
+        update(profile).where(profile.c.id == sent.c.profile_id)
+        .values(unread_notifications=profile.c.unread_notifications + 1)
+        .returning(profile.c.id, profile.c.unread_notifications, sent.c.id.label("notification_id"))
+    ).all()
+    # by position, both ids come from an "id" column and are ambiguous by name
+    notification_listener.publish_many([
+        (profile_id, Notification.stream_event(unread, notification_id, message, link))
+        for profile_id, unread, notification_id in rows])
+    return len(rows)
+
+
+def notify_profiles(profile_ids, message: str, link: str = "") -> int:
+    """Sends one notification to each of the profiles, however many they are.
+    Ids of missing profiles are skipped. The caller commits.
+    Returns:
+        int: The number of notifications sent.
+    """
+    profile_ids = list(set(profile_ids))
+    if not profile_ids:
+        return 0
+    return __fan_out(select(Profile.id).where(Profile.id.in_(profile_ids)), message, link)
+
+
+def notify_role(role: Role, message: str, link: str = "") -> int:
+    """Sends a notification to the profile of every user with the role, no rows are loaded.
+    The caller commits.
+    Returns:
+        int: The number of notifications sent.
+    """
+    return __fan_out(select(Profile.id).join(User, User.id == Profile.user_id)
+                     .where(User.role == role), message, link)
@@ -3,6 +3,7 @@ from flask_wtf import FlaskForm
 from flask_wtf.file import FileAllowed, FileField
 from flaskr import bcrypt
 from flaskr.models import User
+from flaskr.profiles.utils import check_photo
 from wtforms import (DateField, PasswordField, StringField, SubmitField,
                      TextAreaField)
 from wtforms.validators import (URL, DataRequired, EqualTo, Length, Optional,
@@ -63,6 +64,18 @@ class ChangePhoto(FlaskForm):
                               FileAllowed(["jpg", "jpeg", "png"])])
     save = SubmitField("Update")
 
+    def validate_cover_photo(self, cover_photo):
+        if cover_photo.data:
+            error = check_photo(cover_photo.data)
+            if error:
+                raise ValidationError(error)
+
+    def validate_profile_photo(self, profile_photo):
+        if profile_photo.data:
+            error = check_photo(profile_photo.data)
+            if error:
+                raise ValidationError(error)
+
 
 class ChangeConnections(FlaskForm):
     facebook = StringField("Facebook", validators=[Optional(), URL()], render_kw={
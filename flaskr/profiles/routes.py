@@ -3,10 +3,11 @@ from flask_login import current_user, login_required
 from flaskr import bcrypt, db
 from flaskr.admins.forms import BanUserForm
 from flaskr.decorators import is_general, is_unbanned, is_verified
+from flaskr.loaders import load_many, queue
 from flaskr.models import (Complain, Event, Notification, Profile,
                            PromotionPending, Review, Role, SocialConnection,
                            User)
-from flaskr.notifications.utils import NotificationMessage
+from flaskr.notifications.utils import NotificationMessage, notify_role
 from flaskr.profiles.forms import *
 from flaskr.profiles.utils import remove_photo, save_photos
 
@@ -23,6 +24,9 @@ def view_profile(id: int):
         return render_template("mains/errors.html", status=404, message="User not found!")
     hosted_events = user.profile.hosted_events
     joined_events = user.profile.get_joined_events()
+    # hosts of the joined events and reviewers are fetched in one query
+    queue(Profile, [review.reviewed_by for review in user.profile.reviews])
+    load_many(Profile, [event.host_id for event in joined_events])
     return render_template("profiles/view-profile.html", user=user,
                            len=len, ban_form=ban_user_form,
                            hosted_events=hosted_events,
@@ -64,8 +68,7 @@ def change_photos():
             if not ("/images/default/ProfilePhotos/default.png" in file_path):
                 remove_photo(file_path)
             # saving
-            photo_file = save_photos(
-                form.profile_photo.data, current_user.id, "profile", 250, 250)
+            photo_file = save_photos(form.profile_photo.data, "profile")
             current_user.profile.profile_photo = "/images/uploads/profile/" + photo_file
             db.session.commit()
         if form.cover_photo.data:
@@ -74,8 +77,7 @@ def change_photos():
             if not ("/images/default/CoverPhotos/default.png" in file_path):
                 remove_photo(file_path)
             # saving
-            photo_file = save_photos(
-                form.cover_photo.data, current_user.id, "cover", 1040, 260)
+            photo_file = save_photos(form.cover_photo.data, "cover")
             current_user.profile.cover_photo = "/images/uploads/cover/" + photo_file
             db.session.commit()
     return render_template("profiles/change-photos.html", active="change-photos", form=form)
@@ -187,15 +189,8 @@ def req_for_host():
     new_pending_req = PromotionPending(current_user.profile.id)
     db.session.add(new_pending_req)
     # push notification
-    users = User.query.filter_by(role=Role.ADMIN).all()
-    for u in users:
-        notification = Notification(
-            NotificationMessage.want_promotion(
-                current_user.profile.get_fullname()),
-            url_for("admins.pending_request"),
-            u.profile.id
-        )
-        db.session.add(notification)
+    notify_role(Role.ADMIN, NotificationMessage.want_promotion(
+        current_user.profile.get_fullname()), url_for("admins.pending_request"))
     db.session.commit()
     flash("A request has been sent. Wait for the response from admins.", "success")
     return redirect(url_for("mains.homepage"))
@@ -214,6 +209,9 @@ def view_complains():
     else:
         complains = Complain.query \
             .filter_by(complain_for=current_user.profile.id).all()
+    complained_profiles = load_many(Profile, [c.complain_for for c in complains] +
+                                    [c.profile_id for c in complains])
+    load_many(User, [p.user_id for p in complained_profiles])
     return render_template("profiles/complains.html", len=len, complains=complains, active=active)
 
 
@@ -307,17 +305,14 @@ def bookmarks():
         # fetch event bookmarks
         event_bookmark_ids = Profile.query.get(
             current_user.profile.id).event_bookmarks
-        if event_bookmark_ids:
-            for id in event_bookmark_ids:
-                bookmarks.append(Event.query.get(id))
+        bookmarks = load_many(Event, event_bookmark_ids)
+        load_many(Profile, [event.host_id for event in bookmarks])
         active = "event"
     else:
         # fetch profile bookmarks
         profile_bookmark_ids = Profile.query.get(
             current_user.profile.id).profile_bookmarks
-        if profile_bookmark_ids:
-            for id in profile_bookmark_ids:
-                bookmarks.append(Profile.query.get(id))
+        bookmarks = load_many(Profile, profile_bookmark_ids)
     return render_template("profiles/bookmarks.html", len=len, active=active, bookmarks=bookmarks)
 
 
@@ -332,17 +327,11 @@ def events():
     if filtered_event_str == "joined":
         # fetch joined events
         active = "joined"
-        joined_event_ids = current_user.profile.joined_events
-        if joined_event_ids:
-            for id in joined_event_ids:
-                events.append(Event.query.get(id))
+        events = current_user.profile.get_joined_events()
     elif filtered_event_str == "pending":
         # fetch pending events
         active = "pending"
-        pending_event_ids = current_user.profile.pending_events
-        if pending_event_ids:
-            for id in pending_event_ids:
-                events.append(Event.query.get(id))
+        events = load_many(Event, current_user.profile.pending_events)
     else:
         # fetch self events
         self_events = current_user.profile.hosted_events
@@ -1,8 +1,35 @@
 import os
-from secrets import token_hex
+import re
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from threading import Lock
 
-from flaskr import app
+from flask import url_for
+from flaskr import app, db
+from flaskr.images.utils import width_bucket
+from flaskr.models import StoredFile
+from flaskr.storage import (content_hash, media_storage, originals_storage,
+                            sharded_key)
 from PIL import Image
+from sqlalchemy import event
+
+PROCESSING_PLACEHOLDER = "/images/default/Icons/processing.svg"
+SHARDED_PHOTO_KEY = re.compile(
+    r"^[^/]+/[0-9a-f]{2}/[0-9a-f]{2}/(?P<hash>[0-9a-f]{64})-\d+x\d+(?P<ext>\.\w+)$")
+
+# size every photo of an upload folder is cropped to
+PHOTO_SIZES = {
+    "profile": (250, 250),
+    "cover": (1040, 260),
+    "eventCover": (1180, 450),
+    "eventPhotos": (1280, 720)
+}
+
+# Pillow refuses to decode anything larger, in the web and the worker processes
+Image.MAX_IMAGE_PIXELS = app.config["MAX_PHOTO_PIXELS"]
+
+__pool = None
+__pool_lock = Lock()
 
 
 class _Image(Image.Image):
@@ -24,35 +51,151 @@ class _Image(Image.Image):
         else:
             newwidth = self.width
             newheight = int(self.width / (aspect / divisor))
-        img = self.crop((alignx * (self.width - newwidth),
-                         aligny * (self.height - newheight),
-                         alignx * (self.width - newwidth) + newwidth,
-                         aligny * (self.height - newheight) + newheight))
+        # whole pixels, a fractional box can come out a pixel wider than the aspect
+        left = round(alignx * (self.width - newwidth))
+        top = round(aligny * (self.height - newheight))
+        img = self.crop((left, top, left + newwidth, top + newheight))
         return img
 
 
 Image.Image.crop_to_aspect = _Image.crop_to_aspect
 
 
-def save_photos(photo, id: int, folder_name: str, width: int, height: int):
-    random_hex = token_hex(8)
+def __processing_pool() -> ProcessPoolExecutor:
+    # created on first upload, so forked web workers each get their own pool
+    global __pool
+    with __pool_lock:
+        if __pool is None:
+            __pool = ProcessPoolExecutor(
+                max_workers=app.config["IMAGE_WORKERS"] or os.cpu_count())
+        return __pool
+
+
+def process_photo(original_key: str, photo_key: str, width: int, height: int):
+    """Crops and resizes a stored original into the served photo.
+    Runs in a worker process.
+    """
+    _, file_ext = os.path.splitext(photo_key)
+    with originals_storage.open(original_key) as source:
+        image = Image.open(source)
+        if image.format == "JPEG":
+            # decodes at 1/2, 1/4 or 1/8 scale when that still covers the target size
+            image.draft(image.mode, (width, height))
+
+        cropped = image.crop_to_aspect(width, height)
+        cropped.thumbnail((width, height), Image.ANTIALIAS)
+
+    buffer = BytesIO()
+    cropped.save(buffer, format=Image.registered_extensions()[file_ext])
+    buffer.seek(0)
+    media_storage.save(photo_key, buffer)
+
+
+def photo_key_for(digest: str, file_ext: str, folder_name: str) -> str:
+    # "cover/ab/cd/<hash>-1040x260.jpg", the current size of the folder is part of the name
+    width, height = PHOTO_SIZES[folder_name]
+    return sharded_key(digest, f"-{width}x{height}{file_ext}", folder_name)
+
+
+def original_key_of(photo_key: str) -> str:
+    # "cover/ab/cd/<hash>-1040x260.jpg" -> "ab/cd/<hash>.jpg"
+    match = SHARDED_PHOTO_KEY.match(photo_key)
+    if not match:
+        # stored before content addressing, kept under the same name
+        return photo_key
+    return sharded_key(match.group("hash"), match.group("ext"))
+
+
+def __log_failure(future):
+    if future.exception():
+        app.logger.error("Photo processing failed: %s", future.exception())
+
+
+def check_photo(photo):
+    """Reads only the header of an upload, before anything is stored or decoded.
+    Returns:
+        str: Why the photo is rejected, None if it can be processed.
+    """
+    try:
+        with Image.open(photo.stream) as image:
+            width, height = image.size
+    except (OSError, Image.DecompressionBombError):
+        return "The file is not a supported image."
+    finally:
+        photo.stream.seek(0)
+    if width * height > app.config["MAX_PHOTO_PIXELS"]:
+        return f"The photo is too large, at most {app.config['MAX_PHOTO_PIXELS'] // 1000000} megapixels are allowed."
+    return None
+
+
+def save_photos(photo, folder_name: str):
+    """Stores the upload under its content hash and queues the cropped photo on the processing pool.
+    Identical uploads share one original and one photo, each upload adds a reference.
+    Returns:
+        str: The sharded file name of the photo in the folder, shown as a
+        placeholder until it is processed.
+    """
     _, file_ext = os.path.splitext(photo.filename)
-    photo_filename = random_hex + str(id) + file_ext
-    photo_path = os.path.join(app.root_path,
-                              f"static/images/uploads/{folder_name}/" + photo_filename)
+    file_ext = file_ext.lower()
+    digest = content_hash(photo.stream)
+    original_key = sharded_key(digest, file_ext)
+    photo_key = photo_key_for(digest, file_ext, folder_name)
+
+    # uploaded again before a removal of the same photo was committed
+    removed = db.session.info.get("removed_files", set())
+    removed.discard(("originals", original_key))
+    removed.discard(("media", photo_key))
 
-    image = Image.open(photo)
+    StoredFile.add_reference("originals", original_key)
+    if not originals_storage.exists(original_key):
+        # copied in chunks, the upload is never read into memory whole
+        originals_storage.save(original_key, photo.stream)
 
-    cropped = image.crop_to_aspect(width, height)
-    cropped.thumbnail((width, height), Image.ANTIALIAS)
+    StoredFile.add_reference("media", photo_key)
+    if not media_storage.exists(photo_key):
+        future = __processing_pool().submit(
+            process_photo, original_key, photo_key, *PHOTO_SIZES[folder_name])
+        future.add_done_callback(__log_failure)
+    return photo_key[len(folder_name) + 1:]
 
-    cropped.save(photo_path)
-    return photo_filename
+
+@app.template_global()
+def photo_url(path: str, width: int = None) -> str:
+    """URL of a stored photo, or of a placeholder while it is processed.
+    With a width, the URL of a resized derivative at least that wide.
+    """
+    if path and path.startswith("/images/uploads/") \
+            and not media_storage.exists(path.replace("/images/uploads/", "", 1)):
+        return url_for("static", filename=PROCESSING_PLACEHOLDER)
+    if width and path:
+        return url_for("images.derivative", width=width_bucket(width), path=path.lstrip("/"))
+    return url_for("static", filename=path)
 
 
 def remove_photo(file_path):
-    try:
-        full_path = os.path.join(app.root_path, "static" + file_path)
-        os.unlink(full_path)
-    except:
-        return None
+    """Drops a reference to a stored photo and its original, files go with the last reference
+    once the caller commits. A rollback keeps them.
+    """
+    photo_key = file_path.replace("/images/uploads/", "", 1)
+    original_key = original_key_of(photo_key)
+    removed = db.session.info.setdefault("removed_files", set())
+    if StoredFile.release("media", photo_key):
+        removed.add(("media", photo_key))
+    if StoredFile.release("originals", original_key):
+        removed.add(("originals", original_key))
+
+
+@event.listens_for(db.session, "after_commit")
+def __delete_removed_files(session):
+    storages = {"media": media_storage, "originals": originals_storage}
+    for store, key in session.info.pop("removed_files", ()):
+        try:
+            if storages[store].exists(key):
+                storages[store].delete(key)
+        except OSError as error:
+            app.logger.warning("Could not remove %s %s: %s", store, key, error)
+
+
+@event.listens_for(db.session, "after_rollback")
+def __keep_removed_files(session):
+    session.info.pop("removed_files", None)
@@ -1,6 +1,9 @@
+import json
+
 from marshmallow import fields
 
-from flaskr import ma
+from flaskr import app, ma
+from flaskr.profiles.utils import photo_url
 
 
 class UserSchemaForProfile(ma.Schema):
@@ -23,10 +26,42 @@ class EventSchemaForPost(ma.Schema):
     title = fields.String()
 
 
+class EventSchemaForSearch(ma.Schema):
+    id = fields.Integer()
+    title = fields.String()
+    place_name = fields.String()
+    cover_photo = fields.String()
+    event_time = fields.DateTime()
+    fee = fields.Integer()
+
+
+class ProfileSchemaForSearch(ma.Schema):
+    id = fields.Integer()
+    first_name = fields.String()
+    last_name = fields.String()
+    profile_photo = fields.String()
+
+
+class SenderSchemaForMessage(ProfileSchemaForSearch):
+    # the avatar as the page would render it, streamed messages need no url building
+    photo_url = fields.Function(lambda profile: photo_url(profile.profile_photo, 80))
+
+
+class MessageSchema(ma.Schema):
+    id = fields.Integer()
+    message_text = fields.String()
+    message_photo = fields.String()
+    event_id = fields.Integer()
+    sender = fields.Nested(SenderSchemaForMessage)
+    created_at = fields.DateTime()
+
+
 class ReplySchema(ma.Schema):
     id = fields.Integer()
     content = fields.String()
+    profile_id = fields.Integer()
     profile = fields.Nested(ProfileSchemaForPostCommentReply)
+    comment_id = fields.Integer()
     created_at = fields.DateTime()
 
 
@@ -34,6 +69,7 @@ class CommentSchema(ma.Schema):
     id = fields.Integer()
     content = fields.String()
     replies = fields.List(fields.Nested(ReplySchema))
+    profile_id = fields.Integer()
     profile = fields.Nested(ProfileSchemaForPostCommentReply)
     post_id = fields.Integer()
     created_at = fields.DateTime()
@@ -42,8 +78,8 @@ class CommentSchema(ma.Schema):
 class PostSchema(ma.Schema):
     id = fields.Integer()
     content = fields.String()
-    up_vote = fields.List(fields.Integer())
-    down_vote = fields.List(fields.Integer())
+    up_votes = fields.Integer()
+    down_votes = fields.Integer()
     comments = fields.List(fields.Nested(CommentSchema))
     created_at = fields.DateTime()
     profile = fields.Nested(ProfileSchemaForPostCommentReply)
@@ -58,3 +94,56 @@ comment_schemas = CommentSchema(many=True)
 
 reply_schema = ReplySchema()
 reply_schemas = ReplySchema(many=True)
+
+event_search_schemas = EventSchemaForSearch(many=True)
+profile_search_schemas = ProfileSchemaForSearch(many=True)
+
+message_schema = MessageSchema()
+message_schemas = MessageSchema(many=True)
+
+
+def __compile_field(field):
+    # the same output as marshmallow for the field types these schemas use
+    if isinstance(field, fields.Nested):
+        dump = compile_schema(field.nested)
+        return lambda value: dump(value)
+    if isinstance(field, fields.List):
+        dump_item = __compile_field(field.inner)
+        return lambda value: [dump_item(item) for item in value]
+    if isinstance(field, fields.DateTime):
+        return lambda value: value.isoformat()
+    if isinstance(field, fields.Integer):
+        return int
+    if isinstance(field, fields.Boolean):
+        return bool
+    return str
+
+
+def compile_schema(schema_class):
+    """Builds a plain function that dumps an object like schema_class().dump(),
+    without marshmallow's per call overhead. Supports the field types used here.
+    """
+    getters = [(name, field.attribute or name, __compile_field(field))
+               for name, field in schema_class._declared_fields.items()]
+    missing = object()
+
+    def dump(obj) -> dict:
+        data = {}
+        for name, attribute, convert in getters:
+            value = getattr(obj, attribute, missing)
+            # left out like marshmallow does, None is kept as null
+            if value is missing:
+                continue
+            data[name] = None if value is None else convert(value)
+        return data
+    return dump
+
+
+def fast_jsonify(data, status: int = 200):
+    return app.response_class(json.dumps(data, separators=(",", ":")),
+                              status=status, mimetype="application/json")
+
+
+dump_post = compile_schema(PostSchema)
+dump_comment = compile_schema(CommentSchema)
+dump_reply = compile_schema(ReplySchema)
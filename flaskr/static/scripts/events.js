@@ -0,0 +1,66 @@
+// pages that render their first page server side and fetch the rest by cursor
+function infinite_scroll(holder, loader) {
+    let is_loading = false;
+    let observer = null;
+
+    function load_more() {
+        const next_cursor = loader.getAttribute("data-nextCursor");
+        if (is_loading || !next_cursor) {
+            return;
+        }
+        is_loading = true;
+
+        let headers = new Headers();
+        headers.append('Accept', 'Application/JSON');
+
+        // data-url may already carry a query string, like the sort of the posts
+        let url = new URL(loader.getAttribute("data-url"), window.location.href);
+        url.searchParams.set("cursor", next_cursor);
+
+        let req = new Request(url, {
+            method: 'GET',
+            mode: 'cors',
+            headers,
+        });
+
+        fetch(req)
+            .then((res) => res.json())
+            .then((data) => {
+                holder.insertAdjacentHTML("beforeend", data.html);
+                if (data.next_cursor) {
+                    loader.setAttribute("data-nextCursor", data.next_cursor);
+                    // re-observe so a loader that is still visible triggers the next page
+                    observer.unobserve(loader);
+                    observer.observe(loader);
+                } else {
+                    loader.remove();
+                }
+                is_loading = false;
+            })
+            .catch((e) => {
+                is_loading = false;
+                console.error(e);
+            });
+    }
+
+    observer = new IntersectionObserver((entries) => {
+        if (entries[0].isIntersecting) {
+            load_more();
+        }
+    }, { rootMargin: "300px" });
+    observer.observe(loader);
+}
+
+const event_holder = document.getElementById("event-holder");
+const event_loader = document.getElementById("event-loader");
+
+if (event_holder && event_loader) {
+    infinite_scroll(event_holder, event_loader);
+}
+
+const post_page_holder = document.getElementById("post-holder");
+const post_loader = document.getElementById("post-loader");
+
+if (post_page_holder && post_loader) {
+    infinite_scroll(post_page_holder, post_loader);
+}
@@ -0,0 +1,150 @@
+const message_holder = document.getElementById("message-holder");
+const message_input = document.getElementById("message-input-box");
+
+const rendered_message_ids = new Set();
+let older_messages_cursor = null;
+let is_loading_messages = false;
+
+function message_element(data) {
+    const is_outgoing = data.sender.id == message_holder.getAttribute("data-profileId");
+
+    let row = document.createElement("div");
+    row.className = `d-flex justify-content-${is_outgoing ? "end" : "start"} mb-2`;
+    row.id = `message-${data.id}`;
+
+    let img = document.createElement("img");
+    img.className = "message-img";
+    img.src = data.sender.photo_url;
+
+    let chat = document.createElement("div");
+    chat.className = "message-chat mx-3";
+    let text = document.createElement("p");
+    text.className = `${is_outgoing ? "outgoing-msg" : "recieved-msg"} py-2 px-3 my-0 text-container`;
+    text.textContent = data.message_text;
+    let name = document.createElement("small");
+    name.className = "mt-0 text-muted";
+    name.textContent = `${data.sender.first_name} ${data.sender.last_name}`;
+    chat.appendChild(text);
+    chat.appendChild(name);
+
+    if (is_outgoing) {
+        row.appendChild(chat);
+        row.appendChild(img);
+    } else {
+        row.appendChild(img);
+        row.appendChild(chat);
+    }
+    return row;
+}
+
+function append_message(data) {
+    if (rendered_message_ids.has(data.id)) {
+        return;
+    }
+    rendered_message_ids.add(data.id);
+    const is_at_bottom = message_holder.scrollHeight - message_holder.scrollTop - message_holder.clientHeight < 50;
+    message_holder.appendChild(message_element(data));
+    if (is_at_bottom) {
+        message_holder.scrollTop = message_holder.scrollHeight;
+    }
+}
+
+function load_messages() {
+    if (is_loading_messages) {
+        return;
+    }
+    is_loading_messages = true;
+
+    let headers = new Headers();
+    headers.append('Accept', 'Application/JSON');
+
+    let url = message_holder.getAttribute("data-url");
+    if (older_messages_cursor) {
+        url = `${url}?cursor=${encodeURIComponent(older_messages_cursor)}`;
+    }
+    let req = new Request(url, {
+        method: 'GET',
+        mode: 'cors',
+        headers,
+    });
+
+    const is_first_page = rendered_message_ids.size == 0;
+    return fetch(req)
+        .then((res) => res.json())
+        .then((data) => {
+            const previous_height = message_holder.scrollHeight;
+            let first_child = message_holder.firstChild;
+            data.messages.forEach((message) => {
+                if (!rendered_message_ids.has(message.id)) {
+                    rendered_message_ids.add(message.id);
+                    message_holder.insertBefore(message_element(message), first_child);
+                }
+            });
+            // keep the reader's position when older messages are prepended
+            message_holder.scrollTop = is_first_page
+                ? message_holder.scrollHeight
+                : message_holder.scrollHeight - previous_height;
+            older_messages_cursor = data.next_cursor;
+            is_loading_messages = false;
+        })
+        .catch((e) => {
+            is_loading_messages = false;
+            console.error(e);
+        });
+}
+
+function send_message() {
+    if (message_input.value.trim() === "") {
+        return;
+    }
+    let headers = new Headers();
+    headers.append('Accept', 'Application/JSON');
+    headers.append('Content-Type', 'Application/JSON');
+
+    let req = new Request(message_holder.getAttribute("data-url"), {
+        method: 'POST',
+        mode: 'cors',
+        headers,
+        body: JSON.stringify({
+            content: message_input.value,
+        })
+    });
+
+    fetch(req)
+        .then((res) => res.json())
+        .then((data) => {
+            append_message(data);
+            message_holder.scrollTop = message_holder.scrollHeight;
+            message_input.value = "";
+        })
+        .catch((e) => {
+            console.error(e);
+        });
+}
+
+function open_message_stream() {
+    // EventSource reconnects by itself and resends Last-Event-ID to catch up, until the
+    // first message arrives "since" tells the server what the first page showed
+    const since = Math.max(0, ...rendered_message_ids);
+    const url = `${message_holder.getAttribute("data-streamUrl")}?since=${since}`;
+    const message_stream = new EventSource(url);
+    message_stream.addEventListener("message", (e) => {
+        append_message(JSON.parse(e.data));
+    });
+}
+
+if (message_holder && message_input) {
+    load_messages().then(open_message_stream);
+
+    message_holder.addEventListener("scroll", function () {
+        if (message_holder.scrollTop == 0 && older_messages_cursor) {
+            load_messages();
+        }
+    });
+
+    message_input.addEventListener("keydown", function (e) {
+        if (e.key === "Enter") {
+            send_message();
+        }
+    });
+}
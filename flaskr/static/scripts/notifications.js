@@ -0,0 +1,43 @@
+const notification_holder = document.getElementById("notification-holder");
+const notification_loader = document.getElementById("notification-loader");
+
+if (notification_holder && notification_loader) {
+    infinite_scroll(notification_holder, notification_loader);
+}
+
+// the badge follows the unread count, pushed by the server under async workers and
+// fetched every minute otherwise, where an open stream would hold a worker per tab
+const NOTIFICATION_POLL_INTERVAL = 60000;
+const notification_counts = document.getElementsByClassName("notification-count");
+
+function set_notification_count(unread) {
+    for (const count of notification_counts) {
+        count.textContent = unread;
+    }
+}
+
+if (notification_counts.length > 0) {
+    const stream_url = notification_counts[0].getAttribute("data-streamUrl");
+    if (stream_url && window.EventSource) {
+        const notification_source = new EventSource(stream_url);
+
+        notification_source.addEventListener("notification", (e) => {
+            set_notification_count(JSON.parse(e.data).unread);
+        });
+    } else {
+        let headers = new Headers();
+        headers.append('Accept', 'Application/JSON');
+
+        setInterval(() => {
+            if (document.hidden) {
+                return;
+            }
+            fetch(new Request(notification_counts[0].getAttribute("data-countUrl"), { headers }))
+                .then((res) => res.json())
+                .then((data) => set_notification_count(data.unread))
+                .catch((e) => {
+                    console.error(e);
+                });
+        }, NOTIFICATION_POLL_INTERVAL);
+    }
+}
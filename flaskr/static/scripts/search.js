@@ -0,0 +1,40 @@
+const search_suggestions = document.getElementById("search-suggestions");
+const search_inputs = document.querySelectorAll("input[name='search']");
+
+let suggest_timer = null;
+
+function suggest(text) {
+    let headers = new Headers();
+    headers.append('Accept', 'Application/JSON');
+
+    let req = new Request(`${search_suggestions.getAttribute("data-url")}?q=${encodeURIComponent(text)}`, {
+        method: 'GET',
+        mode: 'cors',
+        headers,
+    });
+
+    fetch(req)
+        .then((res) => res.json())
+        .then((data) => {
+            search_suggestions.innerHTML = "";
+            data.suggestions.forEach((suggestion) => {
+                let option = document.createElement("option");
+                option.value = suggestion.label;
+                search_suggestions.appendChild(option);
+            });
+        })
+        .catch((e) => {
+            console.error(e);
+        });
+}
+
+search_inputs.forEach((input) => {
+    input.addEventListener("input", function () {
+        clearTimeout(suggest_timer);
+        if (input.value.trim() === "") {
+            search_suggestions.innerHTML = "";
+            return;
+        }
+        suggest_timer = setTimeout(() => suggest(input.value), 150);
+    });
+});
@@ -21,10 +21,10 @@ function up_vote(post_id, profile_id) {
     fetch(req)
         .then((res) => res.json())
         .then((data) => {
-            up_vote_counter.innerText = data.up_vote.length
-            down_vote_counter.innerText = data.down_vote.length
-            up_vote_btn.classList.toggle("btn-clicked")
-            down_vote_btn.classList.remove("btn-clicked")
+            up_vote_counter.innerText = data.up_votes
+            down_vote_counter.innerText = data.down_votes
+            up_vote_btn.classList.toggle("btn-clicked", data.vote === "up")
+            down_vote_btn.classList.toggle("btn-clicked", data.vote === "down")
         })
         .catch((e) => {
             console.error(e);
@@ -54,10 +54,10 @@ function down_vote(post_id, profile_id) {
     fetch(req)
         .then((res) => res.json())
         .then((data) => {
-            up_vote_counter.innerText = data.up_vote.length
-            down_vote_counter.innerText = data.down_vote.length
-            down_vote_btn.classList.toggle("btn-clicked")
-            up_vote_btn.classList.remove("btn-clicked")
+            up_vote_counter.innerText = data.up_votes
+            down_vote_counter.innerText = data.down_votes
+            up_vote_btn.classList.toggle("btn-clicked", data.vote === "up")
+            down_vote_btn.classList.toggle("btn-clicked", data.vote === "down")
         })
         .catch((e) => {
             console.error(e);
@@ -0,0 +1,174 @@
+import os
+import shutil
+import tempfile
+import time
+from hashlib import sha256
+from io import BytesIO
+from threading import Lock
+
+from flaskr import app
+
+CHUNK_SIZE = 64 * 1024
+
+
+def content_hash(stream) -> str:
+    """sha256 of a file object, read in chunks and rewound afterwards."""
+    digest = sha256()
+    for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+def sharded_key(digest: str, suffix: str = "", prefix: str = None) -> str:
+    # "ab12..." -> "ab/12/ab12...", two levels keep every directory small
+    key = f"{digest[:2]}/{digest[2:4]}/{digest}{suffix}"
+    return f"{prefix}/{key}" if prefix else key
+
+
+class Storage():
+    """Interface of a media store. Keys are relative, "/" separated paths."""
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def open(self, key: str):
+        """Returns a readable binary file object, raises FileNotFoundError."""
+        raise NotImplementedError
+
+    def save(self, key: str, stream):
+        """Writes a file object under the key, readers never see a partial file."""
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        """Removes the key, raises FileNotFoundError if it does not exist."""
+        raise NotImplementedError
+
+    def keys(self, prefix: str = ""):
+        """Yields every stored key in the prefix folder and below, in lexical order."""
+        raise NotImplementedError
+
+    def modified_at(self, key: str) -> float:
+        """Unix time of the last write of the key."""
+        raise NotImplementedError
+
+    def local_path(self, key: str):
+        """Path of the key on this machine, None for remote stores."""
+        return None
+
+
+class LocalStorage(Storage):
+    """Files under a root folder, which app nodes can share over a network mount."""
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+
+    def local_path(self, key: str) -> str:
+        path = os.path.realpath(os.path.join(self.root, key))
+        if not path.startswith(os.path.realpath(self.root) + os.sep):
+            raise ValueError(f"Key outside of the storage: {key}")
+        return path
+
+    def exists(self, key: str) -> bool:
+        return os.path.isfile(self.local_path(key))
+
+    def open(self, key: str):
+        return open(self.local_path(key), "rb")
+
+    def save(self, key: str, stream):
+        path = self.local_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # unique per call, threads and processes may write the same key at once
+        descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                shutil.copyfileobj(stream, file, CHUNK_SIZE)
+            # mkstemp makes the file private, stored media is served by other processes
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def delete(self, key: str):
+        os.unlink(self.local_path(key))
+        # empty shard folders are left behind, the next upload reuses them
+
+    def keys(self, prefix: str = ""):
+        yield from self.__walk(os.path.join(self.root, prefix), prefix)
+
+    def __walk(self, folder: str, prefix: str):
+        try:
+            entries = list(os.scandir(folder))
+        except FileNotFoundError:
+            return
+        # a folder sorts as "name/", so keys come out in the order of their strings
+        entries.sort(key=lambda entry: entry.name + ("/" if entry.is_dir() else ""))
+        for entry in entries:
+            key = f"{prefix}/{entry.name}" if prefix else entry.name
+            if entry.is_dir():
+                yield from self.__walk(entry.path, key)
+            elif not entry.name.endswith(".tmp"):
+                yield key
+
+    def modified_at(self, key: str) -> float:
+        return os.path.getmtime(self.local_path(key))
+
+
+class MemoryStorage(Storage):
+    """Object store kept in a dict, a stand-in for an S3 compatible bucket in tests.
+    Only visible to the process that wrote it, never configured for the app.
+    """
+
+    def __init__(self) -> None:
+        self.lock = Lock()
+        self.objects = {}
+        self.times = {}
+
+    def exists(self, key: str) -> bool:
+        return key in self.objects
+
+    def open(self, key: str):
+        try:
+            return BytesIO(self.objects[key])
+        except KeyError:
+            raise FileNotFoundError(key)
+
+    def save(self, key: str, stream):
+        data = stream.read()
+        with self.lock:
+            self.objects[key] = data
+            self.times[key] = time.time()
+
+    def delete(self, key: str):
+        with self.lock:
+            try:
+                del self.objects[key]
+                del self.times[key]
+            except KeyError:
+                raise FileNotFoundError(key)
+
+    def keys(self, prefix: str = ""):
+        folder = prefix + "/" if prefix else ""
+        for key in sorted(self.objects):
+            if key.startswith(folder):
+                yield key
+
+    def modified_at(self, key: str) -> float:
+        try:
+            return self.times[key]
+        except KeyError:
+            raise FileNotFoundError(key)
+
+
+def __create_storage(root: str) -> Storage:
+    return LocalStorage(os.path.join(app.root_path, root))
+
+
+# photos as served, and the uploads they were made from
+media_storage = __create_storage(app.config["UPLOAD_FOLDER"])
+originals_storage = __create_storage(app.config["ORIGINALS_FOLDER"])
+# orphans moved aside by "flask media gc --quarantine"
+quarantine_storage = __create_storage(app.config["QUARANTINE_FOLDER"])
+# default pictures shipped with the app, under static/images
+static_image_storage = __create_storage(os.path.join("static", "images"))
@@ -0,0 +1,153 @@
+import json
+import select
+import sys
+import time
+from queue import Empty, Full, Queue
+from threading import Lock, Thread
+
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from sqlalchemy import text
+
+from flaskr import app, db
+
+# a subscriber that falls this far behind starts losing events,
+# clients then catch up through Last-Event-ID on reconnect
+SUBSCRIBER_QUEUE_SIZE = 100
+# comment lines keep proxies from closing idle streams
+KEEPALIVE_INTERVAL = 25
+# a stream served by a sync worker holds the whole worker, so there it is a
+# long-poll: it ends after its first events or this many seconds
+LONG_POLL_TIMEOUT = 20
+
+
+class ChannelListener():
+    """One Postgres LISTEN connection per process, fanned out to in-process subscribers.
+    Subscribers wait on their own queue, so idle streams never touch the database.
+    """
+
+    def __init__(self, channel: str) -> None:
+        self.channel = channel
+        self.lock = Lock()
+        self.subscribers = {}
+        self.thread = None
+
+    def publish(self, key, data: dict, connection=None):
+        # delivered by postgres when the current transaction commits
+        (connection or db.session).execute(text("SELECT pg_notify(:channel, :payload)"), {
+            "channel": self.channel,
+            "payload": json.dumps({"key": key, "data": data})
+        })
+
+    def publish_many(self, events: list):
+        """Publishes (key, data) pairs with one statement, however many they are."""
+        if not events:
+            return
+        db.session.execute(text("""
+            SELECT pg_notify(:channel, payload)
+            FROM unnest(CAST(:payloads AS text[])) AS payload
+        """), {
+            "channel": self.channel,
+            "payloads": [json.dumps({"key": key, "data": data}) for key, data in events]
+        })
+
+    def subscribe(self, key) -> Queue:
+        queue = Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self.lock:
+            self.subscribers.setdefault(key, set()).add(queue)
+            if self.thread is None:
+                self.thread = Thread(target=self.__listen, daemon=True)
+                self.thread.start()
+        return queue
+
+    def unsubscribe(self, key, queue: Queue):
+        with self.lock:
+            queues = self.subscribers.get(key)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self.subscribers[key]
+
+    def __dispatch(self, payload: str):
+        notification = json.loads(payload)
+        with self.lock:
+            queues = list(self.subscribers.get(notification["key"], ()))
+        for queue in queues:
+            try:
+                queue.put_nowait(notification["data"])
+            except Full:
+                pass
+
+    def __listen(self):
+        while True:
+            try:
+                connection = psycopg2.connect(
+                    app.config["SQLALCHEMY_DATABASE_URI"])
+                connection.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+                connection.cursor().execute(f"LISTEN {self.channel};")
+                while True:
+                    # waits on the socket, no polling queries
+                    if select.select([connection], [], [], 60) == ([], [], []):
+                        continue
+                    connection.poll()
+                    while connection.notifies:
+                        self.__dispatch(connection.notifies.pop(0).payload)
+            except psycopg2.Error:
+                time.sleep(5)
+
+
+@app.template_global()
+def is_async_worker() -> bool:
+    """True when gevent patched the process, an open stream then costs a greenlet."""
+    monkey = sys.modules.get("gevent.monkey")
+    return monkey is not None and monkey.is_module_patched("socket")
+
+
+def event_stream(queue: Queue, missed: list, to_event, close):
+    """Yields the missed events, then the events of a subscription, as server-sent events.
+    Under a sync worker the stream ends after its first events or LONG_POLL_TIMEOUT,
+    the browser reconnects with Last-Event-ID and catches up.
+    Args:
+        queue (Queue): The subscription.
+        to_event (callable): Makes the server-sent event of a data dict.
+        close (callable): Called once the stream ends, unsubscribes the queue.
+    """
+    try:
+        yield "retry: 3000\n\n"
+        for data in missed:
+            yield to_event(data)
+        long_poll = not is_async_worker()
+        if long_poll and missed:
+            return
+        deadline = time.monotonic() + LONG_POLL_TIMEOUT
+        while True:
+            timeout = deadline - time.monotonic() if long_poll else KEEPALIVE_INTERVAL
+            try:
+                data = queue.get(timeout=max(timeout, 0))
+            except Empty:
+                if long_poll:
+                    return
+                yield ": keep-alive\n\n"
+                continue
+            yield to_event(data)
+            if long_poll:
+                while not queue.empty():
+                    yield to_event(queue.get_nowait())
+                return
+    finally:
+        close()
+
+
+def sse_event(data: dict, id=None, event: str = None) -> str:
+    lines = []
+    if id is not None:
+        lines.append(f"id: {id}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+chat_listener = ChannelListener("event_chat")
+# keyed by profile id, carries new notifications and the unread count
+notification_listener = ChannelListener("notification")
@@ -10,7 +10,7 @@ from flaskr.decorators import is_admin, is_unbanned, is_verified
 from flaskr.mails import send_mail
 from flaskr.models import (Complain, ComplainCategory, Event, Notification,
                            Profile, Role, User)
-from flaskr.notifications.utils import NotificationMessage
+from flaskr.notifications.utils import NotificationMessage, notify_role
 from flaskr.users.forms import *
 from flaskr.users.utils import generate_token, password_reset_key_mail_body
 from jwt import encode
@@ -168,16 +168,9 @@ def report_user(id: int):
                             current_user.profile.id, user.profile.id)
         db.session.add(complain)
         # push notification
-        users = User.query.filter_by(role=Role.ADMIN).all()
-        for u in users:
-            notification = Notification(
-                NotificationMessage.report_user(
-                    current_user.profile.get_fullname(), user.profile.get_fullname()
-                ),
-                url_for("admins.complain_box"),
-                u.profile.id
-            )
-            db.session.add(notification)
+        notify_role(Role.ADMIN, NotificationMessage.report_user(
+            current_user.profile.get_fullname(), user.profile.get_fullname()
+        ), url_for("admins.complain_box"))
         db.session.commit()
         flash("Successfully reported the profile.", "success")
     return redirect(url_for("profiles.view_profile", id=id))
@@ -1,6 +1,9 @@
+import binascii
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 from datetime import datetime
 
 from flask_login import current_user
+from sqlalchemy import desc, tuple_
 
 
 def is_eligable(user):
@@ -21,3 +24,80 @@ def is_eligable(user):
             "message": "Account is not verified."
         }
     return None
+
+
+def encode_cursor(created_at: datetime, id: int) -> str:
+    raw = f"{created_at.isoformat()}|{id}"
+    return urlsafe_b64encode(raw.encode("utf-8")).decode("utf-8")
+
+
+def decode_cursor(cursor: str):
+    # returns (created_at, id) or None if the cursor is malformed
+    try:
+        raw = urlsafe_b64decode(cursor.encode("utf-8")).decode("utf-8")
+        created_at, id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(id)
+    except (ValueError, UnicodeError, binascii.Error):
+        return None
+
+
+def paginate_by_cursor(query, model, cursor=None, per_page: int = 20, newest_first: bool = True):
+    """Keyset pagination over (created_at, id) of the model.
+    Args:
+        query (Query): The filtered query of the model.
+        cursor (tuple): (created_at, id) of the last row of the previous page.
+        per_page (int): Number of rows in a page.
+        newest_first (bool): Order of the rows, oldest first when False.
+    Returns:
+        tuple: The list of rows and the cursor of the next page (None on the last page).
+    """
+    position = tuple_(model.created_at, model.id)
+    if cursor:
+        query = query.filter(position < cursor if newest_first else position > cursor)
+    if newest_first:
+        query = query.order_by(desc(model.created_at), desc(model.id))
+    else:
+        query = query.order_by(model.created_at, model.id)
+    # fetching one extra row tells whether a next page exists
+    rows = query.limit(per_page + 1).all()
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return rows, next_cursor
+
+
+def encode_score_cursor(score: float, id: int) -> str:
+    raw = f"{score!r}|{id}"
+    return urlsafe_b64encode(raw.encode("utf-8")).decode("utf-8")
+
+
+def decode_score_cursor(cursor: str):
+    # returns (score, id) or None if the cursor is malformed
+    try:
+        raw = urlsafe_b64decode(cursor.encode("utf-8")).decode("utf-8")
+        score, id = raw.split("|")
+        return float(score), int(id)
+    except (ValueError, UnicodeError, binascii.Error):
+        return None
+
+
+def paginate_by_score(query, model, column, cursor=None, per_page: int = 20):
+    """Keyset pagination over (column, id) of the model, highest first.
+    Args:
+        query (Query): The filtered query of the model.
+        column (Column): The score column, an index on it makes a page an index scan.
+        cursor (tuple): (score, id) of the last row of the previous page.
+        per_page (int): Number of rows in a page.
+    Returns:
+        tuple: The list of rows and the cursor of the next page (None on the last page).
+    """
+    if cursor:
+        query = query.filter(tuple_(column, model.id) < cursor)
+    query = query.order_by(desc(column), desc(model.id))
+    rows = query.limit(per_page + 1).all()
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_score_cursor(getattr(rows[-1], column.key), rows[-1].id)
+    return rows, next_cursor
@@ -0,0 +1,14 @@
+import os
+
+# chat and notification streams stay open for as long as a page does, a gevent
+# worker serves each as a greenlet where a sync worker would be held by it
+worker_class = "gevent"
+worker_connections = 1000
+workers = int(os.getenv("WEB_CONCURRENCY") or 2)
+bind = f"0.0.0.0:{os.getenv('PORT') or 5000}"
+
+
+def post_fork(server, worker):
+    # psycopg2 waits on its sockets in C, this makes those waits yield to other greenlets
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
@@ -0,0 +1,39 @@
+"""outgoing mail queue
+
+Revision ID: 2e9c4a7b5f31
+Revises: 7d3a5c1f8e60
+Create Date: 2026-10-17 19:02:36.481920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '2e9c4a7b5f31'
+down_revision = '7d3a5c1f8e60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('outgoing_mail',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('recipient', sa.String(length=150), nullable=False),
+    sa.Column('subject', sa.String(), nullable=False),
+    sa.Column('body', sa.String(), nullable=False),
+    sa.Column('status', sa.String(length=10), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=True),
+    sa.Column('last_error', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_outgoing_mail_next_attempt_at_pending', 'outgoing_mail',
+                    ['next_attempt_at'], unique=False,
+                    postgresql_where=sa.text("status = 'pending'"))
+
+
+def downgrade():
+    op.drop_index('ix_outgoing_mail_next_attempt_at_pending', table_name='outgoing_mail')
+    op.drop_table('outgoing_mail')
@@ -0,0 +1,24 @@
+"""event created_at id index
+
+Revision ID: 3f1a9c2d7b10
+Revises:
+Create Date: 2026-10-17 09:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1a9c2d7b10'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_event_created_at_id', 'event', ['created_at', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_event_created_at_id', table_name='event')
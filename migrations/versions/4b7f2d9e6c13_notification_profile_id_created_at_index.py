@@ -0,0 +1,24 @@
+"""notification profile_id created_at index
+
+Revision ID: 4b7f2d9e6c13
+Revises: e8d14b6c3a27
+Create Date: 2026-10-17 17:48:09.214365
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '4b7f2d9e6c13'
+down_revision = 'e8d14b6c3a27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_notification_profile_id_created_at_id', 'notification',
+                    ['profile_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_notification_profile_id_created_at_id', table_name='notification')
@@ -0,0 +1,34 @@
+"""payment pending seat hold
+
+Revision ID: 5e02b8f4a961
+Revises: c71d5e9a04b3
+Create Date: 2026-10-17 12:48:33.270415
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e02b8f4a961'
+down_revision = 'c71d5e9a04b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('payment_pending', sa.Column('hold_expires_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_payment_pending_event_id_hold_expires_at', 'payment_pending',
+                    ['event_id', 'hold_expires_at'], unique=False)
+    # requests still waiting for the host get a fresh 48 hour hold
+    op.execute("""
+        UPDATE payment_pending p
+        SET hold_expires_at = (now() AT TIME ZONE 'utc') + interval '48 hours'
+        WHERE NOT coalesce(p.is_approved, false)
+          AND NOT EXISTS (SELECT 1 FROM decline d WHERE d.payment_id = p.id)
+    """)
+
+
+def downgrade():
+    op.drop_index('ix_payment_pending_event_id_hold_expires_at', table_name='payment_pending')
+    op.drop_column('payment_pending', 'hold_expires_at')
@@ -0,0 +1,25 @@
+"""post event_id created_at index
+
+Revision ID: 6a0d93c5b2e7
+Revises: d4b8e2f71c90
+Create Date: 2026-10-17 17:08:51.630294
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6a0d93c5b2e7'
+down_revision = 'd4b8e2f71c90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_post_event_id_created_at_id', 'post',
+                    ['event_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_post_event_id_created_at_id', table_name='post')
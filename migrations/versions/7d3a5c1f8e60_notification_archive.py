@@ -0,0 +1,47 @@
+"""notification archive
+
+Revision ID: 7d3a5c1f8e60
+Revises: 4b7f2d9e6c13
+Create Date: 2026-10-17 18:21:47.903118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '7d3a5c1f8e60'
+down_revision = '4b7f2d9e6c13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('notification_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('message', sa.String(length=250), nullable=False),
+    sa.Column('link', sa.String(), nullable=False),
+    sa.Column('profile_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['profile_id'], ['profile.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_notification_archive_profile_id_created_at_id', 'notification_archive',
+                    ['profile_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_notification_created_at_read', 'notification', ['created_at'],
+                    unique=False, postgresql_where=sa.text('is_readed'))
+
+
+def downgrade():
+    op.drop_index('ix_notification_created_at_read', table_name='notification')
+    # archived notifications go back, read as they were
+    op.execute("""
+        INSERT INTO notification (id, message, link, profile_id, is_readed, created_at, updated_at)
+        SELECT id, message, link, profile_id, true, created_at, updated_at
+        FROM notification_archive
+        ON CONFLICT (id) DO NOTHING
+    """)
+    op.drop_index('ix_notification_archive_profile_id_created_at_id',
+                  table_name='notification_archive')
+    op.drop_table('notification_archive')
@@ -0,0 +1,37 @@
+"""full text search vectors
+
+Revision ID: 8b4e61d0c2a5
+Revises: 3f1a9c2d7b10
+Create Date: 2026-10-17 10:03:57.642911
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '8b4e61d0c2a5'
+down_revision = '3f1a9c2d7b10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('event', sa.Column('search_vector', postgresql.TSVECTOR(), sa.Computed(
+        "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(place_name, '')), 'B')",
+        persisted=True), nullable=True))
+    op.create_index('ix_event_search_vector', 'event', ['search_vector'],
+                    unique=False, postgresql_using='gin')
+    op.add_column('profile', sa.Column('search_vector', postgresql.TSVECTOR(), sa.Computed(
+        "to_tsvector('simple', coalesce(first_name, '') || ' ' || coalesce(last_name, ''))",
+        persisted=True), nullable=True))
+    op.create_index('ix_profile_search_vector', 'profile', ['search_vector'],
+                    unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    op.drop_index('ix_profile_search_vector', table_name='profile')
+    op.drop_column('profile', 'search_vector')
+    op.drop_index('ix_event_search_vector', table_name='event')
+    op.drop_column('event', 'search_vector')
@@ -0,0 +1,48 @@
+"""post ranking scores
+
+Revision ID: 9c2e7a4f1d58
+Revises: f3a61c8e2b94
+Create Date: 2026-10-17 16:12:40.318207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '9c2e7a4f1d58'
+down_revision = 'f3a61c8e2b94'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('post', sa.Column('comments_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('post', sa.Column('time_score', sa.Float(), server_default='0', nullable=False))
+
+    # same formula as flaskr.models.time_score, 2021-01-01 is RANKING_EPOCH
+    op.execute("""
+        UPDATE post SET
+            comments_count = (SELECT count(*) FROM comment c WHERE c.post_id = post.id),
+            time_score = extract(epoch FROM coalesce(created_at, now() AT TIME ZONE 'utc')
+                                 - timestamp '2021-01-01') / 45000
+    """)
+
+    op.add_column('post', sa.Column('top_score', sa.Integer(), sa.Computed(
+        "up_votes - down_votes + comments_count", persisted=True), nullable=True))
+    op.add_column('post', sa.Column('hot_score', sa.Float(), sa.Computed(
+        "sign((up_votes - down_votes + comments_count)::float8) "
+        "* log(greatest(abs(up_votes - down_votes + comments_count), 1)::float8) "
+        "+ time_score", persisted=True), nullable=True))
+    op.create_index('ix_post_event_id_hot_score_id', 'post',
+                    ['event_id', 'hot_score', 'id'], unique=False)
+    op.create_index('ix_post_event_id_top_score_id', 'post',
+                    ['event_id', 'top_score', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_post_event_id_top_score_id', table_name='post')
+    op.drop_index('ix_post_event_id_hot_score_id', table_name='post')
+    op.drop_column('post', 'hot_score')
+    op.drop_column('post', 'top_score')
+    op.drop_column('post', 'time_score')
+    op.drop_column('post', 'comments_count')
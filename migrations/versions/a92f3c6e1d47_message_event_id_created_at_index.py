@@ -0,0 +1,25 @@
+"""message event_id created_at index
+
+Revision ID: a92f3c6e1d47
+Revises: 5e02b8f4a961
+Create Date: 2026-10-17 14:05:19.551760
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a92f3c6e1d47'
+down_revision = '5e02b8f4a961'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_message_event_id_created_at_id', 'message',
+                    ['event_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_message_event_id_created_at_id', table_name='message')
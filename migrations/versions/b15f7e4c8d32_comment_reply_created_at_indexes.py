@@ -0,0 +1,28 @@
+"""comment and reply created_at indexes
+
+Revision ID: b15f7e4c8d32
+Revises: 6a0d93c5b2e7
+Create Date: 2026-10-17 18:02:14.917342
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b15f7e4c8d32'
+down_revision = '6a0d93c5b2e7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_comment_post_id_created_at_id', 'comment',
+                    ['post_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_reply_comment_id_created_at_id', 'reply',
+                    ['comment_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_reply_comment_id_created_at_id', table_name='reply')
+    op.drop_index('ix_comment_post_id_created_at_id', table_name='comment')
@@ -0,0 +1,70 @@
+"""event member table
+
+Revision ID: c71d5e9a04b3
+Revises: 8b4e61d0c2a5
+Create Date: 2026-10-17 11:26:08.905132
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'c71d5e9a04b3'
+down_revision = '8b4e61d0c2a5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('event_member',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('profile_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['event_id'], ['event.id'], ),
+    sa.ForeignKeyConstraint(['profile_id'], ['profile.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('event_id', 'profile_id', name='uq_event_member_event_id_profile_id')
+    )
+    op.create_index('ix_event_member_profile_id', 'event_member', ['profile_id'], unique=False)
+
+    # Event.members is the roster of approved members. Profile.joined_events
+    # also held the host's own events, which are left out so member counts
+    # stay the same. Ids that no longer exist are skipped.
+    op.execute("""
+        INSERT INTO event_member (event_id, profile_id, created_at)
+        SELECT e.id, m.profile_id, now() AT TIME ZONE 'utc'
+        FROM event e, unnest(e.members) AS m(profile_id)
+        WHERE EXISTS (SELECT 1 FROM profile p WHERE p.id = m.profile_id)
+        ON CONFLICT (event_id, profile_id) DO NOTHING
+    """)
+    op.execute("""
+        INSERT INTO event_member (event_id, profile_id, created_at)
+        SELECT j.event_id, p.id, now() AT TIME ZONE 'utc'
+        FROM profile p, unnest(p.joined_events) AS j(event_id), event e
+        WHERE e.id = j.event_id AND e.host_id IS DISTINCT FROM p.id
+        ON CONFLICT (event_id, profile_id) DO NOTHING
+    """)
+
+    op.drop_column('event', 'members')
+    op.drop_column('profile', 'joined_events')
+
+
+def downgrade():
+    op.add_column('profile', sa.Column('joined_events', postgresql.ARRAY(sa.Integer()), nullable=True))
+    op.add_column('event', sa.Column('members', postgresql.ARRAY(sa.Integer()), nullable=True))
+    op.execute("""
+        UPDATE event e SET members = coalesce((
+            SELECT array_agg(m.profile_id ORDER BY m.id)
+            FROM event_member m WHERE m.event_id = e.id
+        ), '{}')
+    """)
+    op.execute("""
+        UPDATE profile p SET joined_events = coalesce((
+            SELECT array_agg(m.event_id ORDER BY m.id)
+            FROM event_member m WHERE m.profile_id = p.id
+        ), '{}')
+    """)
+    op.drop_index('ix_event_member_profile_id', table_name='event_member')
+    op.drop_table('event_member')
@@ -0,0 +1,30 @@
+"""stored file references
+
+Revision ID: d4b8e2f71c90
+Revises: a92f3c6e1d47
+Create Date: 2026-10-17 15:42:37.204815
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4b8e2f71c90'
+down_revision = 'a92f3c6e1d47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stored_file',
+    sa.Column('store', sa.String(length=20), nullable=False),
+    sa.Column('key', sa.String(), nullable=False),
+    sa.Column('ref_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('store', 'key')
+    )
+
+
+def downgrade():
+    op.drop_table('stored_file')
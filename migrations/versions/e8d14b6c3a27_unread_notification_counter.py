@@ -0,0 +1,36 @@
+"""unread notification counter
+
+Revision ID: e8d14b6c3a27
+Revises: 9c2e7a4f1d58
+Create Date: 2026-10-17 17:04:21.556730
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'e8d14b6c3a27'
+down_revision = '9c2e7a4f1d58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("UPDATE notification SET is_readed = false WHERE is_readed IS NULL")
+    op.create_index('ix_notification_profile_id_unread', 'notification', ['profile_id'],
+                    unique=False, postgresql_where=sa.text('NOT is_readed'))
+    op.add_column('profile', sa.Column('unread_notifications', sa.Integer(),
+                                       server_default='0', nullable=False))
+    op.execute("""
+        UPDATE profile p SET unread_notifications = n.count
+        FROM (
+            SELECT profile_id, count(*) AS count FROM notification
+            WHERE NOT is_readed GROUP BY profile_id
+        ) n
+        WHERE n.profile_id = p.id
+    """)
+
+
+def downgrade():
+    op.drop_column('profile', 'unread_notifications')
+    op.drop_index('ix_notification_profile_id_unread', table_name='notification')
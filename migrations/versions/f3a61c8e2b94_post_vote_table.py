@@ -0,0 +1,70 @@
+"""post vote table
+
+Revision ID: f3a61c8e2b94
+Revises: b15f7e4c8d32
+Create Date: 2026-10-17 19:11:40.338016
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'f3a61c8e2b94'
+down_revision = 'b15f7e4c8d32'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('post_vote',
+    sa.Column('post_id', sa.Integer(), nullable=False),
+    sa.Column('profile_id', sa.Integer(), nullable=False),
+    sa.Column('value', sa.SmallInteger(), nullable=False),
+    sa.Column('previous_value', sa.SmallInteger(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['post_id'], ['post.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['profile_id'], ['profile.id'], ),
+    sa.PrimaryKeyConstraint('post_id', 'profile_id')
+    )
+    op.add_column('post', sa.Column('up_votes', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('post', sa.Column('down_votes', sa.Integer(), server_default='0', nullable=False))
+
+    # a profile found in both arrays keeps its up vote, ids that no longer exist are skipped
+    op.execute("""
+        INSERT INTO post_vote (post_id, profile_id, value, previous_value, created_at)
+        SELECT p.id, v.profile_id, 1, 0, now() AT TIME ZONE 'utc'
+        FROM post p, unnest(p.up_vote) AS v(profile_id)
+        WHERE EXISTS (SELECT 1 FROM profile pr WHERE pr.id = v.profile_id)
+        ON CONFLICT (post_id, profile_id) DO NOTHING
+    """)
+    op.execute("""
+        INSERT INTO post_vote (post_id, profile_id, value, previous_value, created_at)
+        SELECT p.id, v.profile_id, -1, 0, now() AT TIME ZONE 'utc'
+        FROM post p, unnest(p.down_vote) AS v(profile_id)
+        WHERE EXISTS (SELECT 1 FROM profile pr WHERE pr.id = v.profile_id)
+        ON CONFLICT (post_id, profile_id) DO NOTHING
+    """)
+    op.execute("""
+        UPDATE post p SET
+            up_votes = (SELECT count(*) FROM post_vote v WHERE v.post_id = p.id AND v.value = 1),
+            down_votes = (SELECT count(*) FROM post_vote v WHERE v.post_id = p.id AND v.value = -1)
+    """)
+
+    op.drop_column('post', 'up_vote')
+    op.drop_column('post', 'down_vote')
+
+
+def downgrade():
+    op.add_column('post', sa.Column('down_vote', postgresql.ARRAY(sa.Integer()), nullable=True))
+    op.add_column('post', sa.Column('up_vote', postgresql.ARRAY(sa.Integer()), nullable=True))
+    op.execute("""
+        UPDATE post p SET
+            up_vote = coalesce((SELECT array_agg(v.profile_id ORDER BY v.created_at)
+                                FROM post_vote v WHERE v.post_id = p.id AND v.value = 1), '{}'),
+            down_vote = coalesce((SELECT array_agg(v.profile_id ORDER BY v.created_at)
+                                  FROM post_vote v WHERE v.post_id = p.id AND v.value = -1), '{}')
+    """)
+    op.drop_column('post', 'down_votes')
+    op.drop_column('post', 'up_votes')
+    op.drop_table('post_vote')
@@ -0,0 +1,93 @@
+import os
+import time
+
+import pytest
+
+# the app reads its settings on import
+os.environ.setdefault("SECRET_KEY", "test")
+
+from flaskr import app, db  # noqa: E402
+
+# (label, formatted value) of every measurement, reported after the run
+__measurements = []
+
+
+def pytest_addoption(parser):
+    parser.addoption("--benchmark", action="store_true",
+                     help="also run the benchmarks, they fill the database with many rows")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "benchmark: a slow measurement, runs with --benchmark")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--benchmark"):
+        return
+    skip = pytest.mark.skip(reason="benchmarks run with --benchmark")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not __measurements:
+        return
+    terminalreporter.section("benchmarks")
+    for label, value in __measurements:
+        terminalreporter.write_line(f"{label:<60} {value}")
+
+
+@pytest.fixture
+def measure():
+    """Times a callable, best of repeat runs, and reports it under its label.
+    Returns:
+        callable: measure(label, target, repeat=5) -> seconds.
+    """
+    def measure(label: str, target, repeat: int = 5) -> float:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            target()
+            timings.append(time.perf_counter() - start)
+        __measurements.append((label, f"{min(timings) * 1000:10.2f} ms"))
+        return min(timings)
+    return measure
+
+
+@pytest.fixture
+def report():
+    """Reports a value measured some other way, such as memory, under its label.
+    Returns:
+        callable: report(label, value, unit).
+    """
+    def report(label: str, value: float, unit: str):
+        __measurements.append((label, f"{value:10.2f} {unit}"))
+    return report
+
+
+@pytest.fixture(scope="session")
+def database():
+    """A Postgres database of its own, TEST_DATABASE_URL is wiped by the tests."""
+    url = os.getenv("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    app.config.update(SQLALCHEMY_DATABASE_URI=url, TESTING=True, WTF_CSRF_ENABLED=False)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    yield db
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def context(database):
+    """A request context over empty tables."""
+    with app.test_request_context():
+        yield
+        db.session.remove()
+        tables = ", ".join(f'"{table.name}"' for table in db.metadata.sorted_tables)
+        db.session.execute(f"TRUNCATE {tables} RESTART IDENTITY CASCADE")
+        db.session.commit()
@@ -0,0 +1,117 @@
+from datetime import datetime, timedelta
+
+import pytest
+from flaskr import app, db
+from flaskr.models import Comment, Reply
+
+from tests.utils import (api_token, count_queries, create_event, create_post,
+                         create_profile)
+
+
+@pytest.fixture(params=["comments", "replies"])
+def discussion(request, context):
+    """The api of comments or replies, a parent to list under, and a factory of children."""
+    author = create_profile("author@example.com")
+    post = create_post(create_event(author), author)
+    if request.param == "comments":
+        parent, model, parent_argument = post, Comment, "post_id"
+    else:
+        parent = Comment("A comment", post.id, author.id)
+        db.session.add(parent)
+        db.session.commit()
+        model, parent_argument = Reply, "comment_id"
+
+    def create(content: str, days_ago: int = 0, profile=author):
+        child = model(content, parent.id, profile.id)
+        child.created_at = datetime.utcnow() - timedelta(days=days_ago)
+        db.session.add(child)
+        db.session.commit()
+        return child.id
+
+    return {
+        "url": f"/api/v1/{request.param}",
+        "list_url": f"/api/v1/{request.param}?{parent_argument}={parent.id}",
+        "key": request.param,
+        "model": model,
+        "author": author,
+        "create": create
+    }
+
+
+def test_pages_are_oldest_first(discussion):
+    # created out of id order, the pages follow created_at
+    ids = {days_ago: discussion["create"]("Hello", days_ago) for days_ago in (3, 1, 4, 2, 5)}
+    client = app.test_client()
+
+    pages, cursor = [], ""
+    while cursor is not None:
+        response = client.get(f"{discussion['list_url']}&limit=2&cursor={cursor}")
+        assert response.status_code == 200
+        pages.append([child["id"] for child in response.json[discussion["key"]]])
+        cursor = response.json["next_cursor"]
+
+    assert pages == [[ids[5], ids[4]], [ids[3], ids[2]], [ids[1]]]
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "bm9waXBl"])
+def test_invalid_cursor_is_rejected(discussion, cursor):
+    discussion["create"]("Hello")
+
+    response = app.test_client().get(f"{discussion['list_url']}&cursor={cursor}")
+
+    assert response.status_code == 400
+    assert response.json == {"error": "Invalid cursor."}
+
+
+def test_fields_leave_out_nested_objects(discussion):
+    id = discussion["create"]("Hello")
+    client = app.test_client()
+
+    child = client.get(f"{discussion['url']}/{id}?fields=id,content").json
+    listed = client.get(f"{discussion['list_url']}&fields=id,content").json[discussion["key"]]
+
+    assert child == {"id": id, "content": "Hello"}
+    assert listed == [{"id": id, "content": "Hello"}]
+    # and the profiles and replies left out are not loaded either
+    assert count_queries(client, f"{discussion['url']}/{id}?fields=id,content") \
+        < count_queries(client, f"{discussion['url']}/{id}")
+
+
+def test_unknown_fields_are_rejected(discussion):
+    id = discussion["create"]("Hello")
+    client = app.test_client()
+
+    for url in (f"{discussion['url']}/{id}?fields=id,password",
+                f"{discussion['list_url']}&fields=id,password"):
+        response = client.get(url)
+        assert response.status_code == 400
+        assert response.json == {"error": "Unknown fields: password."}
+
+
+def test_unchanged_responses_are_not_modified(discussion):
+    id = discussion["create"]("Hello")
+    client = app.test_client()
+
+    for url in (f"{discussion['url']}/{id}", discussion["list_url"]):
+        etag = client.get(url).headers["ETag"]
+        repeated = client.get(url, headers={"If-None-Match": etag})
+        assert repeated.status_code == 304
+        assert repeated.data == b""
+
+    etag = client.get(f"{discussion['url']}/{id}").headers["ETag"]
+    client.put(f"{discussion['url']}/{id}", json={"content": "Edited"},
+               headers={"Authorization": api_token(discussion["author"])})
+    changed = client.get(f"{discussion['url']}/{id}", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json["content"] == "Edited"
+
+
+def test_only_the_owner_can_edit(discussion):
+    id = discussion["create"]("Hello")
+    other = create_profile("other@example.com")
+
+    response = app.test_client().put(f"{discussion['url']}/{id}", json={"content": "Edited"},
+                                      headers={"Authorization": api_token(other)})
+
+    assert response.status_code == 406
+    assert discussion["model"].query.get(id).content == "Hello"
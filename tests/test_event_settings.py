@@ -0,0 +1,48 @@
+from io import BytesIO
+
+from flaskr import app
+from flaskr.models import Event, Role
+
+from tests.utils import create_event, create_profile
+
+
+def __submit(host, event, **fields):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = str(host.user_id)
+    data = {
+        "event_title": "Renamed trip",
+        "event_description": "A trip",
+        "event_location": "Sylhet",
+        "event_start_time": event.event_time.strftime("%Y-%m-%dT%H:%M"),
+        "event_days_count": "3",
+        "event_nights_count": "2",
+        "event_fee": "5000",
+        "phone_number": "01700000000",
+    }
+    data.update(fields)
+    return client.post(f"/events/settings/info/{event.id}", data=data,
+                       content_type="multipart/form-data", follow_redirects=True)
+
+
+def test_event_info_is_saved(context):
+    host = create_profile("host@example.com", Role.HOST)
+    event = create_event(host)
+
+    response = __submit(host, event)
+
+    assert "Event information saved" in response.get_data(as_text=True)
+    assert Event.query.get(event.id).title == "Renamed trip"
+
+
+def test_rejected_cover_photo_saves_nothing(context):
+    host = create_profile("host@example.com", Role.HOST)
+    event = create_event(host)
+
+    response = __submit(host, event,
+                        event_cover_photo=(BytesIO(b"not an image"), "cover.png"))
+
+    html = response.get_data(as_text=True)
+    assert "The file is not a supported image." in html
+    assert "Event information saved" not in html
+    assert Event.query.get(event.id).title == "Trip"
@@ -0,0 +1,126 @@
+from datetime import datetime, timedelta
+
+import pytest
+from flaskr import app, db, login_manager
+from flaskr.identity import IdentityCache, identity_cache, load_identity
+from flaskr.models import AccountRestriction, User
+
+from tests.utils import api_token, count_queries, create_profile, signed_in_client
+
+
+def __create_post(profile):
+    # an empty body, a caller let through gets a 400 from the handler
+    return app.test_client().post("/api/v1/posts", json={},
+                                  headers={"Authorization": api_token(profile)})
+
+
+def test_a_profile_banned_twice_is_banned_until_the_latest_expiry(context):
+    profile = create_profile("member@example.com")
+    latest = datetime.utcnow() + timedelta(days=30)
+    db.session.add_all([
+        AccountRestriction(datetime.utcnow() - timedelta(days=1), "Old", profile.id),
+        AccountRestriction(latest, "New", profile.id),
+        AccountRestriction(datetime.utcnow() + timedelta(days=2), "Short", profile.id)])
+    db.session.commit()
+
+    assert load_identity(profile.user_id).banned_until == latest
+
+
+def test_api_refuses_banned_and_unverified_callers(context):
+    banned = create_profile("banned@example.com")
+    db.session.add(AccountRestriction(datetime.utcnow() + timedelta(days=1), "Spam", banned.id))
+    unverified = create_profile("unverified@example.com")
+    unverified.user.is_verified = False
+    db.session.commit()
+
+    assert __create_post(banned).status_code == 403
+    assert __create_post(unverified).status_code == 403
+    assert __create_post(create_profile("member@example.com")).status_code == 400
+
+
+def test_api_lets_expired_bans_through(context):
+    profile = create_profile("member@example.com")
+    db.session.add(AccountRestriction(datetime.utcnow() - timedelta(days=1), "Spam", profile.id))
+    db.session.commit()
+
+    assert __create_post(profile).status_code == 400
+
+
+@pytest.fixture
+def uncached_loader(monkeypatch):
+    """Switches Flask-Login back to the loader before the cache, for a baseline."""
+    def use():
+        monkeypatch.setattr(login_manager, "_user_callback", lambda id: User.query.get(int(id)))
+    return use
+
+
+def test_cached_session_user_costs_no_queries(context, uncached_loader):
+    client = signed_in_client(create_profile("member@example.com"))
+    count_queries(client, "/")
+    cached = count_queries(client, "/")
+
+    uncached_loader()
+    baseline = count_queries(client, "/")
+
+    # the user, its profile and its ban, each read by a query of its own before
+    assert baseline - cached == 3
+
+
+def test_cache_misses_read_the_session_user_in_one_query(context, uncached_loader):
+    profile = create_profile("member@example.com")
+    client = signed_in_client(profile)
+    identity_cache.invalidate(profile.user_id)
+    missed = count_queries(client, "/")
+
+    uncached_loader()
+    baseline = count_queries(client, "/")
+
+    assert baseline - missed == 2
+
+
+@pytest.mark.benchmark
+def test_page_latency_with_the_cached_session_user(context, measure, uncached_loader):
+    client = signed_in_client(create_profile("member@example.com"))
+
+    def pages():
+        for _ in range(100):
+            client.get("/")
+
+    after = measure("100 homepage requests, cached session user", pages, repeat=3)
+    uncached_loader()
+    before = measure("100 homepage requests, user loaded per request", pages, repeat=3)
+
+    assert after < before
+
+
+def test_expired_entries_are_dropped_when_read():
+    cache = IdentityCache(ttl=-1, max_users=10)
+    cache.put(1, "token", "identity", profile_id=10)
+
+    assert cache.get(1, "token") is None
+    assert cache.entries == {}
+    assert cache.profile_users == {}
+
+
+def test_least_recently_cached_users_are_evicted():
+    cache = IdentityCache(ttl=60, max_users=2)
+    cache.put(1, "token", "first", profile_id=10)
+    cache.put(2, "token", "second", profile_id=20)
+    cache.put(1, "other", "first again")
+    cache.put(3, "token", "third", profile_id=30)
+
+    assert cache.get(2, "token") is None
+    assert cache.get(1, "token") == "first"
+    assert cache.get(3, "token") == "third"
+    assert set(cache.profile_users) == {10, 30}
+
+
+def test_expired_tokens_of_a_user_are_pruned_on_put(monkeypatch):
+    cache = IdentityCache(ttl=60, max_users=10)
+    cache.put(1, "old", "identity")
+    monkeypatch.setattr(cache, "ttl", -1)
+    cache.put(1, "expired", "identity")
+    monkeypatch.setattr(cache, "ttl", 60)
+    cache.put(1, "new", "identity")
+
+    assert set(cache.entries[1]) == {"old", "new"}
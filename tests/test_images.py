@@ -0,0 +1,75 @@
+from io import BytesIO
+
+import pytest
+from flaskr import app
+from flaskr.images import utils
+from flaskr.images.utils import derivative_cache
+from flaskr.storage import MemoryStorage
+from PIL import Image
+
+from tests.utils import run_concurrently
+
+
+@pytest.fixture
+def media(tmp_path, monkeypatch):
+    """Uploads kept in memory, derivatives in a temporary folder."""
+    storage = MemoryStorage()
+    monkeypatch.setattr(utils, "media_storage", storage)
+    monkeypatch.setitem(app.config, "DERIVATIVES_FOLDER", str(tmp_path / "derivatives"))
+    return storage
+
+
+def __save_photo(storage, key: str):
+    photo = BytesIO()
+    Image.new("RGB", (800, 600), "red").save(photo, format="PNG")
+    photo.seek(0)
+    storage.save(key, photo)
+
+
+def test_derivatives_are_read_from_the_media_storage(media):
+    __save_photo(media, "ab/cd/photo.png")
+
+    response = app.test_client().get("/images/320/images/uploads/ab/cd/photo.png",
+                                     headers={"Accept": "image/webp"})
+
+    assert response.status_code == 200
+    assert response.mimetype == "image/webp"
+    with Image.open(BytesIO(response.data)) as derivative:
+        assert derivative.size == (320, 240)
+
+
+def test_replaced_uploads_get_a_new_etag(media):
+    __save_photo(media, "photo.png")
+    etag = derivative_cache.etag("images/uploads/photo.png", 320, "WEBP")
+    media.times["photo.png"] = media.times["photo.png"] + 1
+
+    assert derivative_cache.etag("images/uploads/photo.png", 320, "WEBP") != etag
+
+
+def test_missing_and_outside_sources_are_not_found(media):
+    client = app.test_client()
+
+    assert client.get("/images/320/images/uploads/missing.png").status_code == 404
+    assert client.get("/images/320/scripts/message.js").status_code == 404
+    assert client.get("/images/320/images/../../app.py").status_code == 404
+
+
+def test_concurrent_first_requests_produce_one_derivative(media, tmp_path):
+    __save_photo(media, "photo.png")
+
+    results = run_concurrently(
+        lambda _: derivative_cache.get("images/uploads/photo.png", 320, "WEBP"), range(8))
+
+    assert len(set(results)) == 1
+    with Image.open(results[0][0]) as derivative:
+        assert derivative.size == (320, 240)
+    assert not list((tmp_path / "derivatives").rglob("*.tmp"))
+
+
+def test_unreadable_source_is_not_found(media, tmp_path):
+    media.save("broken.jpg", BytesIO(b"not an image"))
+
+    response = app.test_client().get("/images/320/images/uploads/broken.jpg")
+
+    assert response.status_code == 404
+    assert not list((tmp_path / "derivatives").rglob("*.tmp"))
@@ -0,0 +1,176 @@
+import socket
+import time
+from datetime import datetime
+
+import pytest
+from aiosmtpd.controller import Controller
+from flask_mail import Connection
+from flaskr import app, db
+from flaskr.mails import deliver_pending, send_mail
+from flaskr.models import OutgoingMail
+
+QUEUED_MAILS = 2000
+
+
+class Inbox():
+    """SMTP handler that keeps what it accepts and refuses the listed recipients."""
+
+    def __init__(self) -> None:
+        self.received = []
+        self.refused = {}
+        # (host, port) of the client, one per SMTP connection
+        self.connections = set()
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address in self.refused:
+            return self.refused[address]
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.connections.add(session.peer)
+        self.received.extend(envelope.rcpt_tos)
+        return "250 Message accepted for delivery"
+
+
+def __free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp(monkeypatch):
+    """A local SMTP server the mail worker connects to."""
+    inbox = Inbox()
+    controller = Controller(inbox, hostname="127.0.0.1", port=__free_port())
+    controller.start()
+    state = app.extensions["mail"]
+    monkeypatch.setattr(state, "server", controller.hostname)
+    monkeypatch.setattr(state, "port", controller.port)
+    monkeypatch.setattr(state, "use_tls", False)
+    monkeypatch.setattr(state, "use_ssl", False)
+    monkeypatch.setattr(state, "username", None)
+    monkeypatch.setattr(state, "suppress", False)
+    monkeypatch.setenv("MAIL_USERNAME", "noreply@example.com")
+    yield inbox
+    controller.stop()
+
+
+def __status(recipient: str) -> OutgoingMail:
+    return OutgoingMail.query.filter_by(recipient=recipient).one()
+
+
+def test_queued_mails_are_sent(context, smtp):
+    send_mail("first@example.com", "Hello", "Body")
+    send_mail("second@example.com", "Hello", "Body")
+
+    assert deliver_pending(50) == (2, 2, 0)
+
+    assert smtp.received == ["first@example.com", "second@example.com"]
+    assert __status("first@example.com").status == "sent"
+    assert deliver_pending(50) == (0, 0, 0)
+
+
+def test_each_batch_uses_one_connection(context, smtp):
+    for index in range(5):
+        send_mail(f"user{index}@example.com", "Hello", "Body")
+
+    while deliver_pending(2)[0]:
+        pass
+
+    assert len(smtp.received) == 5
+    assert len(smtp.connections) == 3
+
+
+def test_sent_mails_keep_no_body(context, smtp):
+    send_mail("member@example.com", "Verify", "Your code is 123456")
+
+    deliver_pending(50)
+
+    assert __status("member@example.com").body == ""
+
+
+def test_mails_sent_before_a_crash_are_not_sent_again(context, smtp, monkeypatch):
+    for index in range(3):
+        send_mail(f"user{index}@example.com", "Hello", "Body")
+    send = Connection.send
+
+    def crash_on_third(connection, message, *args):
+        if message.recipients == ["user2@example.com"]:
+            raise SystemExit("worker killed")
+        return send(connection, message, *args)
+    monkeypatch.setattr(Connection, "send", crash_on_third)
+
+    with pytest.raises(SystemExit):
+        deliver_pending(50)
+    db.session.rollback()
+
+    assert [__status(f"user{index}@example.com").status for index in range(3)] == \
+        ["sent", "sent", "pending"]
+
+
+def test_refused_mails_are_retried_later(context, smtp):
+    smtp.refused["busy@example.com"] = "451 Try again later"
+    send_mail("busy@example.com", "Hello", "Body")
+    send_mail("other@example.com", "Hello", "Body")
+
+    assert deliver_pending(50) == (2, 1, 1)
+
+    busy = __status("busy@example.com")
+    assert (busy.status, busy.attempts) == ("pending", 1)
+    assert busy.next_attempt_at > datetime.utcnow()
+    assert smtp.received == ["other@example.com"]
+
+
+def test_mails_out_of_attempts_are_dead(context, smtp, monkeypatch):
+    monkeypatch.setitem(app.config, "MAIL_MAX_ATTEMPTS", 1)
+    smtp.refused["gone@example.com"] = "550 No such user"
+    send_mail("gone@example.com", "Hello", "Body")
+
+    assert deliver_pending(50) == (1, 0, 1)
+
+    gone = __status("gone@example.com")
+    assert gone.status == "dead"
+    assert "No such user" in gone.last_error
+
+
+def test_malformed_mails_are_dead_and_do_not_stop_the_batch(context, smtp):
+    send_mail("broken@example.com", "Hello\nBcc: everyone@example.com", "Body")
+    send_mail("fine@example.com", "Hello", "Body")
+
+    assert deliver_pending(50) == (2, 1, 1)
+
+    broken = __status("broken@example.com")
+    assert (broken.status, broken.attempts, broken.last_error) == ("dead", 1, "BadHeaderError")
+    assert smtp.received == ["fine@example.com"]
+
+
+def test_unreachable_server_retries_every_mail(context, smtp, monkeypatch):
+    monkeypatch.setattr(app.extensions["mail"], "port", __free_port())
+    send_mail("first@example.com", "Hello", "Body")
+
+    assert deliver_pending(50) == (1, 0, 1)
+
+    assert __status("first@example.com").status == "pending"
+
+
+@pytest.mark.benchmark
+def test_mail_worker_throughput(context, smtp, report):
+    db.session.execute("""
+        INSERT INTO outgoing_mail (recipient, subject, body, status, attempts, next_attempt_at,
+                                   created_at)
+        SELECT 'user' || n || '@example.com', 'Hello', 'Body', 'pending', 0, :now, :now
+        FROM generate_series(1, :mails) AS n
+    """, {"mails": QUEUED_MAILS, "now": datetime.utcnow()})
+    db.session.commit()
+
+    started = time.perf_counter()
+    batches = 0
+    while deliver_pending(50)[0]:
+        batches = batches + 1
+    elapsed = time.perf_counter() - started
+
+    assert len(smtp.received) == QUEUED_MAILS
+    assert len(smtp.connections) == batches
+    report(f"mail worker, {QUEUED_MAILS} queued mails", QUEUED_MAILS / elapsed, "mails/sec")
@@ -0,0 +1,222 @@
+import os
+import time
+from io import BytesIO
+
+import pytest
+from flaskr import app, commands, db
+from flaskr.models import Event, Profile, StoredFile
+from flaskr.profiles import utils
+from flaskr.storage import LocalStorage, MemoryStorage
+from PIL import Image
+
+from tests.utils import create_event, create_profile
+
+DIGEST = "abcd" * 16
+ORIGINAL = f"ab/cd/{DIGEST}.jpg"
+OTHER_ORIGINAL = "ef/01/" + "ef01" * 16 + ".jpg"
+
+
+@pytest.fixture(params=["local", "memory"])
+def stores(request, tmp_path, monkeypatch):
+    """Media, originals and quarantine of the commands, in tmp_path or in memory."""
+    def storage(name):
+        if request.param == "local":
+            return LocalStorage(str(tmp_path / name))
+        return MemoryStorage()
+    media, originals, quarantine = storage("uploads"), storage("originals"), storage("quarantine")
+    monkeypatch.setattr(commands, "media_storage", media)
+    monkeypatch.setattr(commands, "originals_storage", originals)
+    monkeypatch.setattr(commands, "quarantine_storage", quarantine)
+    return media, originals, quarantine
+
+
+def __store(storage, key: str, hours_ago: float = 48):
+    storage.save(key, BytesIO(b"photo"))
+    written = time.time() - hours_ago * 3600
+    if isinstance(storage, MemoryStorage):
+        storage.times[key] = written
+    else:
+        os.utime(storage.local_path(key), (written, written))
+
+
+def __gc(*args) -> str:
+    result = app.test_cli_runner().invoke(args=["media", "gc", *args])
+    assert result.exit_code == 0, result.output
+    return result.output
+
+
+def __keys(storage) -> list:
+    return list(storage.keys())
+
+
+def test_referenced_and_recent_files_survive(context, stores):
+    media, originals, _ = stores
+    profile = create_profile("member@example.com")
+    profile.profile_photo = "/images/uploads/profile/kept.jpg"
+    StoredFile.add_reference("originals", ORIGINAL)
+    db.session.commit()
+    __store(media, "profile/kept.jpg")
+    __store(media, "profile/orphan.jpg")
+    __store(media, "profile/uploading.jpg", hours_ago=1)
+    __store(originals, ORIGINAL)
+    __store(originals, OTHER_ORIGINAL)
+
+    output = __gc()
+
+    assert __keys(media) == ["profile/kept.jpg", "profile/uploading.jpg"]
+    assert __keys(originals) == [ORIGINAL]
+    assert "media: 3 files scanned, 1 deleted." in output
+    assert "originals: 2 files scanned, 1 deleted." in output
+
+
+def test_event_gallery_photos_survive(context, stores):
+    media, _, _ = stores
+    event = create_event(create_profile("host@example.com"))
+    event.photos = ["/images/uploads/eventPhotos/kept.jpg"]
+    db.session.commit()
+    __store(media, "eventPhotos/kept.jpg")
+    __store(media, "eventPhotos/orphan.jpg")
+
+    __gc()
+
+    assert __keys(media) == ["eventPhotos/kept.jpg"]
+
+
+def test_dry_run_deletes_nothing(context, stores):
+    media, originals, quarantine = stores
+    __store(media, "profile/orphan.jpg")
+    __store(originals, OTHER_ORIGINAL)
+
+    output = __gc("--dry-run")
+
+    assert "media: profile/orphan.jpg" in output
+    assert "media: 1 files scanned, 1 orphaned." in output
+    assert __keys(media) == ["profile/orphan.jpg"]
+    assert __keys(originals) == [OTHER_ORIGINAL]
+    assert __keys(quarantine) == []
+
+
+def test_quarantine_moves_orphans_aside(context, stores):
+    media, originals, quarantine = stores
+    __store(media, "profile/orphan.jpg")
+    __store(originals, OTHER_ORIGINAL)
+
+    output = __gc("--quarantine")
+
+    assert "media: 1 files scanned, 1 quarantined." in output
+    assert __keys(media) == [] and __keys(originals) == []
+    assert __keys(quarantine) == ["media/profile/orphan.jpg", "originals/" + OTHER_ORIGINAL]
+    with quarantine.open("media/profile/orphan.jpg") as file:
+        assert file.read() == b"photo"
+
+
+def test_batches_cover_every_file_and_stop(context, stores):
+    media, _, _ = stores
+    profile = create_profile("member@example.com")
+    profile.cover_photo = "/images/uploads/cover/2.jpg"
+    db.session.commit()
+    for index in range(5):
+        __store(media, f"cover/{index}.jpg")
+
+    output = __gc("--batch-size", "2")
+
+    assert "media: 5 files scanned, 4 deleted." in output
+    assert __keys(media) == ["cover/2.jpg"]
+
+
+def test_collected_photos_release_their_original(context, stores):
+    media, originals, _ = stores
+    photo = f"profile/ab/cd/{DIGEST}-250x250.jpg"
+    StoredFile.add_reference("media", photo, 2)
+    StoredFile.add_reference("originals", ORIGINAL, 2)
+    db.session.commit()
+    __store(media, photo)
+    __store(originals, ORIGINAL)
+
+    __gc()
+
+    # the photo went first, its original lost both references and went in the same run
+    assert __keys(media) == [] and __keys(originals) == []
+    assert StoredFile.query.count() == 0
+
+
+@pytest.fixture
+def photo_stores(tmp_path, monkeypatch):
+    """Media and originals in tmp_path for the commands and the processes they fork."""
+    media = LocalStorage(str(tmp_path / "uploads"))
+    originals = LocalStorage(str(tmp_path / "originals"))
+    for module in (commands, utils):
+        monkeypatch.setattr(module, "media_storage", media)
+        monkeypatch.setattr(module, "originals_storage", originals)
+    return media, originals
+
+
+def __stored_photo(media, originals, digest: str, size: str, content: bytes = b"stale") -> str:
+    # an original, and the photo cut from it at an older size
+    original = BytesIO()
+    Image.new("RGB", (800, 600), "red").save(original, format="JPEG")
+    original.seek(0)
+    originals.save(f"{digest[:2]}/{digest[2:4]}/{digest}.jpg", original)
+    key = f"profile/{digest[:2]}/{digest[2:4]}/{digest}-{size}.jpg"
+    media.save(key, BytesIO(content))
+    return key
+
+
+def __rethumbnail(tmp_path, *args) -> str:
+    result = app.test_cli_runner().invoke(args=[
+        "media", "rethumbnail", "--workers", "1",
+        "--checkpoint", str(tmp_path / "checkpoint"), *args])
+    assert result.exit_code == 0, result.output
+    return result.output
+
+
+def test_rethumbnail_moves_rows_and_references_to_the_new_size(context, photo_stores, tmp_path):
+    media, originals = photo_stores
+    old_key = __stored_photo(media, originals, DIGEST, "200x200")
+    new_key = old_key.replace("-200x200", "-250x250")
+    profile = create_profile("member@example.com")
+    profile.profile_photo = "/images/uploads/" + old_key
+    event = create_event(profile)
+    event.photos = ["/images/uploads/other.jpg", "/images/uploads/" + old_key]
+    profile_id, event_id = profile.id, event.id
+    StoredFile.add_reference("media", old_key, 2)
+    db.session.commit()
+
+    assert "1 reprocessed, 0 skipped, 0 failed" in __rethumbnail(tmp_path)
+
+    assert Profile.query.get(profile_id).profile_photo == "/images/uploads/" + new_key
+    assert Event.query.get(event_id).photos == ["/images/uploads/other.jpg",
+                                                "/images/uploads/" + new_key]
+    assert StoredFile.query.get(("media", old_key)) is None
+    assert StoredFile.query.get(("media", new_key)).ref_count == 2
+    assert not media.exists(old_key)
+    with Image.open(media.local_path(new_key)) as photo:
+        assert photo.size == (250, 250)
+    assert not os.path.exists(tmp_path / "checkpoint")
+
+
+def test_rethumbnail_resumes_after_the_checkpoint(context, photo_stores, tmp_path):
+    media, originals = photo_stores
+    done = __stored_photo(media, originals, "0a" * 32, "200x200")
+    left = __stored_photo(media, originals, "fb" * 32, "200x200")
+    (tmp_path / "checkpoint").write_text(done)
+
+    output = __rethumbnail(tmp_path)
+
+    assert f"Resuming after {done}." in output
+    assert "1 reprocessed" in output
+    assert media.exists(done)
+    assert not media.exists(left) and media.exists(left.replace("-200x200", "-250x250"))
+
+
+def test_rethumbnail_skips_current_sizes_unless_forced(context, photo_stores, tmp_path):
+    media, originals = photo_stores
+    key = __stored_photo(media, originals, DIGEST, "250x250")
+
+    assert "0 reprocessed, 1 skipped" in __rethumbnail(tmp_path)
+    with media.open(key) as file:
+        assert file.read() == b"stale"
+
+    assert "1 reprocessed, 0 skipped" in __rethumbnail(tmp_path, "--force")
+    with Image.open(media.local_path(key)) as photo:
+        assert photo.size == (250, 250)
@@ -0,0 +1,86 @@
+import pytest
+from flaskr import db
+from flaskr.models import Notification, Profile, Role, User
+from flaskr.notifications.utils import notify_profiles, notify_role
+
+from tests.utils import create_profile, signed_in_client
+
+RECIPIENTS = 5000
+
+
+def test_unread_count_follows_new_notifications(context):
+    profile = create_profile("member@example.com")
+    db.session.add_all([Notification("Hello", "/", profile.id) for _ in range(3)])
+    db.session.commit()
+
+    response = signed_in_client(profile).get("/notifications/unread")
+
+    assert response.status_code == 200
+    assert response.json == {"unread": 3}
+
+
+def test_badge_polls_the_count_under_sync_workers(context):
+    profile = create_profile("member@example.com")
+
+    html = signed_in_client(profile).get("/notifications").get_data(as_text=True)
+
+    assert 'data-countUrl="/notifications/unread"' in html
+    assert "data-streamUrl" not in html
+
+
+def test_role_broadcast_reaches_every_profile_of_the_role(context):
+    admins = [create_profile(f"admin{index}@example.com", Role.ADMIN) for index in range(3)]
+    member = create_profile("member@example.com")
+
+    assert notify_role(Role.ADMIN, "Reported", "/complains") == 3
+    db.session.commit()
+
+    assert sorted(n.profile_id for n in Notification.query) == sorted(a.id for a in admins)
+    assert [a.unread_notifications for a in admins] == [1, 1, 1]
+    assert member.unread_notifications == 0
+
+
+def test_profile_fan_out_skips_duplicates_and_missing_profiles(context):
+    profile = create_profile("member@example.com")
+
+    assert notify_profiles([profile.id, profile.id, profile.id + 1], "Banned") == 1
+    db.session.commit()
+
+    assert Notification.query.count() == 1
+    assert profile.unread_notifications == 1
+
+
+def __seed_admins():
+    db.session.execute("""
+        INSERT INTO "user" (email, password, is_verified, role)
+        SELECT 'admin' || n || '@example.com', 'password', true, 'ADMIN'
+        FROM generate_series(1, :recipients) AS n
+    """, {"recipients": RECIPIENTS})
+    db.session.execute("""
+        INSERT INTO profile (first_name, last_name, date_of_birth, gender, user_id,
+                             unread_notifications)
+        SELECT 'First', 'Last', '1990-01-01', 'male', id, 0 FROM "user"
+    """)
+    db.session.commit()
+
+
+@pytest.mark.benchmark
+def test_fan_out_to_thousands_of_recipients(context, measure):
+    __seed_admins()
+
+    def per_admin():
+        # what report_user did before: every admin and profile loaded, one row added each
+        for user in User.query.filter_by(role=Role.ADMIN).all():
+            db.session.add(Notification("Reported", "/complains", user.profile.id))
+        db.session.commit()
+
+    def broadcast():
+        notify_role(Role.ADMIN, "Reported", "/complains")
+        db.session.commit()
+
+    # once each, the loop takes seconds
+    before = measure(f"notify {RECIPIENTS} admins, one ORM row each", per_admin, repeat=1)
+    after = measure(f"notify {RECIPIENTS} admins, one statement", broadcast, repeat=1)
+
+    assert after < before
+    assert Profile.query.filter(Profile.unread_notifications != 2).count() == 0
@@ -0,0 +1,243 @@
+import resource
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from io import BytesIO
+from itertools import count
+from multiprocessing import get_context
+
+import pytest
+from flaskr import app, db
+from flaskr.models import StoredFile
+from flaskr.profiles import utils
+from flaskr.profiles.utils import (PROCESSING_PLACEHOLDER, check_photo,
+                                   photo_url, process_photo, remove_photo,
+                                   save_photos)
+from flaskr.storage import LocalStorage
+from PIL import Image, JpegImagePlugin
+from werkzeug.datastructures import FileStorage
+
+
+class QueuedJobs():
+    """Stands in for the processing pool, jobs wait until run() so tests see them queued."""
+
+    def __init__(self) -> None:
+        self.jobs = []
+
+    def submit(self, function, *args):
+        self.jobs.append((function, args))
+        return Future()
+
+    def run(self):
+        jobs, self.jobs = self.jobs, []
+        for function, args in jobs:
+            function(*args)
+
+
+@pytest.fixture
+def stores(tmp_path, monkeypatch):
+    """Originals and photos in temporary folders, processing queued on a QueuedJobs."""
+    media = LocalStorage(str(tmp_path / "uploads"))
+    originals = LocalStorage(str(tmp_path / "originals"))
+    monkeypatch.setattr(utils, "media_storage", media)
+    monkeypatch.setattr(utils, "originals_storage", originals)
+    queue = QueuedJobs()
+    monkeypatch.setattr(utils, "__processing_pool", lambda: queue)
+    return media, originals, queue
+
+
+def __jpeg(width: int, height: int) -> bytes:
+    # noise, a flat color compresses and decodes unrealistically fast
+    buffer = BytesIO()
+    Image.effect_noise((width, height), 64).convert("RGB").save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def __upload(content: bytes) -> FileStorage:
+    return FileStorage(stream=BytesIO(content), filename="photo.JPG")
+
+
+def test_upload_is_stored_raw_and_shown_as_placeholder(context, stores):
+    media, originals, queue = stores
+
+    name = save_photos(__upload(__jpeg(1600, 1200)), "profile")
+    db.session.commit()
+
+    assert name.endswith("-250x250.jpg")
+    assert list(originals.keys()) and not media.exists("profile/" + name)
+    assert [args[1] for _, args in queue.jobs] == ["profile/" + name]
+    assert photo_url("/images/uploads/profile/" + name).endswith(PROCESSING_PLACEHOLDER)
+
+    queue.run()
+
+    assert media.exists("profile/" + name)
+    assert photo_url("/images/uploads/profile/" + name).endswith("/images/uploads/profile/" + name)
+
+
+def test_processing_crops_the_original(context, stores):
+    media, originals, _ = stores
+    originals.save("photo.jpg", BytesIO(__jpeg(1600, 1200)))
+
+    process_photo("photo.jpg", "cover/photo.jpg", 1040, 260)
+
+    with Image.open(media.local_path("cover/photo.jpg")) as photo:
+        assert photo.size == (1040, 260)
+
+
+def test_photos_over_the_pixel_limit_are_rejected_from_the_header(monkeypatch):
+    monkeypatch.setitem(app.config, "MAX_PHOTO_PIXELS", 1000000)
+    photo = __upload(__jpeg(1600, 1200))
+
+    assert check_photo(photo) == "The photo is too large, at most 1 megapixels are allowed."
+    assert photo.stream.tell() == 0
+    assert check_photo(__upload(__jpeg(1000, 1000))) is None
+    assert check_photo(__upload(b"not an image")) == "The file is not a supported image."
+
+
+def test_jpeg_originals_are_decoded_at_reduced_scale(context, stores, monkeypatch):
+    media, originals, _ = stores
+    originals.save("photo.jpg", BytesIO(__jpeg(4000, 3000)))
+    decoded = []
+    original_crop = Image.Image.crop_to_aspect
+    monkeypatch.setattr(Image.Image, "crop_to_aspect",
+                        lambda image, *args: decoded.append(image.size) or original_crop(image, *args))
+
+    process_photo("photo.jpg", "profile/photo.jpg", 250, 250)
+
+    # 1/8 scale still covers 250x250
+    assert decoded == [(500, 375)]
+    with Image.open(media.local_path("profile/photo.jpg")) as photo:
+        assert photo.size == (250, 250)
+
+
+def __process_in_child(draft: bool, *job):
+    # a process of its own per run, so its peak RSS is the run's alone
+    if not draft:
+        JpegImagePlugin.JpegImageFile.draft = lambda image, mode, size: None
+    started = time.perf_counter()
+    if job:
+        process_photo(*job)
+    return time.perf_counter() - started, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def __in_child(*args):
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("fork")) as pool:
+        return pool.submit(__process_in_child, *args).result()
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("megapixels, width, height", [(12, 4000, 3000), (24, 6000, 4000)])
+def test_draft_decode_memory_and_latency(context, stores, report, megapixels, width, height):
+    _, originals, _ = stores
+    originals.save("photo.jpg", BytesIO(__jpeg(width, height)))
+    _, baseline = __in_child(True)
+
+    for folder_name, size in (("profile", (250, 250)), ("eventPhotos", (1280, 720))):
+        results = {}
+        for draft in (False, True):
+            runs = [__in_child(draft, "photo.jpg", f"{folder_name}/photo.jpg", *size)
+                    for _ in range(3)]
+            seconds = min(run[0] for run in runs)
+            # ru_maxrss is in KiB on Linux
+            peak = (min(run[1] for run in runs) - baseline) / 1024
+            label = f"{megapixels} MP to {folder_name}, {'draft' if draft else 'full'} decode"
+            report(f"{label}, time", seconds * 1000, "ms")
+            report(f"{label}, peak RSS", peak, "MiB")
+            results[draft] = (seconds, peak)
+        assert results[True][0] < results[False][0]
+        assert results[True][1] < results[False][1]
+
+
+@pytest.mark.benchmark
+def test_upload_latency_with_12_megapixel_photos(context, stores, measure):
+    jpeg = __jpeg(4000, 3000)
+    # new bytes after the image each time, identical uploads would be stored once
+    variant = count()
+
+    def uploads():
+        return [__upload(jpeg + next(variant).to_bytes(4, "big")) for _ in range(3)]
+
+    def inline():
+        # what the request did before: decode, crop and resize each photo in place
+        for index, photo in enumerate(uploads()):
+            cropped = Image.open(photo.stream).crop_to_aspect(1280, 720)
+            cropped.thumbnail((1280, 720), Image.ANTIALIAS)
+            buffer = BytesIO()
+            cropped.save(buffer, format="JPEG")
+            buffer.seek(0)
+            stores[0].save(f"eventPhotos/{index}.jpg", buffer)
+
+    def queued():
+        for photo in uploads():
+            check_photo(photo)
+            save_photos(photo, "eventPhotos")
+        db.session.commit()
+
+    before = measure("upload of three 12 MP photos, processed inline", inline, repeat=3)
+    after = measure("upload of three 12 MP photos, queued", queued, repeat=3)
+
+    assert after < before
+
+
+def __stored_keys(stores) -> tuple:
+    media, originals, _ = stores
+    return list(media.keys()), list(originals.keys())
+
+
+def __ref_counts() -> dict:
+    return {(row.store, row.key): row.ref_count for row in StoredFile.query}
+
+
+def test_identical_uploads_share_files_until_the_last_is_removed(context, stores):
+    jpeg = __jpeg(800, 600)
+    first = save_photos(__upload(jpeg), "profile")
+    second = save_photos(__upload(jpeg), "profile")
+    db.session.commit()
+    stores[2].run()
+
+    assert first == second
+    media_keys, original_keys = __stored_keys(stores)
+    assert len(media_keys) == 1 and len(original_keys) == 1
+    assert set(__ref_counts().values()) == {2}
+
+    remove_photo("/images/uploads/profile/" + first)
+    db.session.commit()
+
+    assert __stored_keys(stores) == (media_keys, original_keys)
+    assert set(__ref_counts().values()) == {1}
+
+    remove_photo("/images/uploads/profile/" + second)
+    db.session.commit()
+
+    assert __stored_keys(stores) == ([], [])
+    assert __ref_counts() == {}
+
+
+def test_rolled_back_removal_keeps_the_files(context, stores):
+    name = save_photos(__upload(__jpeg(800, 600)), "profile")
+    db.session.commit()
+    stores[2].run()
+    stored = __stored_keys(stores)
+
+    remove_photo("/images/uploads/profile/" + name)
+    db.session.rollback()
+
+    assert __stored_keys(stores) == stored
+    assert set(__ref_counts().values()) == {1}
+    db.session.commit()
+    assert __stored_keys(stores) == stored
+
+
+def test_photo_uploaded_again_before_its_removal_commits_is_kept(context, stores):
+    jpeg = __jpeg(800, 600)
+    name = save_photos(__upload(jpeg), "profile")
+    db.session.commit()
+    stores[2].run()
+    stored = __stored_keys(stores)
+
+    # a profile photo replaced by the same picture
+    remove_photo("/images/uploads/profile/" + name)
+    save_photos(__upload(jpeg), "profile")
+    db.session.commit()
+
+    assert __stored_keys(stores) == stored
+    assert set(__ref_counts().values()) == {1}
@@ -0,0 +1,119 @@
+import math
+import re
+from datetime import datetime, timedelta
+
+import pytest
+from flaskr import app, db
+from flaskr.events.utils import POSTS_PER_PAGE
+from flaskr.models import Comment, Post, Reply, Role, time_score
+
+from tests.utils import (api_token, count_queries, create_event, create_post,
+                         create_profile, signed_in_client)
+
+
+def __posts_tab_queries(rows: int) -> int:
+    """Queries of the posts tab of an event whose posts, comments and replies
+    grow with rows, each by its own author.
+    """
+    host = create_profile(f"host{rows}@example.com", Role.HOST)
+    event = create_event(host)
+    authors = [create_profile(f"author{rows}-{index}@example.com") for index in range(rows)]
+    for author in authors:
+        post = create_post(event, author)
+        comments = [Comment("A comment", post.id, commenter.id) for commenter in authors]
+        db.session.add_all(comments)
+        db.session.flush()
+        db.session.add_all(Reply("A reply", comment.id, author.id) for comment in comments)
+    db.session.commit()
+    return count_queries(signed_in_client(host), f"/events/{event.id}?filter=posts")
+
+
+def test_posts_tab_queries_do_not_grow_with_posts(context):
+    assert __posts_tab_queries(1) == __posts_tab_queries(50)
+
+
+def __scored_post(event, author, points: int, time_score: float) -> Post:
+    # up votes for positive points and down votes for negative ones
+    post = create_post(event, author)
+    post.up_votes, post.down_votes = max(points, 0), max(-points, 0)
+    post.time_score = time_score
+    db.session.commit()
+    return post
+
+
+def __page_ids(client, event_id: int, sort: str) -> list:
+    # every page of the posts tab in the ordering, following the cursors
+    ids, cursor = [], ""
+    while cursor is not None:
+        response = client.get(f"/events/{event_id}/posts?sort={sort}&cursor={cursor}")
+        assert response.status_code == 200
+        ids += [int(id) for id in re.findall(r'id="card-post-(\d+)"', response.json["html"])]
+        cursor = response.json["next_cursor"]
+    return ids
+
+
+def test_comments_move_the_counter_and_the_scores(context):
+    author = create_profile("author@example.com")
+    post = __scored_post(create_event(author), author, 9, 100.0)
+    post_id = post.id
+    client = app.test_client()
+    headers = {"Authorization": api_token(author)}
+
+    response = client.post("/api/v1/comments", json={"content": "A comment", "post_id": post_id},
+                           headers=headers)
+    assert response.status_code == 201
+    post = Post.query.get(post_id)
+    assert (post.comments_count, post.top_score) == (1, 10)
+    assert post.hot_score == pytest.approx(101.0)
+
+    assert client.delete(f"/api/v1/comments/{response.json['id']}",
+                         headers=headers).status_code == 200
+    post = Post.query.get(post_id)
+    assert (post.comments_count, post.top_score) == (0, 9)
+    assert post.hot_score == pytest.approx(100.0 + math.log10(9))
+
+
+def test_hot_score_is_signed_and_grows_with_the_log_of_the_points(context):
+    author = create_profile("author@example.com")
+    event = create_event(author)
+    posts = [__scored_post(event, author, points, 50.0) for points in (100, 1, 0, -1000)]
+
+    assert [post.top_score for post in posts] == [100, 1, 0, -1000]
+    assert [post.hot_score for post in posts] == pytest.approx([52.0, 50.0, 50.0, 47.0])
+
+
+@pytest.mark.parametrize("sort, expected", [
+    ("top", ["viral", "later_tie", "tie", "fresh", "buried"]),
+    ("hot", ["fresh", "later_tie", "tie", "buried", "viral"]),
+])
+def test_ranked_sorts_break_ties_by_the_newer_id(context, sort, expected):
+    author = create_profile("author@example.com")
+    event = create_event(author)
+    # tie and later_tie are equal in both scores
+    posts = {name: __scored_post(event, author, points, time_score)
+             for name, points, time_score in [("viral", 1000, 10.0), ("tie", 10, 100.0),
+                                              ("fresh", 1, 102.0), ("later_tie", 10, 100.0),
+                                              ("buried", -100, 102.5)]}
+
+    ids = __page_ids(signed_in_client(author), event.id, sort)
+
+    assert ids == [posts[name].id for name in expected]
+
+
+@pytest.mark.parametrize("sort, column", [("hot", Post.hot_score), ("top", Post.top_score)])
+def test_score_cursor_pages_skip_and_repeat_nothing(context, sort, column):
+    author = create_profile("author@example.com")
+    event = create_event(author)
+    now = datetime.utcnow()
+    for index in range(3 * POSTS_PER_PAGE - 3):
+        # scores without a short decimal form, every third one repeating the one before
+        repeated = index - index % 3 + min(index % 3, 1)
+        __scored_post(event, author, repeated % 7 - 2,
+                      time_score(now - timedelta(seconds=7919.123 * repeated)))
+    expected = [post.id for post in Post.query.filter_by(event_id=event.id)
+                .order_by(column.desc(), Post.id.desc())]
+
+    ids = __page_ids(signed_in_client(author), event.id, sort)
+
+    assert ids == expected
+    assert len(set(ids)) == 3 * POSTS_PER_PAGE - 3
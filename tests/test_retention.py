@@ -0,0 +1,147 @@
+import os
+import re
+from datetime import datetime, timedelta
+
+import pytest
+from flaskr import app, db
+from flaskr.models import Notification, NotificationArchive
+from flaskr.notifications import routes
+from flaskr.utils import paginate_by_cursor
+
+from tests.utils import create_profile, signed_in_client
+
+# a million by default so a run takes a minute, BENCHMARK_NOTIFICATIONS=50000000 for 50M,
+# which needs tens of GB of disk and has not been part of the regular runs
+NOTIFICATIONS = int(os.getenv("BENCHMARK_NOTIFICATIONS") or 1_000_000)
+PROFILES = 1000
+
+
+def __notification(profile, days_ago: int, is_readed: bool) -> Notification:
+    notification = Notification("Hello", "/", profile.id)
+    notification.is_readed = is_readed
+    notification.created_at = datetime.utcnow() - timedelta(days=days_ago)
+    return notification
+
+
+def __archive(*args):
+    result = app.test_cli_runner().invoke(args=["notifications", "archive", *args])
+    assert result.exit_code == 0, result.output
+    return result.output
+
+
+def test_only_old_read_notifications_are_archived(context):
+    profile = create_profile("member@example.com")
+    db.session.add_all([__notification(profile, 100, True), __notification(profile, 100, False),
+                        __notification(profile, 10, True)])
+    db.session.commit()
+
+    assert "1 notifications archived" in __archive("--batch-size", "1")
+
+    assert sorted((n.created_at < datetime.utcnow() - timedelta(days=90), n.is_readed)
+                  for n in Notification.query) == [(False, True), (True, False)]
+    assert NotificationArchive.query.count() == 1
+
+
+def test_delete_drops_instead_of_archiving(context):
+    profile = create_profile("member@example.com")
+    db.session.add_all([__notification(profile, 40, True) for _ in range(3)])
+    db.session.commit()
+
+    assert "3 notifications deleted" in __archive("--older-than", "30", "--delete")
+
+    assert Notification.query.count() == 0
+    assert NotificationArchive.query.count() == 0
+
+
+def __center_ids(client, filter: str = "") -> list:
+    # every page of the notification center, following the cursors
+    ids, cursor = [], ""
+    while cursor is not None:
+        response = client.get(f"/notifications/page?filter={filter}&cursor={cursor}")
+        assert response.status_code == 200
+        ids += [int(id) for id in re.findall(r"mark-read-and-go/(\d+)", response.json["html"])]
+        cursor = response.json["next_cursor"]
+    return ids
+
+
+def test_center_pages_into_the_archive(context, monkeypatch):
+    monkeypatch.setattr(routes, "NOTIFICATIONS_PER_PAGE", 2)
+    profile = create_profile("member@example.com")
+    notifications = [__notification(profile, days_ago, is_readed)
+                     for days_ago, is_readed in [(200, False), (150, True), (5, False),
+                                                 (120, True), (10, True), (100, True)]]
+    notifications[1].link = "/archived"
+    db.session.add_all(notifications)
+    db.session.commit()
+    newest_first = [n.id for n in sorted(notifications, key=lambda n: n.created_at, reverse=True)]
+    unread = [notifications[2].id, notifications[0].id]
+    archived_id = notifications[1].id
+    client = signed_in_client(profile)
+
+    assert "3 notifications archived" in __archive()
+
+    # 5 and 10 days, then the archive, then the old unread one, none skipped or repeated
+    assert __center_ids(client) == newest_first
+    assert __center_ids(client, "unread") == unread
+    assert client.get(f"/notification/mark-read-and-go/{archived_id}").location.endswith("/archived")
+
+
+def __seed():
+    # two years of notifications, the read ones older than a month
+    db.session.execute("""
+        INSERT INTO "user" (email, password, is_verified, role)
+        SELECT 'user' || n || '@example.com', 'password', true, 'GENERAL'
+        FROM generate_series(1, :profiles) AS n
+    """, {"profiles": PROFILES})
+    db.session.execute("""
+        INSERT INTO profile (first_name, last_name, date_of_birth, gender, user_id,
+                             unread_notifications)
+        SELECT 'First', 'Last', '1990-01-01', 'male', id, 0 FROM "user"
+    """)
+    db.session.execute("""
+        INSERT INTO notification (message, link, profile_id, is_readed, created_at, updated_at)
+        SELECT 'Hello', '/', 1 + n % :profiles, age > interval '30 days',
+               now() - age, now() - age
+        FROM generate_series(1, :notifications) AS n,
+             LATERAL (SELECT interval '730 days' * (n::float / :notifications) AS age) AS a
+    """, {"profiles": PROFILES, "notifications": NOTIFICATIONS})
+    db.session.commit()
+    __vacuum()
+
+
+def __vacuum():
+    # outside of a transaction, as VACUUM requires
+    with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute("VACUUM ANALYZE notification")
+
+
+def __hot_queries(measure, label: str):
+    def newest_page():
+        paginate_by_cursor(Notification.query.filter_by(profile_id=500), Notification)
+
+    def unread_page():
+        paginate_by_cursor(Notification.query.filter_by(profile_id=500, is_readed=False),
+                           Notification)
+
+    def unread_total():
+        Notification.query.filter_by(is_readed=False).count()
+
+    measure(f"newest page of a profile, {label}", newest_page)
+    measure(f"unread page of a profile, {label}", unread_page)
+    measure(f"unread count of everyone, {label}", unread_total)
+
+
+@pytest.mark.benchmark
+def test_hot_queries_after_archiving(context, measure):
+    __seed()
+    __hot_queries(measure, f"{NOTIFICATIONS} rows")
+
+    measure("archive of the read notifications past 90 days", __archive, repeat=1)
+    __vacuum()
+    __hot_queries(measure, f"{Notification.query.count()} rows")
+    measure("archive page of a profile, past the notification table", lambda: paginate_by_cursor(
+        NotificationArchive.query.filter_by(profile_id=500), NotificationArchive))
+
+    assert Notification.query.filter(
+        Notification.is_readed, Notification.created_at < datetime.utcnow() - timedelta(days=91)
+    ).count() == 0
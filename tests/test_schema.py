@@ -0,0 +1,50 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from flaskr.schema import PostSchema, compile_schema, dump_post, post_schema
+
+
+def __post(comments: int = 2, replies: int = 2):
+    def profile(id):
+        return SimpleNamespace(id=id, first_name="First", last_name="Last",
+                               profile_photo="/images/default.png",
+                               user=SimpleNamespace(id=id, email=f"user{id}@example.com",
+                                                    is_verified=True, role="general"))
+    now = datetime(2022, 1, 1, 12, 30)
+    return SimpleNamespace(
+        id=1, content="A post", up_votes=3, down_votes=1, created_at=now,
+        profile=profile(1), event=SimpleNamespace(id=1, title="Trip"),
+        comments=[SimpleNamespace(
+            id=comment, content="A comment", profile_id=2, profile=profile(2), post_id=1,
+            created_at=now, replies=[SimpleNamespace(
+                id=reply, content="A reply", profile_id=3, profile=profile(3),
+                comment_id=comment, created_at=now) for reply in range(replies)])
+            for comment in range(comments)])
+
+
+def test_compiled_dump_matches_marshmallow():
+    post = __post()
+    assert dump_post(post) == post_schema.dump(post)
+
+
+def test_missing_attributes_are_left_out_and_none_is_kept():
+    post = __post()
+    del post.event
+    post.profile = None
+    post.comments[0].replies[0].created_at = None
+
+    assert dump_post(post) == post_schema.dump(post)
+    assert "event" not in dump_post(post)
+    assert dump_post(post)["profile"] is None
+
+
+@pytest.mark.benchmark
+def test_compiled_dump_of_a_busy_post(measure):
+    post = __post(comments=500, replies=2)
+    compiled = compile_schema(PostSchema)
+
+    before = measure("post with 500 comments: marshmallow", lambda: post_schema.dump(post))
+    after = measure("post with 500 comments: compile_schema", lambda: compiled(post))
+
+    assert after < before
@@ -0,0 +1,95 @@
+import pytest
+from flaskr import db
+from flaskr.mains.utils import build_prefix_query, search_events, search_profiles
+from flaskr.models import Event, Profile
+from sqlalchemy import func
+
+from tests.utils import create_event, create_profile
+
+EVENTS = 100_000
+PROFILES = 500_000
+
+
+def test_build_prefix_query():
+    assert build_prefix_query("Cox Baz!") == "cox:* & baz:*"
+    assert build_prefix_query("  ") == ""
+
+
+def test_title_ranks_above_place_name(context):
+    host = create_profile("host@example.com")
+    by_place = create_event(host)
+    by_place.title, by_place.place_name = "Hiking", "Sajek Valley"
+    by_title = create_event(host)
+    by_title.title, by_title.place_name = "Sajek trip", "Rangamati"
+    create_event(host)
+    db.session.commit()
+
+    events, has_next = search_events("saj")
+
+    assert events == [by_title, by_place]
+    assert not has_next
+
+
+def test_profile_pages(context):
+    for index in range(3):
+        create_profile(f"user{index}@example.com")
+
+    first, has_next = search_profiles("first last", page=1, per_page=2)
+    second, has_next_after = search_profiles("first last", page=2, per_page=2)
+
+    assert len(first) == 2 and has_next
+    assert len(second) == 1 and not has_next_after
+
+
+def __like_search(searched: str):
+    # mains.search before full-text search: four unindexed scans merged in sets
+    pattern = "%" + searched.lower() + "%"
+    events = set(Event.query.filter(func.lower(Event.title).like(pattern)))
+    events |= set(Event.query.filter(func.lower(Event.place_name).like(pattern)))
+    profiles = set(Profile.query.filter(func.lower(Profile.first_name).like(pattern)))
+    profiles |= set(Profile.query.filter(func.lower(Profile.last_name).like(pattern)))
+    return events, profiles
+
+
+def __seed():
+    # in the database, inserting this many rows through the ORM takes minutes
+    db.session.execute("""
+        INSERT INTO "user" (email, password, is_verified, role)
+        SELECT 'user' || n || '@example.com', 'password', true, 'GENERAL'
+        FROM generate_series(1, :profiles) AS n
+    """, {"profiles": PROFILES})
+    db.session.execute("""
+        INSERT INTO profile (first_name, last_name, date_of_birth, gender, user_id,
+                             unread_notifications)
+        SELECT (ARRAY['Rahim', 'Karim', 'Nadia', 'Sadia', 'Tanvir'])[1 + n % 5],
+               'Last' || n, '1990-01-01', 'male', n, 0
+        FROM generate_series(1, :profiles) AS n
+    """, {"profiles": PROFILES})
+    db.session.execute("""
+        INSERT INTO event (title, description, place_name, event_time, day, night, fee,
+                           host_id, max_member, is_open)
+        SELECT (ARRAY['Hiking', 'Camping', 'Rafting', 'Cycling'])[1 + n % 4] || ' ' || n,
+               'A trip',
+               (ARRAY['Bandarban', 'Sajek Valley', 'Sylhet', 'Sundarbans'])[1 + n % 4],
+               now() + interval '7 days', 3, 2, 5000, 1 + n % :profiles, 10, true
+        FROM generate_series(1, :events) AS n
+    """, {"events": EVENTS, "profiles": PROFILES})
+    db.session.commit()
+    db.session.execute("ANALYZE")
+
+
+@pytest.mark.benchmark
+def test_search_latency(context, measure):
+    __seed()
+
+    # a place a quarter of all events are at, and a single person
+    for searched in ["sajek", "last4242"]:
+        def ranked():
+            search_events(searched)
+            search_profiles(searched)
+
+        before = measure(f"search {searched!r}, LIKE scans",
+                         lambda: __like_search(searched), repeat=3)
+        after = measure(f"search {searched!r}, ranked full-text", ranked, repeat=3)
+
+        assert after < before
@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+
+from flaskr import db
+from flaskr.events.utils import confirm_seat, reserve_seat
+from flaskr.models import Event, EventMember, PaymentPending, Role
+
+from tests.utils import create_event, create_profile, run_concurrently
+
+# as many threads as the default pool has connections, 5 and 10 overflow
+WORKERS = 15
+
+
+def test_parallel_registrations_never_exceed_capacity(context):
+    host = create_profile("host@example.com", Role.HOST)
+    event_id = create_event(host, max_member=50).id
+    profile_ids = [create_profile(f"member{index}@example.com").id for index in range(300)]
+
+    def register(profile_id):
+        reservation = reserve_seat(Event.query.get(event_id), profile_id, f"trnx-{profile_id}")
+        db.session.commit()
+        return reservation["is_reserved"]
+
+    reserved = run_concurrently(register, profile_ids, WORKERS)
+
+    assert reserved.count(True) == 50
+    assert PaymentPending.query.filter_by(event_id=event_id).count() == 50
+
+
+def test_parallel_approvals_never_exceed_capacity(context):
+    host = create_profile("host@example.com", Role.HOST)
+    event_id = create_event(host, max_member=20).id
+    # expired holds, they are approved while a seat is free
+    expired = datetime.utcnow() - timedelta(hours=1)
+    payments = [PaymentPending(f"trnx-{index}", create_profile(f"member{index}@example.com").id,
+                               event_id, expired) for index in range(200)]
+    db.session.add_all(payments)
+    db.session.commit()
+    payment_ids = [payment.id for payment in payments]
+
+    def approve(payment_id):
+        return confirm_seat(Event.query.get(event_id),
+                            PaymentPending.query.get(payment_id))["is_confirmed"]
+
+    confirmed = run_concurrently(approve, payment_ids, WORKERS)
+
+    assert confirmed.count(True) == 20
+    assert EventMember.query.filter_by(event_id=event_id).count() == 20
@@ -0,0 +1,73 @@
+from io import BytesIO
+
+import pytest
+from flaskr.storage import LocalStorage, MemoryStorage
+
+from tests.utils import run_concurrently
+
+
+@pytest.fixture(params=["local", "memory"])
+def storage(request, tmp_path):
+    if request.param == "local":
+        return LocalStorage(str(tmp_path))
+    return MemoryStorage()
+
+
+def test_saved_files_can_be_read_back(storage):
+    storage.save("ab/cd/photo.jpg", BytesIO(b"photo"))
+
+    assert storage.exists("ab/cd/photo.jpg")
+    with storage.open("ab/cd/photo.jpg") as file:
+        assert file.read() == b"photo"
+    assert storage.modified_at("ab/cd/photo.jpg") > 0
+
+
+def test_saving_again_replaces_the_file(storage):
+    storage.save("photo.jpg", BytesIO(b"old"))
+    storage.save("photo.jpg", BytesIO(b"new"))
+
+    with storage.open("photo.jpg") as file:
+        assert file.read() == b"new"
+
+
+def test_missing_keys(storage):
+    assert not storage.exists("missing.jpg")
+    with pytest.raises(FileNotFoundError):
+        storage.open("missing.jpg")
+    with pytest.raises(FileNotFoundError):
+        storage.delete("missing.jpg")
+    with pytest.raises(FileNotFoundError):
+        storage.modified_at("missing.jpg")
+
+
+def test_deleted_keys_are_gone(storage):
+    storage.save("ab/photo.jpg", BytesIO(b"photo"))
+    storage.delete("ab/photo.jpg")
+
+    assert not storage.exists("ab/photo.jpg")
+    assert list(storage.keys()) == []
+
+
+def test_keys_are_listed_in_lexical_order(storage):
+    for key in ["b/1.jpg", "a/2.jpg", "a.jpg", "a/1/x.jpg", "c.jpg"]:
+        storage.save(key, BytesIO(b"photo"))
+
+    assert list(storage.keys()) == ["a.jpg", "a/1/x.jpg", "a/2.jpg", "b/1.jpg", "c.jpg"]
+    assert list(storage.keys("a")) == ["a/1/x.jpg", "a/2.jpg"]
+
+
+def test_concurrent_saves_of_one_key_leave_a_whole_file(storage):
+    contents = [bytes([index]) * 100000 for index in range(8)]
+
+    run_concurrently(lambda content: storage.save("photo.jpg", BytesIO(content)), contents)
+
+    with storage.open("photo.jpg") as file:
+        assert file.read() in contents
+    assert list(storage.keys()) == ["photo.jpg"]
+
+
+def test_local_keys_stay_inside_the_root(tmp_path):
+    storage = LocalStorage(str(tmp_path / "media"))
+
+    with pytest.raises(ValueError):
+        storage.open("../secret.txt")
@@ -0,0 +1,122 @@
+import json
+import time
+from queue import Queue
+from threading import Thread
+
+import pytest
+from flaskr import app, db, streams
+from flaskr.models import Message, Role
+from flaskr.streams import ChannelListener, event_stream
+
+from tests.utils import create_event, create_profile, signed_in_client
+
+LISTENERS = 500
+MESSAGES = 20
+# seconds from the commit of a message to its arrival at the last listener
+DELIVERY_BOUND = 2
+
+
+def __stream(queue: Queue, missed: list = ()) -> tuple:
+    closed = []
+    events = list(event_stream(queue, list(missed), str, lambda: closed.append(True)))
+    return events, closed
+
+
+def test_long_poll_ends_after_the_missed_events():
+    events, closed = __stream(Queue(), [1, 2])
+    assert events == ["retry: 3000\n\n", "1", "2"]
+    assert closed == [True]
+
+
+def test_long_poll_ends_after_the_queued_events():
+    queue = Queue()
+    queue.put(1)
+    queue.put(2)
+    events, closed = __stream(queue)
+    assert events == ["retry: 3000\n\n", "1", "2"]
+    assert closed == [True]
+
+
+def test_long_poll_ends_when_nothing_happens(monkeypatch):
+    monkeypatch.setattr(streams, "LONG_POLL_TIMEOUT", 0.1)
+    events, closed = __stream(Queue())
+    assert events == ["retry: 3000\n\n"]
+    assert closed == [True]
+
+
+def test_async_worker_keeps_the_stream_open(monkeypatch):
+    monkeypatch.setattr(streams, "is_async_worker", lambda: True)
+    monkeypatch.setattr(streams, "KEEPALIVE_INTERVAL", 0.01)
+    queue = Queue()
+    queue.put(1)
+    closed = []
+    events = event_stream(queue, [], str, lambda: closed.append(True))
+    assert [next(events) for _ in range(4)] == [
+        "retry: 3000\n\n", "1", ": keep-alive\n\n", ": keep-alive\n\n"]
+    events.close()
+    assert closed == [True]
+
+
+def __chat(client, event_id: int, **query) -> list:
+    response = client.get(f"/api/v1/messages/{event_id}/stream", query_string=query)
+    assert response.status_code == 200
+    return [json.loads(line[len("data: "):])["message_text"]
+            for line in response.get_data(as_text=True).splitlines() if line.startswith("data: ")]
+
+
+def test_long_poll_catches_up_since_the_newest_shown_message(context):
+    host = create_profile("host@example.com", Role.HOST)
+    event = create_event(host)
+    shown = Message("Shown", None, host.id, event.id)
+    db.session.add(shown)
+    db.session.commit()
+    # posted while the client had no stream open
+    db.session.add_all([Message("First", None, host.id, event.id),
+                        Message("Second", None, host.id, event.id)])
+    db.session.commit()
+    client = signed_in_client(host)
+
+    assert __chat(client, event.id, since=shown.id) == ["First", "Second"]
+    assert __chat(client, event.id, since=0) == ["Shown", "First", "Second"]
+
+
+@pytest.mark.benchmark
+def test_every_listener_of_an_event_gets_every_message(database, measure):
+    listener = ChannelListener("benchmark_chat")
+    subscribers = [listener.subscribe(1) for _ in range(LISTENERS)]
+    # the LISTEN connection starts with the first subscription, probed until it hears
+    with app.app_context():
+        while subscribers[0].empty():
+            listener.publish(1, {"id": 0})
+            db.session.commit()
+            time.sleep(0.1)
+    for queue in subscribers:
+        while not queue.empty():
+            queue.get_nowait()
+
+    latencies = []
+
+    def fan_out():
+        received = [[] for _ in subscribers]
+
+        def listen(index):
+            for _ in range(MESSAGES):
+                data = subscribers[index].get(timeout=DELIVERY_BOUND)
+                received[index].append((data["id"], time.monotonic() - data["sent"]))
+
+        threads = [Thread(target=listen, args=(index,)) for index in range(LISTENERS)]
+        for thread in threads:
+            thread.start()
+        with app.app_context():
+            for id in range(1, MESSAGES + 1):
+                listener.publish(1, {"id": id, "sent": time.monotonic()})
+                db.session.commit()
+        for thread in threads:
+            thread.join()
+        assert all([id for id, _ in messages] == list(range(1, MESSAGES + 1))
+                   for messages in received)
+        latencies.append(max(latency for messages in received for _, latency in messages))
+
+    measure(f"{MESSAGES} messages to {LISTENERS} listeners of one event", fan_out, repeat=3)
+
+    assert max(latencies) < DELIVERY_BOUND
@@ -0,0 +1,85 @@
+import time
+from threading import Event as Signal
+
+from flaskr import db
+from flaskr.mains.utils import PrefixIndex, suggestion_index
+from flaskr.models import Role
+
+from tests.utils import create_event, create_profile
+
+
+def __labels(suggestions: list) -> list:
+    return [suggestion["label"] for suggestion in suggestions]
+
+
+def __wait_for_build(index: PrefixIndex):
+    deadline = time.monotonic() + 5
+    while (index.building or index.built_at is None) and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_first_lookup_builds_in_the_background(context):
+    create_event(create_profile("host@example.com", Role.HOST))
+    index = PrefixIndex()
+
+    assert index.suggest("tri") == []
+    __wait_for_build(index)
+
+    assert __labels(index.suggest("tri")) == ["Trip"]
+
+
+def test_concurrent_lookups_start_one_build(context, monkeypatch):
+    index = PrefixIndex()
+    release = Signal()
+    builds = []
+
+    def rebuild():
+        builds.append(True)
+        release.wait(5)
+    monkeypatch.setattr(index, "rebuild", rebuild)
+
+    for _ in range(20):
+        assert index.suggest("tri") == []
+    release.set()
+
+    assert builds == [True]
+
+
+def test_committed_writes_are_suggested(context):
+    suggestion_index.rebuild()
+    host = create_profile("host@example.com", Role.HOST)
+    event = create_event(host)
+
+    assert __labels(suggestion_index.suggest("tri")) == ["Trip"]
+
+    event.title = "Journey"
+    db.session.commit()
+    assert suggestion_index.suggest("tri") == []
+    assert __labels(suggestion_index.suggest("jour")) == ["Journey"]
+
+    db.session.delete(event)
+    db.session.commit()
+    assert suggestion_index.suggest("jour") == []
+
+
+def test_rolled_back_writes_are_not_suggested(context):
+    suggestion_index.rebuild()
+    event = create_event(create_profile("host@example.com", Role.HOST))
+
+    event.title = "Phantom"
+    db.session.flush()
+    db.session.rollback()
+
+    assert suggestion_index.suggest("phan") == []
+    assert __labels(suggestion_index.suggest("tri")) == ["Trip"]
+
+
+def test_writes_committed_during_a_build_survive_it(context):
+    index = PrefixIndex()
+    index.building = True
+
+    # committed after the build read the database, so its rows miss it
+    index.apply({("event", 99): ["Late trip", "Sylhet"]})
+    index.rebuild()
+
+    assert __labels(index.suggest("late")) == ["Late trip"]
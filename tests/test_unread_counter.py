@@ -0,0 +1,96 @@
+import re
+
+from flaskr import app, db, identity
+from flaskr.identity import IdentityCache
+from flaskr.models import Notification, Profile
+
+from tests.utils import create_profile, signed_in_client
+
+
+def __unread(profile_id: int) -> int:
+    return db.session.query(Profile.unread_notifications) \
+        .filter(Profile.id == profile_id).scalar()
+
+
+def __notify(profile_id: int, read: bool = False) -> int:
+    notification = Notification("Hello", "/", profile_id)
+    db.session.add(notification)
+    db.session.commit()
+    if read:
+        notification.is_readed = True
+        db.session.commit()
+    return notification.id
+
+
+def test_counter_follows_inserts_reads_and_deletes(context):
+    profile_id = create_profile("member@example.com").id
+    first, second = __notify(profile_id), __notify(profile_id)
+    assert __unread(profile_id) == 2
+
+    Notification.query.get(first).is_readed = True
+    db.session.commit()
+    assert __unread(profile_id) == 1
+
+    db.session.delete(Notification.query.get(second))
+    db.session.commit()
+    assert __unread(profile_id) == 0
+
+
+def test_setting_an_unloaded_state_counts_what_changed(context):
+    profile_id = create_profile("member@example.com").id
+    unread = Notification.query.get(__notify(profile_id))
+    read = Notification.query.get(__notify(profile_id, read=True))
+    assert __unread(profile_id) == 1
+
+    # expired by the commit, set without being loaded again: once to the
+    # stored value, once to the other
+    db.session.expire_all()
+    read.is_readed = True
+    unread.is_readed = False
+    db.session.commit()
+    assert __unread(profile_id) == 1
+
+    read.is_readed = False
+    db.session.commit()
+    assert __unread(profile_id) == 2
+
+
+def test_counter_never_goes_below_zero(context):
+    profile_id = create_profile("member@example.com").id
+
+    Notification.count_unread(db.session, profile_id, -3)
+    db.session.commit()
+
+    assert __unread(profile_id) == 0
+
+
+def __badge(client) -> int:
+    html = client.get("/notifications").get_data(as_text=True)
+    return int(re.search(r'data-countUrl="[^"]*">(\d+)<', html).group(1))
+
+
+def test_badge_is_current_on_a_worker_that_cached_the_user_before(context, monkeypatch):
+    profile = create_profile("member@example.com")
+    profile_id, user_id = profile.id, profile.user_id
+    client = signed_in_client(profile)
+    # the caches of two workers, a write only invalidates the one of its own worker
+    worker_a = IdentityCache(app.config["IDENTITY_CACHE_TTL"], 100)
+    worker_b = IdentityCache(app.config["IDENTITY_CACHE_TTL"], 100)
+
+    monkeypatch.setattr(identity, "identity_cache", worker_b)
+    assert __badge(client) == 0
+
+    monkeypatch.setattr(identity, "identity_cache", worker_a)
+    for _ in range(3):
+        __notify(profile_id)
+    assert __badge(client) == 3
+
+    monkeypatch.setattr(identity, "identity_cache", worker_b)
+    assert worker_b.get(user_id, identity.SESSION_KEY) is not None
+    assert __badge(client) == 3
+
+    monkeypatch.setattr(identity, "identity_cache", worker_a)
+    client.get("/notification/mark_all")
+
+    monkeypatch.setattr(identity, "identity_cache", worker_b)
+    assert __badge(client) == 0
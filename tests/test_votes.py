@@ -0,0 +1,44 @@
+from flaskr.models import Post, PostVote, Role
+
+from tests.utils import create_event, create_post, create_profile, run_concurrently
+
+
+def test_parallel_votes_are_not_lost(context):
+    host = create_profile("host@example.com", Role.HOST)
+    post_id = create_post(create_event(host), host).id
+    profile_ids = [create_profile(f"voter{index}@example.com").id for index in range(10)]
+
+    run_concurrently(lambda profile_id: Post.query.get(post_id).toggle_vote(profile_id, 1),
+                     profile_ids)
+
+    post = Post.query.get(post_id)
+    assert post.up_votes == 10
+    assert post.down_votes == 0
+
+
+def test_repeated_clicks_of_one_profile_vote_once(context):
+    host = create_profile("host@example.com", Role.HOST)
+    post_id = create_post(create_event(host), host).id
+    voter_id = create_profile("voter@example.com").id
+
+    # five clicks on up vote, applied one after the other they leave it cast
+    run_concurrently(lambda value: Post.query.get(post_id).toggle_vote(voter_id, value),
+                     [1] * 5)
+
+    post = Post.query.get(post_id)
+    assert PostVote.of(voter_id, [post_id]) == {post_id: 1}
+    assert (post.up_votes, post.down_votes) == (1, 0)
+
+
+def test_switching_votes_moves_both_counters(context):
+    host = create_profile("host@example.com", Role.HOST)
+    post_id = create_post(create_event(host), host).id
+    profile_ids = [create_profile(f"voter{index}@example.com").id for index in range(8)]
+    for profile_id in profile_ids:
+        Post.query.get(post_id).toggle_vote(profile_id, -1)
+
+    run_concurrently(lambda profile_id: Post.query.get(post_id).toggle_vote(profile_id, 1),
+                     profile_ids)
+
+    post = Post.query.get(post_id)
+    assert (post.up_votes, post.down_votes) == (8, 0)
@@ -0,0 +1,104 @@
+from datetime import date, datetime, timedelta
+from queue import Empty, Queue
+from threading import Barrier, Thread
+
+from flask import g
+from flaskr import app, db
+from flaskr.models import Event, Post, Profile, Role, User
+from jwt import encode
+
+
+def create_profile(email: str, role: Role = Role.GENERAL) -> Profile:
+    user = User(email, "password", "code", role)
+    user.is_verified = True
+    db.session.add(user)
+    db.session.flush()
+    profile = Profile("First", "Last", date(1990, 1, 1), "male", user.id)
+    db.session.add(profile)
+    db.session.commit()
+    return profile
+
+
+def create_event(host: Profile, max_member: int = 10) -> Event:
+    event = Event("Trip", "A trip", "Bandarban", datetime.utcnow() + timedelta(days=7),
+                  3, 2, 5000, host.id, None, max_member, None, None, "01700000000")
+    db.session.add(event)
+    db.session.commit()
+    return event
+
+
+def create_post(event: Event, profile: Profile) -> Post:
+    post = Post("A post", None, profile.id, event.id)
+    db.session.add(post)
+    db.session.commit()
+    return post
+
+
+def signed_in_client(profile: Profile):
+    """A test client whose session belongs to the user of the profile."""
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = str(profile.user_id)
+    return client
+
+
+def api_token(profile: Profile) -> str:
+    """A token of the user of the profile, for the Authorization header of the api."""
+    return encode({"id": profile.user_id}, app.config["JWT_SECRET_KEY"], algorithm="HS256")
+
+
+def count_queries(client, url: str) -> int:
+    """Queries of a GET request, as reported in its X-Query-Count header."""
+    # the request shares the app context of the test, and so its g and session,
+    # a fresh session keeps the identity map of the test from saving queries
+    db.session.remove()
+    g.pop("query_count", None)
+    app.config["QUERY_COUNT"] = True
+    try:
+        response = client.get(url)
+    finally:
+        app.config["QUERY_COUNT"] = False
+    assert response.status_code == 200
+    return int(response.headers["X-Query-Count"])
+
+
+def run_concurrently(target, arguments: list, workers: int = None) -> list:
+    """Calls target once per argument, each call in its own app context. The worker
+    threads are all released at the same moment and take the arguments in turn.
+    Args:
+        workers (int): Number of threads, a thread per argument when None. Bounding it
+            by the connection pool keeps hundreds of calls from waiting on a connection.
+    Returns:
+        list: The results in argument order.
+    """
+    workers = min(workers or len(arguments), len(arguments))
+    barrier = Barrier(workers)
+    pending = Queue()
+    for item in enumerate(arguments):
+        pending.put(item)
+    results = [None] * len(arguments)
+    errors = []
+
+    def run():
+        with app.app_context():
+            barrier.wait()
+            while True:
+                try:
+                    index, argument = pending.get_nowait()
+                except Empty:
+                    return
+                try:
+                    results[index] = target(argument)
+                except Exception as error:
+                    errors.append(error)
+                finally:
+                    db.session.remove()
+
+    threads = [Thread(target=run) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return results